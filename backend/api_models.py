@@ -21,6 +21,11 @@ class DeckSpec(BaseModel):
     target_draw: int = Field(8, ge=0)
     target_board_wipes: int = Field(2, ge=0)
     target_lands: int = Field(37, ge=0)
+    # Cards whose rules text is close to this theme or to this commander's
+    # score up to `synergy_weight` higher (see `services.card_embeddings`).
+    theme: Optional[str] = Field(None, max_length=200, examples=["+1/+1 counters", "tokens and sacrifice"])
+    commander: Optional[str] = Field(None, examples=["Atraxa, Praetors' Voice"])
+    synergy_weight: float = Field(5.0, ge=0, le=20)
 
 class Decklist(BaseModel):
     """
@@ -32,10 +37,86 @@ class Decklist(BaseModel):
     sideboard: Dict[str, int]
     message: str
 
+class OptimizerSettings(BaseModel):
+    """Options for improving the greedy deck with time-budgeted local search."""
+    time_budget_seconds: float = Field(2.0, gt=0, le=60)
+    restarts: int = Field(4, ge=1, le=32)
+    # Restarts with the same seed follow the same search path.
+    seed: int = 0
+    # Caps the steps per restart; a run that reaches it before the time budget is reproducible.
+    max_iterations: Optional[int] = Field(None, ge=1)
+
 class BuildDeckRequest(BaseModel):
     """Defines the structure for a request to the /decks/build endpoint."""
     collection_id: str
     spec: DeckSpec
+    # When set, the greedy deck is improved by the optimizer.
+    optimize: Optional[OptimizerSettings] = None
+
+class BuildDeckBatchRequest(BaseModel):
+    """Defines the structure for a request to the /decks/build-batch endpoint."""
+    collection_id: str
+    specs: List[DeckSpec] = Field(..., min_length=1, max_length=64)
+
+class RecommendColorsRequest(BaseModel):
+    """Defines the structure for a request to the /decks/recommend-colors endpoint."""
+    collection_id: str
+    # The format and role targets to evaluate; its color identity is ignored.
+    spec: DeckSpec
+    top_k: int = Field(5, ge=1, le=31)
+    # Full decks are built for this many of the best color identities.
+    build_top: int = Field(0, ge=0, le=8)
+    max_colors: int = Field(5, ge=1, le=5)
+
+class ColorRecommendation(BaseModel):
+    """How well a collection supports one color identity."""
+    color_identity: List[str]
+    # Between 0 and 1, from role coverage and pool depth.
+    score: float
+    # Copies of non-land cards within the colors, up to the format's copy limit.
+    pool_depth: int
+    land_count: int
+    # Copies per scored role within the colors.
+    role_counts: Dict[str, int]
+    decklist: Optional[Decklist] = None
+
+class SimulationSettings(BaseModel):
+    """Options for goldfishing a deck: drawing opening hands and early turns with no opponent."""
+    simulations: int = Field(100_000, ge=1, le=2_000_000)
+    turns: int = Field(6, ge=1, le=15)
+    on_the_play: bool = True
+    # London mulligans taken at most; the last hand drawn is kept whatever it holds.
+    max_mulligans: int = Field(2, ge=0, le=6)
+    # A seven-card hand is kept if it holds between this many lands (inclusive).
+    min_keep_lands: int = Field(2, ge=0, le=7)
+    max_keep_lands: int = Field(5, ge=0, le=7)
+    # The same seed gives the same report, whether or not it runs in parallel.
+    seed: int = 0
+    # Spreads the simulations over the deck-building process pool.
+    parallel: bool = False
+
+class SimulateDeckRequest(BaseModel):
+    """Defines the structure for a request to the /decks/simulate endpoint."""
+    decklist: Decklist
+    settings: SimulationSettings = SimulationSettings()
+
+class SimulationReport(BaseModel):
+    """How a deck draws, estimated from simulated games."""
+    simulations: int
+    deck_size: int
+    # The chance of mulliganing the first seven cards.
+    mulligan_rate: float
+    # The share of games by the number of cards kept.
+    hand_sizes: Dict[int, float]
+    # Entry n is the chance of having made every land drop through turn n + 1.
+    land_drops: List[float]
+    # By spell color ("W", "U", "B", "R", "G", or "any" for every spell), entry
+    # n is the chance of casting a spell of mana value n + 1 on turn n + 1.
+    on_curve: Dict[str, List[float]]
+    # The same, among only the games where such a spell had been drawn.
+    on_curve_when_drawn: Dict[str, List[float]]
+    # Cards not found in the card cache, simulated as uncastable spells.
+    unknown_cards: List[str] = []
 
 class GenerateSpecRequest(BaseModel):
     """Defines the structure for a request to generate a deck spec."""
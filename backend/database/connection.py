@@ -1,11 +1,21 @@
 """
 Database connection and session management.
 
-This module configures the application's database engine and provides a
+This module configures the application's database engines and provides a
 function to initialize the database schema based on the defined SQLModels.
+
+Two engines share one configuration:
+- `engine` is synchronous, for scripts, background worker threads and startup.
+- `async_engine` drives `AsyncSession`s in request handlers, so a query never
+  blocks the event loop. It uses aiosqlite for SQLite and asyncpg for Postgres.
 """
 
+import os
 from pathlib import Path
+from typing import Any, Dict
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import SQLModel, create_engine
 from . import models  # noqa: F401 - Ensures models are registered with SQLModel metadata
 
@@ -13,15 +23,83 @@ from . import models  # noqa: F401 - Ensures models are registered with SQLModel
 # Construct an absolute path to the database file within the project's /data directory.
 # This approach ensures the path is correct regardless of where the application is run from.
 DB_FILE = Path(__file__).parent.parent.parent / "data" / "mtg_collection.db"
-DATABASE_URL = f"sqlite:///{DB_FILE.resolve()}"
+# The location can be overridden with the DATABASE_URL environment variable.
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_FILE.resolve()}")
+# The async engine uses the same database through an async driver. Override
+# ASYNC_DATABASE_URL to pick a different driver.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+_scheme, _location = DATABASE_URL.split("://", 1)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or f"{ASYNC_DRIVERS.get(_scheme.split('+')[0], _scheme)}://{_location}"
+# Log every generated SQL statement. Useful for debugging, far too noisy for production.
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+# Connection pool sizing. Ingestion workers, request handlers and scripts each
+# hold a connection while they work.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
 # --- End Configuration ---
 
-# The database engine is the central access point to the database.
-# - `echo=True` logs all generated SQL statements, which is useful for debugging.
-#   This should be set to `False` in a production environment.
-# - `connect_args` is required for SQLite to allow the database connection
-#   to be shared across multiple threads, which is necessary for FastAPI.
-engine = create_engine(DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+# --- SQLite Storage Profile ---
+# Applied to every new SQLite connection. The defaults suit a single server
+# process with concurrent uploads and deck builds:
+# - WAL lets readers proceed while a writer commits, instead of blocking on it.
+# - synchronous=NORMAL is durable against application crashes in WAL mode and
+#   only risks the last commits on power loss, in exchange for far fewer fsyncs.
+# - mmap_size and cache_size keep the hot card cache pages in memory.
+#   A negative cache_size is in KiB rather than pages.
+# - busy_timeout makes a writer wait for a competing writer rather than fail.
+SQLITE_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024))),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+# --- End SQLite Storage Profile ---
+
+def enable_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]):
+    """Applies the given PRAGMA settings to every connection the engine opens."""
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def _engine_options(database_url: str) -> Dict[str, Any]:
+    """Returns the engine keyword arguments shared by the sync and async engines."""
+    options: Dict[str, Any] = {"echo": DB_ECHO}
+    pool_options = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT_SECONDS}
+    if not database_url.startswith("sqlite"):
+        return {**options, **pool_options}
+
+    # `check_same_thread` is disabled so pooled connections can be used by the
+    # worker threads FastAPI and the ingestion jobs run on.
+    options["connect_args"] = {"check_same_thread": False}
+    # An in-memory database lives in a single connection, so it cannot be pooled.
+    if database_url.split("://", 1)[1] not in ("", "/:memory:"):
+        options.update(pool_options)
+    return options
+
+def _create_engine() -> Engine:
+    """Builds the synchronous application engine."""
+    sync_engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+    if DATABASE_URL.startswith("sqlite"):
+        enable_sqlite_pragmas(sync_engine, SQLITE_PRAGMAS)
+    return sync_engine
+
+def _create_async_engine() -> AsyncEngine:
+    """Builds the asynchronous application engine."""
+    new_async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+    if ASYNC_DATABASE_URL.startswith("sqlite"):
+        # Connection events are emitted by the sync engine the async one wraps.
+        enable_sqlite_pragmas(new_async_engine.sync_engine, SQLITE_PRAGMAS)
+    return new_async_engine
+
+# The database engines are the central access points to the database.
+engine = _create_engine()
+async_engine = _create_async_engine()
 
 def create_db_and_tables():
     """
@@ -32,4 +110,31 @@ def create_db_and_tables():
     """
     print(f"Initializing database at: {DATABASE_URL}")
     SQLModel.metadata.create_all(engine)
-    print("Database tables created or verified successfully.")
\ No newline at end of file
+    _upgrade_existing_tables()
+    print("Database tables created or verified successfully.")
+
+def _upgrade_existing_tables():
+    """
+    Brings tables created by an older version of the models up to date.
+
+    `create_all` only creates missing tables, so columns and indexes added to
+    a model later are applied here. New columns must be nullable or declare a
+    server default so existing rows remain valid.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    column_ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    column_ddl += " NOT NULL"
+                print(f"Adding column '{column.name}' to table '{table.name}'.")
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
\ No newline at end of file
@@ -6,7 +6,9 @@ cache for Scryfall card data and the user's personal card collection.
 """
 
 import uuid
+from datetime import datetime
 from typing import List, Optional, Dict
+from sqlalchemy import Index
 from sqlalchemy.dialects.sqlite import JSON
 from sqlmodel import Field, Relationship, SQLModel, Column
 
@@ -18,6 +20,13 @@ class ScryfallCardCache(SQLModel, table=True):
     preventing redundant API calls. Each row corresponds to a unique printing
     of a Magic: The Gathering card.
     """
+    __table_args__ = (
+        # Exact printing lookups by set code and collector number.
+        Index("ix_scryfallcardcache_set_collector", "set_code", "collector_number"),
+        # Name lookups restricted to a set.
+        Index("ix_scryfallcardcache_name_set", "name", "set_code"),
+    )
+
     # Scryfall's unique identifier for a specific card printing.
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
     name: str = Field(index=True)
@@ -38,6 +47,11 @@ class ScryfallCardCache(SQLModel, table=True):
     color_identity: List[str] = Field(sa_column=Column(JSON))
     keywords: List[str] = Field(sa_column=Column(JSON))
     legalities: Dict[str, str] = Field(sa_column=Column(JSON))
+
+    # --- Derived Filter Columns ---
+    # `color_identity` as a WUBRG bitmask (see `services.colors`), so color
+    # filtering can be done in SQL. NULL only for rows not yet backfilled.
+    color_identity_mask: Optional[int] = Field(default=None, index=True)
     image_uris: Optional[Dict[str, str]] = Field(default=None, sa_column=Column(JSON))
     
     # Card versioning information.
@@ -48,6 +62,17 @@ class ScryfallCardCache(SQLModel, table=True):
     edhrec_rank: Optional[int] = None
     price_usd: Optional[float] = None
 
+    # --- Cache Freshness ---
+    # When the row was last written from Scryfall data (UTC). Volatile fields
+    # such as prices are refreshed in bulk once this is old enough.
+    fetched_at: Optional[datetime] = Field(default=None, index=True)
+    # The version of the API-to-schema mapping that produced this row. Rows
+    # written by an older mapping are missing fields and are refetched.
+    schema_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # The version of the role classifier that produced this row's `CardRole`
+    # rows. Rows tagged by an older classifier are reclassified in bulk.
+    roles_version: int = Field(default=0, index=True, sa_column_kwargs={"server_default": "0"})
+
 class UserCard(SQLModel, table=True):
     """
     Represents a card within a user's uploaded collection.
@@ -55,6 +80,11 @@ class UserCard(SQLModel, table=True):
     Each row corresponds to a line item from the user's CSV file, linking a
     quantity of a specific card printing to their collection.
     """
+    __table_args__ = (
+        # Loading a collection joined to its cards, and finding a card within one.
+        Index("ix_usercard_collection_card", "collection_id", "scryfall_card_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     quantity: int
     is_foil: bool = Field(default=False)
@@ -71,4 +101,55 @@ class UserCard(SQLModel, table=True):
 
     # Optional fields imported from the user's CSV.
     condition: Optional[str] = None
-    language: Optional[str] = None
\ No newline at end of file
+    language: Optional[str] = None
+
+class Collection(SQLModel, table=True):
+    """
+    Records one uploaded collection, i.e. the `UserCard` rows sharing a `collection_id`.
+
+    The hash of the file the collection was last built from lets a byte-identical
+    re-upload be recognized without parsing it. Collections uploaded before this
+    table existed have no row here until they are next re-uploaded.
+    """
+    # The `collection_id` shared by the collection's `UserCard` rows.
+    id: str = Field(primary_key=True)
+    # SHA-256 hex digest of the uploaded CSV file; empty if some of its rows failed.
+    content_hash: str = Field(index=True)
+    # Row counts of the upload that produced the current contents.
+    total_rows: int = 0
+    successful_rows: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+class CardLegality(SQLModel, table=True):
+    """
+    One printing's legality in one format.
+
+    This normalizes `ScryfallCardCache.legalities` so that format filtering is
+    an indexed join rather than JSON parsing in Python. Rows are written
+    together with their cache row.
+    """
+    __table_args__ = (
+        Index("ix_cardlegality_format_status", "format", "status"),
+    )
+
+    card_id: uuid.UUID = Field(foreign_key="scryfallcardcache.id", primary_key=True)
+    format: str = Field(primary_key=True)
+    # Scryfall's status: "legal", "not_legal", "restricted" or "banned".
+    status: str
+
+class CardRole(SQLModel, table=True):
+    """
+    One functional role ("ramp", "removal", "threat"...) of one printing.
+
+    Roles are derived from the card's type line and oracle text by
+    `services.role_classifier` when the card is written to the cache, so deck
+    builds read them instead of running the classifier. The version of the
+    classifier that wrote them is kept in `ScryfallCardCache.roles_version`.
+    """
+    __table_args__ = (
+        Index("ix_cardrole_role_card", "role", "card_id"),
+    )
+
+    card_id: uuid.UUID = Field(foreign_key="scryfallcardcache.id", primary_key=True)
+    role: str = Field(primary_key=True)
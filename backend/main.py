@@ -1,21 +1,37 @@
 """
 Main entry point for the FastAPI application.
 """
+import asyncio
 import re
+import shutil
+import tempfile
 from contextlib import asynccontextmanager
-from typing import List
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 
 # --- Application Service Imports ---
-from .database.connection import create_db_and_tables
+from sqlmodel import Session
+from .database.connection import async_engine, engine, create_db_and_tables
 from .services.rag_retriever import rag_retriever
 from .services.llm_provider import llm_provider
-from .services.collection_ingestor import process_collection_csv
-from .services.deck_builder import build_deck # New import
+from .services.collection_ingestor import CollectionNotFoundError, process_collection_csv_async
+from .services.ingestion_jobs import IngestionJob, ingestion_job_manager
+from .services.deck_builder import build_deck_async, build_decks_async, shutdown_deck_build_executor
+from .services.card_enrichment import backfill_card_filters, card_lookup_cache
+from .services.color_recommender import recommend_colors_async
+from .services.deck_optimizer import optimize_deck_async
+from .services.deck_simulator import simulate_decklist_async
+from .services.cache import CacheStats
+from .services.name_index import card_name_index
+from .services.pool_cache import analyzed_pool_cache
+from .services.role_classifier import reclassify_card_roles
 from .api_models import (
     ChatRequest, ChatResponse, RuleSnippet, CollectionResponse,
-    DeckSpec, Decklist, BuildDeckRequest, GenerateSpecRequest # New imports
+    DeckSpec, Decklist, BuildDeckRequest, BuildDeckBatchRequest, GenerateSpecRequest,
+    SimulateDeckRequest, SimulationReport, RecommendColorsRequest, ColorRecommendation
 )
 
 # ... (SYSTEM_PROMPT and lifespan are the same as the last version) ...
@@ -34,6 +50,7 @@ DECK_SPEC_PROMPT = """You are a master deckbuilder AI. Your task is to analyze a
 - The format must be one of: "commander", "modern", "standard", "pioneer".
 - The color_identity must be a list of color codes: "W", "U", "B", "R", "G".
 - Base the target counts on established deck-building principles for the given format and strategy. Aggressive decks have more creatures and a lower land count. Control decks have fewer creatures, more draw/removal, and more lands.
+- If the user names a strategy or mechanic (e.g. "+1/+1 counters", "tokens"), put a short description of it in "theme". If they name a commander, put its exact card name in "commander". Otherwise leave both out.
 - The output MUST be a valid JSON object that conforms to the DeckSpec model. Do not include any other text, explanation, or markdown formatting.
 
 **Example:**
@@ -47,7 +64,8 @@ DECK_SPEC_PROMPT = """You are a master deckbuilder AI. Your task is to analyze a
   "target_ramp": 4,
   "target_draw": 2,
   "target_board_wipes": 0,
-  "target_lands": 22
+  "target_lands": 22,
+  "theme": "+1/+1 counters"
 }
 """
 
@@ -55,8 +73,16 @@ DECK_SPEC_PROMPT = """You are a master deckbuilder AI. Your task is to analyze a
 async def lifespan(app: FastAPI):
     print("Application startup...")
     create_db_and_tables()
+    backfill_card_filters()
+    reclassify_card_roles()
+    # Build the card name index up front so the first upload does not pay for it.
+    with Session(engine) as session:
+        card_name_index.ensure_loaded(session)
     print("Initialization complete.")
     yield
+    ingestion_job_manager.shutdown()
+    shutdown_deck_build_executor()
+    await async_engine.dispose()
     print("Application shutdown.")
 
 # =============================================================================
@@ -67,17 +93,86 @@ router = APIRouter(prefix="/api/v1")
 # --- Endpoints ---
 
 @router.post("/collections/upload", response_model=CollectionResponse, tags=["Collection Management"])
-async def handle_collection_upload(file: UploadFile = File(...)):
-    # ... (This endpoint is unchanged) ...
+async def handle_collection_upload(file: UploadFile = File(...), collection_id: Optional[str] = None):
+    """
+    Ingests a collection CSV. Pass `collection_id` to re-upload into an existing
+    collection; only the cards that changed are written.
+    """
     if not file.filename or not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Please upload a CSV file.")
     try:
-        result = process_collection_csv(file.file)
-        if result.failed_rows > 0 and result.successful_rows == 0:
-            raise HTTPException(status_code=422, detail=f"Failed to process CSV. First error: {result.failures[0]}")
-        return CollectionResponse(collection_id=result.collection_id, message=f"Ingested {result.successful_rows}/{result.total_rows} rows.", total_rows=result.total_rows, successful_rows=result.successful_rows)
+        result = await process_collection_csv_async(file.file, collection_id=collection_id)
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if result.failed_rows > 0 and result.successful_rows == 0:
+        raise HTTPException(status_code=422, detail=f"Failed to process CSV. First error: {result.failures[0]}")
+
+    message = f"Ingested {result.successful_rows}/{result.total_rows} rows."
+    if result.unchanged:
+        message = f"Collection unchanged since its last upload ({result.successful_rows}/{result.total_rows} rows)."
+    elif collection_id and result.changes:
+        message += f" {result.changes.added} cards added, {result.changes.updated} updated, {result.changes.removed} removed."
+    return CollectionResponse(collection_id=result.collection_id, message=message, total_rows=result.total_rows, successful_rows=result.successful_rows)
+
+# How often the event stream checks a job for new progress.
+JOB_EVENT_POLL_SECONDS = 0.5
+
+def _spool_upload(file: UploadFile) -> Path:
+    """Copies an upload to a temporary file that outlives the request."""
+    with tempfile.NamedTemporaryFile(prefix="mtg-upload-", suffix=".csv", delete=False) as spooled:
+        shutil.copyfileobj(file.file, spooled)
+    return Path(spooled.name)
+
+@router.post("/collections/jobs", response_model=IngestionJob, status_code=202, tags=["Collection Management"])
+async def handle_collection_job_upload(file: UploadFile = File(...), collection_id: Optional[str] = None):
+    """
+    Queues a collection CSV for background ingestion and returns immediately.
+    Pass `collection_id` to re-upload into an existing collection.
+
+    Poll `/collections/jobs/{job_id}` or stream `/collections/jobs/{job_id}/events`
+    to follow its progress.
+    """
+    if not file.filename or not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Please upload a CSV file.")
+    csv_path = await run_in_threadpool(_spool_upload, file)
+    return ingestion_job_manager.submit(csv_path, file.filename, collection_id=collection_id)
+
+@router.get("/collections/jobs/{job_id}", response_model=IngestionJob, tags=["Collection Management"])
+async def handle_collection_job_status(job_id: str):
+    """Reports the progress of a background upload and, once finished, its result."""
+    job = ingestion_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job '{job_id}' not found.")
+    return job
+
+@router.get("/collections/jobs/{job_id}/events", tags=["Collection Management"])
+async def handle_collection_job_events(job_id: str):
+    """
+    Streams a background upload's progress as Server-Sent Events.
+
+    A `progress` event is sent whenever the counters change, followed by a
+    single `completed` or `failed` event carrying the full job state.
+    """
+    if ingestion_job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job '{job_id}' not found.")
+
+    async def event_stream() -> AsyncIterator[str]:
+        last_progress = None
+        while True:
+            job = ingestion_job_manager.get(job_id)
+            if job is None:
+                return
+            if job.is_finished:
+                yield f"event: {job.status.value}\ndata: {job.json()}\n\n"
+                return
+            if job.progress != last_progress:
+                last_progress = job.progress
+                yield f"event: progress\ndata: {job.progress.json()}\n\n"
+            await asyncio.sleep(JOB_EVENT_POLL_SECONDS)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @router.post("/chat", tags=["AI Assistant"])
 async def handle_chat(request: ChatRequest):
@@ -90,17 +185,65 @@ async def handle_chat(request: ChatRequest):
 async def handle_build_deck(request: BuildDeckRequest):
     """
     Takes a collection ID and a deck specification and builds a deck using the
-    heuristic algorithm.
+    heuristic algorithm. With `optimize` set, the heuristic deck is then improved
+    by local search within the given time budget.
     """
     print(f"Received deck build request for collection: {request.collection_id}")
     try:
         # Call the core deck building logic from our service.
-        decklist = build_deck(collection_id=request.collection_id, spec=request.spec)
+        if request.optimize:
+            decklist = await optimize_deck_async(request.collection_id, request.spec, request.optimize)
+        else:
+            decklist = await build_deck_async(collection_id=request.collection_id, spec=request.spec)
         return decklist
     except Exception as e:
         print(f"ERROR during deck construction: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred while building the deck.")
 
+@router.post("/decks/build-batch", response_model=List[Decklist], tags=["Deck Builder"])
+async def handle_build_deck_batch(request: BuildDeckBatchRequest):
+    """
+    Builds one deck per specification from the same collection, e.g. to compare
+    color pairs or land counts. The collection is loaded once and the decks are
+    built in parallel. Decklists are returned in the order of the specs.
+    """
+    print(f"Received batch deck build request for collection {request.collection_id} with {len(request.specs)} specs.")
+    try:
+        return await build_decks_async(collection_id=request.collection_id, specs=request.specs)
+    except Exception as e:
+        print(f"ERROR during batch deck construction: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred while building the decks.")
+
+@router.post("/decks/recommend-colors", response_model=List[ColorRecommendation], tags=["Deck Builder"])
+async def handle_recommend_colors(request: RecommendColorsRequest):
+    """
+    Ranks the color identities the collection best supports for the spec's
+    format and role targets, and optionally builds decks for the best few.
+    """
+    print(f"Received color recommendation request for collection: {request.collection_id}")
+    try:
+        return await recommend_colors_async(
+            request.collection_id, request.spec, top_k=request.top_k, build_top=request.build_top, max_colors=request.max_colors
+        )
+    except Exception as e:
+        print(f"ERROR during color recommendation: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred while recommending colors.")
+
+@router.post("/decks/simulate", response_model=SimulationReport, tags=["Deck Builder"])
+async def handle_simulate_deck(request: SimulateDeckRequest):
+    """
+    Goldfishes a decklist: simulates opening hands, mulligans and early turns
+    to report the mulligan rate, the chance of making land drops and the
+    chance of casting spells on curve by color.
+    """
+    try:
+        return await simulate_decklist_async(request.decklist, request.settings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"ERROR during deck simulation: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred while simulating the deck.")
+
 @router.post("/decks/generate-spec", response_model=DeckSpec, tags=["Deck Builder"])
 async def handle_generate_spec(request: GenerateSpecRequest):
     """
@@ -132,4 +275,9 @@ app = FastAPI(
 )
 app.include_router(router)
 @app.get("/health", tags=["Status"])
-def health_check(): return {"status": "ok"}
\ No newline at end of file
+def health_check(): return {"status": "ok"}
+
+@app.get("/cache/stats", response_model=Dict[str, CacheStats], tags=["Status"])
+def cache_stats():
+    """Reports hit, miss and eviction counters for the in-process caches."""
+    return {"card_lookup": card_lookup_cache.stats(), "analyzed_pool": analyzed_pool_cache.stats()}
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+A small, thread-safe in-process cache with LRU eviction and per-entry expiry.
+
+The cache can also remember that a key has no value ("negative caching"), so a
+lookup that is known to fail is not retried until its entry expires. Besides
+the entry count, the cache can be bounded by the estimated size of its values
+in bytes. Hit, miss and eviction counters are kept so the cache can be sized
+for real traffic.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from pydantic import BaseModel
+
+# Returned by `LRUCache.get` when the key is not cached at all. A cached
+# negative result is returned as `None` instead.
+MISSING = object()
+
+class CacheStats(BaseModel):
+    """A snapshot of a cache's counters."""
+    size: int
+    max_size: int
+    hits: int
+    negative_hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    hit_rate: float
+    # Only reported by caches bounded by size in bytes.
+    bytes: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+class LRUCache:
+    """A bounded mapping that evicts the least recently used entry when full."""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        size_of: Optional[Callable[[Any], int]] = None,
+    ):
+        """
+        Args:
+            max_size: The maximum number of entries, including negative ones.
+            ttl_seconds: How long a value stays valid after it is stored.
+            negative_ttl_seconds: How long a negative entry stays valid.
+                Defaults to `ttl_seconds`.
+            max_bytes: The maximum total size of the cached values, as
+                estimated by `size_of`. Unbounded when `None`.
+            size_of: Estimates a value's size in bytes. Required with `max_bytes`.
+        """
+        if max_bytes is not None and size_of is None:
+            raise ValueError("A cache bounded by bytes needs a size_of function.")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = ttl_seconds if negative_ttl_seconds is None else negative_ttl_seconds
+        self.max_bytes = max_bytes
+        self._size_of = size_of
+        self._bytes = 0
+        # key -> (value, expires_at, size in bytes)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Looks up a key, refreshing its recency on a hit.
+
+        Returns:
+            The cached value, `None` for a cached negative result, or `MISSING`
+            if the key is absent or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return MISSING
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            if value is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Stores a value. Storing `None` records a negative result. A value
+        larger than `max_bytes` on its own is not stored.
+        """
+        ttl = self.negative_ttl_seconds if value is None else self.ttl_seconds
+        size = self._size_of(value) if self._size_of and value is not None else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_size or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def set_missing(self, key: Hashable):
+        """Records that the key is known to have no value."""
+        self.set(key, None)
+
+    def invalidate(self, key: Hashable):
+        """Removes a single entry if present."""
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes every entry whose key satisfies `predicate`, returning how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        """Removes every entry. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        """Removes an entry and releases its size. Must hold the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def stats(self) -> CacheStats:
+        """Returns a snapshot of the cache's counters."""
+        with self._lock:
+            lookups = self._hits + self._negative_hits + self._misses
+            return CacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                hits=self._hits,
+                negative_hits=self._negative_hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                hit_rate=(self._hits + self._negative_hits) / lookups if lookups else 0.0,
+                bytes=self._bytes if self.max_bytes is not None else None,
+                max_bytes=self.max_bytes,
+            )
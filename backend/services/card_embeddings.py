@@ -0,0 +1,261 @@
+"""
+An index of sentence embeddings of card rules text, for theme synergy scoring.
+
+Each card's type line and oracle text are embedded once with the
+sentence-transformer model instance the rules search uses (see
+`embedding_model`), and the vectors are kept in one matrix persisted to
+`CARD_EMBEDDINGS_PATH`, a row per card name (every printing of a card has the
+same rules text). Rows are unit vectors,
+so the synergy of a whole pool with a theme is a single matrix-vector
+product of its rows with the theme's vector.
+
+The index is built, and later extended, by `scripts/build_card_embeddings.py`.
+An update only embeds cards that are not in the index yet, or whose text has
+changed since they were embedded, so it stays cheap as the card cache grows.
+
+Only building the index and embedding free-text themes need the model, which
+is loaded on first use; commander synergy and lookups only need NumPy.
+Without an index, or a model for a theme, synergy is simply not scored.
+"""
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from ..database.connection import engine
+from ..database.models import ScryfallCardCache
+from .cache import MISSING, LRUCache
+from .embedding_model import EMBEDDING_MODEL_NAME, get_embedding_function
+
+# --- Configuration ---
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+CARD_EMBEDDINGS_PATH = Path(os.getenv("CARD_EMBEDDINGS_PATH", str(PROJECT_ROOT / "data" / "card_embeddings.npz")))
+# Texts per model batch, and cards embedded before the index is saved.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_SAVE_INTERVAL = 20_000
+# --- End Configuration ---
+
+def card_text(name: str, type_line: Optional[str], oracle_text: Optional[str]) -> str:
+    """
+    The text a card is embedded from: its type line and rules text, with the
+    card's own name replaced so that it does not count as theme vocabulary.
+    """
+    rules_text = (oracle_text or "").replace(name, "this card")
+    return f"{type_line or ''}\n{rules_text}".strip()
+
+def text_digest(text: str) -> str:
+    """A short fingerprint of an embedded text, to notice changed rules text."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+class CardEmbeddingIndex:
+    """
+    Unit-length text embeddings by card name, with the fingerprint of the
+    text each was computed from.
+    """
+
+    def __init__(self, names: List[str], digests: List[str], vectors: np.ndarray, model_name: str = EMBEDDING_MODEL_NAME):
+        self.names = names
+        self.digests = digests
+        self.vectors = vectors
+        self.model_name = model_name
+        self.row_by_name: Dict[str, int] = {name: row for row, name in enumerate(names)}
+
+    @classmethod
+    def empty(cls, dimensions: int = 0) -> "CardEmbeddingIndex":
+        return cls([], [], np.zeros((0, dimensions), dtype=np.float32))
+
+    @classmethod
+    def load(cls, path: Path = CARD_EMBEDDINGS_PATH) -> "CardEmbeddingIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["names"].tolist(), data["digests"].tolist(), data["vectors"], str(data["model_name"]))
+
+    def save(self, path: Path = CARD_EMBEDDINGS_PATH):
+        """Writes the index to a temporary file first, so readers never see a partial one."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.stem}.tmp.npz")
+        np.savez(
+            temporary_path, names=np.array(self.names, dtype=str), digests=np.array(self.digests, dtype=str),
+            vectors=self.vectors, model_name=np.array(self.model_name),
+        )
+        os.replace(temporary_path, path)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def vector(self, name: str) -> Optional[np.ndarray]:
+        row = self.row_by_name.get(name)
+        return None if row is None else self.vectors[row]
+
+    def upsert(self, names: List[str], digests: List[str], vectors: np.ndarray):
+        """Adds or replaces the rows of the given cards."""
+        new_rows = []
+        for name, digest, vector in zip(names, digests, vectors):
+            row = self.row_by_name.get(name)
+            if row is None:
+                self.row_by_name[name] = len(self.names) + len(new_rows)
+                new_rows.append((name, digest, vector))
+            else:
+                self.digests[row] = digest
+                self.vectors[row] = vector
+        if new_rows:
+            self.names.extend(name for name, _, _ in new_rows)
+            self.digests.extend(digest for _, digest, _ in new_rows)
+            added = np.array([vector for _, _, vector in new_rows], dtype=np.float32)
+            self.vectors = added if not len(self.vectors) else np.concatenate([self.vectors, added])
+
+    def similarities(self, names: List[str], query: np.ndarray) -> np.ndarray:
+        """
+        The cosine similarity of each named card to a unit query vector, or
+        NaN for cards that are not in the index.
+        """
+        rows = np.array([self.row_by_name.get(name, -1) for name in names], dtype=np.int64)
+        similarities = np.full(len(names), np.nan)
+        indexed = rows >= 0
+        if indexed.any():
+            similarities[indexed] = self.vectors[rows[indexed]] @ query
+        return similarities
+
+# =============================================================================
+# Embedding Model
+# =============================================================================
+
+# Embedded themes; failures are not cached, so a model that loads later is used.
+theme_vector_cache = LRUCache(max_size=256, ttl_seconds=24 * 3600)
+
+def embed_texts(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    """Embeds texts as unit-length float32 rows, `batch_size` texts per model call."""
+    embedding_function = get_embedding_function()
+    batches = [embedding_function(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+    vectors = np.array([vector for batch in batches for vector in batch], dtype=np.float32).reshape(len(texts), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+def embed_theme(theme: str) -> Optional[np.ndarray]:
+    """
+    Embeds a free-text theme such as "+1/+1 counters". Returns `None` if the
+    embedding model cannot be loaded or fails.
+    """
+    vector = theme_vector_cache.get(theme)
+    if vector is not MISSING:
+        return vector
+    try:
+        vector = embed_texts([theme])[0]
+    except Exception as e:
+        print(f"Warning: could not embed deck theme '{theme}'; it is ignored. Error: {e}", file=sys.stderr)
+        return None
+    theme_vector_cache.set(theme, vector)
+    return vector
+
+# =============================================================================
+# Building the Index
+# =============================================================================
+
+def update_card_embeddings(
+    batch_size: int = EMBEDDING_BATCH_SIZE, force: bool = False, path: Path = CARD_EMBEDDINGS_PATH
+) -> Tuple[int, int]:
+    """
+    Embeds the cached cards that are missing from the index or whose text
+    changed, and saves the index. With `force`, or when the index was built
+    with another model, every card is embedded again.
+
+    Returns:
+        The number of cards embedded and the size of the index.
+    """
+    index = CardEmbeddingIndex.load(path) if path.exists() and not force else CardEmbeddingIndex.empty()
+    if index.model_name != EMBEDDING_MODEL_NAME:
+        print(f"Index was built with '{index.model_name}'; re-embedding every card with '{EMBEDDING_MODEL_NAME}'.")
+        index = CardEmbeddingIndex.empty()
+
+    texts_by_name: Dict[str, str] = {}
+    with Session(engine) as session:
+        statement = select(ScryfallCardCache.name, ScryfallCardCache.type_line, ScryfallCardCache.oracle_text)
+        for name, type_line, oracle_text in session.exec(statement):
+            if name not in texts_by_name:
+                texts_by_name[name] = card_text(name, type_line, oracle_text)
+
+    pending = []
+    for name, text in texts_by_name.items():
+        digest = text_digest(text)
+        row = index.row_by_name.get(name)
+        if row is None or index.digests[row] != digest:
+            pending.append((name, digest, text))
+    print(f"{len(pending)} of {len(texts_by_name)} cached cards need embedding.")
+
+    # Saved every `EMBEDDING_SAVE_INTERVAL` cards, so an interrupted run keeps its progress.
+    for start in range(0, len(pending), EMBEDDING_SAVE_INTERVAL):
+        chunk = pending[start:start + EMBEDDING_SAVE_INTERVAL]
+        vectors = embed_texts([text for _, _, text in chunk], batch_size)
+        index.upsert([name for name, _, _ in chunk], [digest for _, digest, _ in chunk], vectors)
+        index.save(path)
+        print(f"Embedded {start + len(chunk)}/{len(pending)} cards.")
+    if not pending and not path.exists():
+        index.save(path)
+    return len(pending), len(index)
+
+# =============================================================================
+# Synergy Lookup
+# =============================================================================
+
+_loaded_index: Optional[CardEmbeddingIndex] = None
+_loaded_mtime: Optional[float] = None
+
+def get_card_embedding_index(path: Path = CARD_EMBEDDINGS_PATH) -> Optional[CardEmbeddingIndex]:
+    """
+    Returns the persisted index, loading it on first use and again whenever
+    the file has been rewritten. Returns `None` if it has not been built.
+    """
+    global _loaded_index, _loaded_mtime
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if _loaded_index is None or mtime != _loaded_mtime:
+        _loaded_index = CardEmbeddingIndex.load(path)
+        _loaded_mtime = mtime
+        print(f"Loaded {len(_loaded_index)} card embeddings from {path}.")
+    return _loaded_index
+
+def synergy_query(index: CardEmbeddingIndex, theme: Optional[str], commander: Optional[str]) -> Optional[np.ndarray]:
+    """
+    The unit vector cards are compared to: the theme's embedding, the
+    commander's, or their normalized sum when both are given.
+    """
+    parts = []
+    if theme:
+        theme_vector = embed_theme(theme)
+        if theme_vector is not None:
+            parts.append(theme_vector)
+    if commander:
+        commander_vector = index.vector(commander)
+        if commander_vector is None:
+            print(f"Warning: commander '{commander}' is not in the card embedding index; it is ignored.", file=sys.stderr)
+        else:
+            parts.append(commander_vector)
+    if not parts:
+        return None
+    query = np.sum(parts, axis=0, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    return query / norm if norm > 0 else None
+
+def card_synergies(names: List[str], theme: Optional[str], commander: Optional[str]) -> Optional[np.ndarray]:
+    """
+    The cosine similarity of each named card to a theme and/or commander, NaN
+    for cards without an embedding. Returns `None` when there is nothing to
+    compare to: no theme or commander, no index, or no embedding model for a
+    theme.
+    """
+    if not theme and not commander:
+        return None
+    index = get_card_embedding_index()
+    if index is None:
+        print("Warning: no card embedding index; run 'python -m scripts.build_card_embeddings' to score synergy.", file=sys.stderr)
+        return None
+    query = synergy_query(index, theme, commander)
+    if query is None:
+        return None
+    return index.similarities(names, query)
@@ -1,85 +1,689 @@
 """
 Service layer for enriching card data with a database caching mechanism.
+
+Lookups pass through several local tiers before reaching Scryfall: a bounded
+in-process LRU keyed by normalized (name, set code), which also remembers
+recent "not found" results; a name index over the cached catalog that handles
+casing, accents, face names and typos; and the `ScryfallCardCache` table.
 """
+import asyncio
+import os
 import uuid
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import bindparam, inspect as sa_inspect, tuple_, update
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Session, select
-from ..database.connection import engine
-from ..database.models import ScryfallCardCache
-from .scryfall_client import scryfall_client, ScryfallCard
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..database.connection import async_engine, engine
+from ..database.models import CardLegality, ScryfallCardCache
+from .cache import LRUCache, MISSING
+from .colors import color_identity_mask
+from .name_index import card_name_index
+from .pool_cache import analyzed_pool_cache
+from .role_classifier import store_card_roles
+from .scryfall_client import scryfall_client, AsyncScryfallClient, ScryfallCard
+
+# SQLite limits the number of bound parameters per statement, so large IN
+# clauses are split into chunks of this size.
+SQL_IN_CLAUSE_CHUNK_SIZE = 500
+
+# --- Freshness Policy ---
+# Bump this whenever `scryfall_card_to_row` starts populating new fields, so rows
+# written by the old mapping are refetched the next time they are looked up.
+CARD_SCHEMA_VERSION = 1
+# Prices change daily; rows older than this are picked up by the bulk refresh.
+# Static fields (names, oracle text, legalities...) are never refreshed by age.
+CARD_PRICE_MAX_AGE_DAYS = float(os.getenv("CARD_PRICE_MAX_AGE_DAYS", "7"))
+# --- End Policy ---
+
+# --- In-Process Lookup Cache Configuration ---
+CARD_CACHE_MAX_SIZE = int(os.getenv("CARD_CACHE_MAX_SIZE", "50000"))
+CARD_CACHE_TTL_SECONDS = float(os.getenv("CARD_CACHE_TTL_SECONDS", "3600"))
+CARD_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("CARD_CACHE_NEGATIVE_TTL_SECONDS", "600"))
+# --- End Configuration ---
+
+# Holds detached snapshots of cache rows, or None for names Scryfall could not find.
+card_lookup_cache = LRUCache(
+    max_size=CARD_CACHE_MAX_SIZE,
+    ttl_seconds=CARD_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=CARD_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+class CardIdentifier(NamedTuple):
+    """
+    The fields a collection row provides to identify a card.
+
+    When both a set code and a collector number are present the identifier
+    names one exact printing, which is resolved before falling back to the name.
+    """
+    name: str
+    set_code: Optional[str] = None
+    collector_number: Optional[str] = None
+
+    @property
+    def is_printing(self) -> bool:
+        """True if this identifier pins down a single printing."""
+        return bool(self.set_code and self.collector_number)
 
 def get_or_create_scryfall_card(
     card_name: str, 
     set_code: Optional[str] = None, 
-    db_session: Optional[Session] = None
+    db_session: Optional[Session] = None,
+    collector_number: Optional[str] = None
 ) -> Optional[ScryfallCardCache]:
-    """Retrieves a card's data, utilizing a read-through database cache."""
+    """
+    Retrieves a card's data, utilizing a read-through database cache.
+
+    If both `set_code` and `collector_number` are given, that exact printing is
+    looked up first; the name is only used if the printing cannot be found.
+    """
+    identifier = CardIdentifier(card_name, set_code, collector_number)
     if db_session:
-        return _get_or_create(card_name, set_code, db_session)
+        return _get_or_create(identifier, db_session)
     else:
         with Session(engine) as session:
-            return _get_or_create(card_name, set_code, session)
+            return _get_or_create(identifier, session)
 
-def _get_or_create(
-    card_name: str, 
-    set_code: Optional[str], 
-    session: Session
-) -> Optional[ScryfallCardCache]:
+def _get_or_create(identifier: CardIdentifier, session: Session) -> Optional[ScryfallCardCache]:
     """Core caching logic that requires an active database session."""
+    cache_key = _cache_key(identifier)
+    remembered = card_lookup_cache.get(cache_key)
+    if remembered is not MISSING:
+        return _attach(session, remembered)
+
+    if identifier.is_printing:
+        printing = _get_or_create_printing(identifier, session)
+        if printing:
+            card_lookup_cache.set(cache_key, _snapshot(printing))
+            return printing
+
+    card_name, set_code = identifier.name, identifier.set_code
+    card_name_index.ensure_loaded(session)
+    indexed_id = card_name_index.resolve(card_name, set_code)
+    if indexed_id:
+        indexed_card = session.get(ScryfallCardCache, indexed_id)
+        if indexed_card and not needs_refetch(indexed_card):
+            card_lookup_cache.set(cache_key, _snapshot(indexed_card))
+            return indexed_card
+
     statement = select(ScryfallCardCache).where(ScryfallCardCache.name == card_name)
     if set_code:
         statement = statement.where(ScryfallCardCache.set_code == set_code)
     
     cached_card = session.exec(statement).first()
     if cached_card:
-        # --- NEW: Check if the cached card has our new quality data ---
-        # If not, we'll proceed to fetch it. This allows for graceful upgrades.
-        if cached_card.edhrec_rank is not None:
-            print(f"CACHE HIT: Found '{card_name}' in local database.")
+        # Rows written by an older schema mapping are missing fields, so they
+        # are refetched once. Everything else is served as-is; volatile fields
+        # are refreshed in bulk by `refresh_stale_cards`, not on this path.
+        if not needs_refetch(cached_card):
+            card_lookup_cache.set(cache_key, _snapshot(cached_card))
             return cached_card
-        print(f"CACHE UPDATE: Found '{card_name}' but missing quality metrics. Refetching.")
+        print(f"CACHE UPDATE: Found '{card_name}' from an older schema version. Refetching.")
 
     scryfall_card_data = scryfall_client.get_card_by_name(card_name, set_code)
     if not scryfall_card_data:
+        card_lookup_cache.set_missing(cache_key)
         return None
 
-    # If we are updating an existing entry, use the one we found.
-    # Otherwise, create a new one.
-    db_card = cached_card or _convert_scryfall_to_db_model(scryfall_card_data)
-    
-    # Update the fields with the latest data
-    _update_db_model_from_scryfall(db_card, scryfall_card_data)
-    
-    session.add(db_card)
-    session.commit()
-    session.refresh(db_card)
-    
-    print(f"CACHE WRITE/UPDATE: Saved '{db_card.name}' ({db_card.set_code.upper()}) to cache.")
+    db_card = _store_fetched_card(session, scryfall_card_data)
+    card_lookup_cache.set(cache_key, _snapshot(db_card))
     return db_card
 
-def _convert_scryfall_to_db_model(scryfall_card: ScryfallCard) -> ScryfallCardCache:
-    """Helper function to map Scryfall API data to our database schema for a new card."""
-    return ScryfallCardCache(id=uuid.UUID(scryfall_card.id))
+def _get_or_create_printing(identifier: CardIdentifier, session: Session) -> Optional[ScryfallCardCache]:
+    """Resolves an exact printing with one indexed query, fetching it by set and number on a miss."""
+    statement = select(ScryfallCardCache).where(
+        ScryfallCardCache.set_code == identifier.set_code.lower(),
+        ScryfallCardCache.collector_number == identifier.collector_number,
+    )
+    cached_card = session.exec(statement).first()
+    if cached_card and not needs_refetch(cached_card):
+        return cached_card
+
+    scryfall_card_data = scryfall_client.get_card_by_set_and_number(identifier.set_code, identifier.collector_number)
+    if not scryfall_card_data:
+        return None
+
+    return _store_fetched_card(session, scryfall_card_data)
+
+def _store_fetched_card(session: Session, scryfall_card: ScryfallCard) -> ScryfallCardCache:
+    """Writes one fetched card with a single upsert statement and returns its cache row."""
+    upsert_scryfall_cards(session, [scryfall_card])
+    session.commit()
+    card_id = uuid.UUID(scryfall_card.id)
+    card_name_index.add(card_id, scryfall_card.name, scryfall_card.set)
+    print(f"CACHE WRITE/UPDATE: Saved '{scryfall_card.name}' ({scryfall_card.set.upper()}) to cache.")
+    return session.get(ScryfallCardCache, card_id)
+
+def get_or_create_scryfall_cards(
+    identifiers: Iterable[CardIdentifier],
+    db_session: Optional[Session] = None,
+    fetched_identifiers: Optional[Set[CardIdentifier]] = None
+) -> Dict[CardIdentifier, Optional[ScryfallCardCache]]:
+    """
+    Resolves many cards at once, utilizing the same read-through cache.
+
+    Cards are served from the in-process cache first, then from the database
+    with a handful of `IN` queries. All remaining misses are fetched
+    through Scryfall's collection endpoint (75 cards per request), and any names
+    that endpoint cannot match exactly are taken as typos: they are matched
+    against the cached names with `CardNameIndex.resolve_typo`, and only then
+    fall back to the fuzzy single-card lookup. New cache rows are written in one transaction.
+
+    Args:
+        identifiers: The cards to resolve. Duplicates are resolved once.
+        db_session: An optional active session to reuse.
+        fetched_identifiers: If given, receives the identifiers that had to be
+            fetched from Scryfall rather than served from a local cache.
+
+    Returns:
+        A mapping from each identifier to its cached card, or `None` if the card
+        could not be found.
+    """
+    if db_session:
+        return _get_or_create_batch(identifiers, db_session, fetched_identifiers)
+    else:
+        with Session(engine) as session:
+            return _get_or_create_batch(identifiers, session, fetched_identifiers)
+
+async def get_or_create_scryfall_cards_async(
+    identifiers: Iterable[CardIdentifier],
+    db_session: Optional[AsyncSession] = None,
+    fetched_identifiers: Optional[Set[CardIdentifier]] = None
+) -> Dict[CardIdentifier, Optional[ScryfallCardCache]]:
+    """
+    Async counterpart of `get_or_create_scryfall_cards`.
+
+    Database access goes through an `AsyncSession` and cache misses are fetched
+    with `AsyncScryfallClient`, so the event loop stays free to serve other
+    requests while this call waits on either.
+    """
+    if db_session:
+        return await _get_or_create_batch_async(identifiers, db_session, fetched_identifiers)
+    else:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            return await _get_or_create_batch_async(identifiers, session, fetched_identifiers)
+
+def _get_or_create_batch(
+    identifiers: Iterable[CardIdentifier],
+    session: Session,
+    fetched_identifiers: Optional[Set[CardIdentifier]] = None
+) -> Dict[CardIdentifier, Optional[ScryfallCardCache]]:
+    """Core batch caching logic that requires an active database session."""
+    unique_identifiers = list(dict.fromkeys(identifiers))
+    results, pending = _resolve_from_memory(session, unique_identifiers)
+    if not pending:
+        return results
+    resolved_ids, misses = _resolve_from_cache(session, pending)
+
+    fetched_cards: Dict[uuid.UUID, ScryfallCard] = {}
+    if misses:
+        print(f"CACHE MISS: Resolving {len(misses)} cards from Scryfall.")
+        found, _ = scryfall_client.get_cards_batch([_to_scryfall_identifier(i) for i in misses])
+        unmatched = _match_fetched_cards(misses, found, resolved_ids, fetched_cards)
+        unmatched = _resolve_typos(unmatched, resolved_ids)
+
+        for identifier in unmatched:
+            # The collection endpoint only matches exact names and printings;
+            # give the fuzzy name search a chance to handle typos, partial
+            # names and unknown collector numbers.
+            scryfall_card = scryfall_client.get_card_by_name(identifier.name, identifier.set_code)
+            _record_fetched_card(identifier, scryfall_card, resolved_ids, fetched_cards)
+
+    results.update(_store_fetched_cards(session, pending, resolved_ids, fetched_cards))
+    if fetched_identifiers is not None:
+        fetched_identifiers.update(i for i, card_id in resolved_ids.items() if card_id in fetched_cards)
+    return results
+
+async def _get_or_create_batch_async(
+    identifiers: Iterable[CardIdentifier],
+    session: AsyncSession,
+    fetched_identifiers: Optional[Set[CardIdentifier]] = None
+) -> Dict[CardIdentifier, Optional[ScryfallCardCache]]:
+    """
+    Async variant of `_get_or_create_batch`.
+
+    The database steps are the same synchronous functions, run through
+    `AsyncSession.run_sync` so their queries are awaited on the async driver.
+    """
+    unique_identifiers = list(dict.fromkeys(identifiers))
+    results, pending = await session.run_sync(_resolve_from_memory, unique_identifiers)
+    if not pending:
+        return results
+    resolved_ids, misses = await session.run_sync(_resolve_from_cache, pending)
+
+    fetched_cards: Dict[uuid.UUID, ScryfallCard] = {}
+    if misses:
+        print(f"CACHE MISS: Resolving {len(misses)} cards from Scryfall.")
+        async with AsyncScryfallClient() as client:
+            found, _ = await client.get_cards_batch([_to_scryfall_identifier(i) for i in misses])
+            unmatched = _match_fetched_cards(misses, found, resolved_ids, fetched_cards)
+            unmatched = _resolve_typos(unmatched, resolved_ids)
+
+            fuzzy_results = await asyncio.gather(
+                *(client.get_card_by_name(i.name, i.set_code) for i in unmatched)
+            )
+            for identifier, scryfall_card in zip(unmatched, fuzzy_results):
+                _record_fetched_card(identifier, scryfall_card, resolved_ids, fetched_cards)
+
+    results.update(await session.run_sync(_store_fetched_cards, pending, resolved_ids, fetched_cards))
+    if fetched_identifiers is not None:
+        fetched_identifiers.update(i for i, card_id in resolved_ids.items() if card_id in fetched_cards)
+    return results
+
+def _resolve_from_memory(
+    session: Session,
+    identifiers: List[CardIdentifier]
+) -> Tuple[Dict[CardIdentifier, Optional[ScryfallCardCache]], List[CardIdentifier]]:
+    """Answers what it can from the in-process cache and returns the identifiers still pending."""
+    results: Dict[CardIdentifier, Optional[ScryfallCardCache]] = {}
+    pending: List[CardIdentifier] = []
+    for identifier in identifiers:
+        remembered = card_lookup_cache.get(_cache_key(identifier))
+        if remembered is MISSING:
+            pending.append(identifier)
+        else:
+            results[identifier] = _attach(session, remembered)
+    return results, pending
+
+def _resolve_from_cache(
+    session: Session,
+    identifiers: List[CardIdentifier]
+) -> Tuple[Dict[CardIdentifier, uuid.UUID], List[CardIdentifier]]:
+    """Serves every identifier it can from the local catalog and returns the misses."""
+    resolved_ids: Dict[CardIdentifier, uuid.UUID] = {}
+    unindexed: List[CardIdentifier] = []
+    misses: List[CardIdentifier] = []
+
+    # Exact printings are a single indexed lookup on (set code, collector number).
+    cached_printings = _load_cached_printings(session, [i for i in identifiers if i.is_printing])
 
-def _update_db_model_from_scryfall(db_card: ScryfallCardCache, scryfall_card: ScryfallCard):
-    """Updates a ScryfallCardCache instance with fresh data from a ScryfallCard model."""
+    card_name_index.ensure_loaded(session)
+    for identifier in identifiers:
+        if identifier.is_printing:
+            cached_card = cached_printings.get(_printing_key(identifier.set_code, identifier.collector_number))
+            if cached_card and not needs_refetch(cached_card):
+                resolved_ids[identifier] = cached_card.id
+            else:
+                misses.append(identifier)
+            continue
+
+        card_id = card_name_index.resolve(identifier.name, identifier.set_code)
+        if card_id:
+            resolved_ids[identifier] = card_id
+        else:
+            unindexed.append(identifier)
+
+    # Rows written by another process since the index was built are still
+    # found by an exact-name query.
+    cached_by_name = _load_cached_cards_by_name(session, {i.name for i in unindexed})
+    for identifier in unindexed:
+        cached_card = _pick_cached_card(cached_by_name.get(identifier.name, []), identifier.set_code)
+        if cached_card and not needs_refetch(cached_card):
+            resolved_ids[identifier] = cached_card.id
+            card_name_index.add(cached_card.id, cached_card.name, cached_card.set_code)
+        else:
+            misses.append(identifier)
+    return resolved_ids, misses
+
+def _match_fetched_cards(
+    misses: List[CardIdentifier],
+    found: List[ScryfallCard],
+    resolved_ids: Dict[CardIdentifier, uuid.UUID],
+    fetched_cards: Dict[uuid.UUID, ScryfallCard]
+) -> List[CardIdentifier]:
+    """Pairs batch-fetched cards with the identifiers that requested them and returns the unmatched ones."""
+    found_by_key = _index_by_lookup_key(found)
+    unmatched: List[CardIdentifier] = []
+    for identifier in misses:
+        scryfall_card = found_by_key.get(_fetch_key(identifier))
+        if scryfall_card:
+            _record_fetched_card(identifier, scryfall_card, resolved_ids, fetched_cards)
+        else:
+            unmatched.append(identifier)
+    return unmatched
+
+def _resolve_typos(unmatched: List[CardIdentifier], resolved_ids: Dict[CardIdentifier, uuid.UUID]) -> List[CardIdentifier]:
+    """
+    Matches names Scryfall found no exact card for against the cached names,
+    sparing a fuzzy request per typo. Returns the identifiers still unmatched.
+    """
+    still_unmatched: List[CardIdentifier] = []
+    for identifier in unmatched:
+        card_id = card_name_index.resolve_typo(identifier.name, identifier.set_code)
+        if card_id:
+            print(f"FUZZY MATCH: '{identifier.name}' is not an exact card name; matched a cached card by spelling.")
+            resolved_ids[identifier] = card_id
+        else:
+            still_unmatched.append(identifier)
+    return still_unmatched
+
+def _record_fetched_card(
+    identifier: CardIdentifier,
+    scryfall_card: Optional[ScryfallCard],
+    resolved_ids: Dict[CardIdentifier, uuid.UUID],
+    fetched_cards: Dict[uuid.UUID, ScryfallCard]
+):
+    """Marks an identifier as resolved by a freshly fetched card."""
+    if scryfall_card:
+        card_id = uuid.UUID(scryfall_card.id)
+        fetched_cards[card_id] = scryfall_card
+        resolved_ids[identifier] = card_id
+
+def _store_fetched_cards(
+    session: Session,
+    identifiers: List[CardIdentifier],
+    resolved_ids: Dict[CardIdentifier, uuid.UUID],
+    fetched_cards: Dict[uuid.UUID, ScryfallCard]
+) -> Dict[CardIdentifier, Optional[ScryfallCardCache]]:
+    """Writes all new and refreshed cards in one transaction and loads the results."""
+    if fetched_cards:
+        upsert_scryfall_cards(session, fetched_cards.values())
+        session.commit()
+        card_name_index.add_many((card_id, card.name, card.set) for card_id, card in fetched_cards.items())
+        print(f"CACHE WRITE/UPDATE: Saved {len(fetched_cards)} cards to cache.")
+
+    cards_by_id = _load_cached_cards_by_id(session, set(resolved_ids.values()))
+    results = {identifier: cards_by_id.get(resolved_ids.get(identifier)) for identifier in identifiers}
+    for identifier, card in results.items():
+        card_lookup_cache.set(_cache_key(identifier), _snapshot(card) if card else None)
+    return results
+
+def _snapshot(card: ScryfallCardCache) -> ScryfallCardCache:
+    """
+    Copies a cache row into a detached instance that is safe to keep in memory.
+
+    The copy is independent of the session that loaded the row, so a later
+    commit in that session cannot expire the cached attributes.
+    """
+    # Populating committed state directly skips model validation, which
+    # dominates the cost of a warm lookup.
+    mapper = sa_inspect(ScryfallCardCache)
+    snapshot = mapper.class_manager.new_instance()
+    for attribute in mapper.column_attrs:
+        set_committed_value(snapshot, attribute.key, getattr(card, attribute.key))
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def _attach(session: Session, snapshot: Optional[ScryfallCardCache]) -> Optional[ScryfallCardCache]:
+    """Returns a remembered card bound to `session`, without emitting a query."""
+    return session.merge(snapshot, load=False) if snapshot is not None else None
+
+def _load_cached_cards_by_name(session: Session, names: Iterable[str]) -> Dict[str, List[ScryfallCardCache]]:
+    """Loads every cached printing of the given names, grouped by name."""
+    names = list(names)
+    cards_by_name: Dict[str, List[ScryfallCardCache]] = {}
+    for start in range(0, len(names), SQL_IN_CLAUSE_CHUNK_SIZE):
+        chunk = names[start:start + SQL_IN_CLAUSE_CHUNK_SIZE]
+        statement = select(ScryfallCardCache).where(ScryfallCardCache.name.in_(chunk))
+        for card in session.exec(statement):
+            cards_by_name.setdefault(card.name, []).append(card)
+    return cards_by_name
+
+def _load_cached_cards_by_id(session: Session, card_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, ScryfallCardCache]:
+    """Loads cached cards by primary key."""
+    card_ids = list(card_ids)
+    cards_by_id: Dict[uuid.UUID, ScryfallCardCache] = {}
+    for start in range(0, len(card_ids), SQL_IN_CLAUSE_CHUNK_SIZE):
+        chunk = card_ids[start:start + SQL_IN_CLAUSE_CHUNK_SIZE]
+        statement = select(ScryfallCardCache).where(ScryfallCardCache.id.in_(chunk))
+        cards_by_id.update((card.id, card) for card in session.exec(statement))
+    return cards_by_id
+
+def _load_cached_printings(
+    session: Session,
+    identifiers: List[CardIdentifier]
+) -> Dict[tuple, ScryfallCardCache]:
+    """Loads cached printings by (set code, collector number), keyed by `_printing_key`."""
+    printings = list({(i.set_code.lower(), i.collector_number) for i in identifiers})
+    cards_by_printing: Dict[tuple, ScryfallCardCache] = {}
+    # Each printing binds two parameters.
+    chunk_size = SQL_IN_CLAUSE_CHUNK_SIZE // 2
+    for start in range(0, len(printings), chunk_size):
+        chunk = printings[start:start + chunk_size]
+        statement = select(ScryfallCardCache).where(
+            tuple_(ScryfallCardCache.set_code, ScryfallCardCache.collector_number).in_(chunk)
+        )
+        for card in session.exec(statement):
+            cards_by_printing[_printing_key(card.set_code, card.collector_number)] = card
+    return cards_by_printing
+
+def _pick_cached_card(candidates: List[ScryfallCardCache], set_code: Optional[str]) -> Optional[ScryfallCardCache]:
+    """Chooses the cached printing that satisfies the optional set filter."""
+    for card in candidates:
+        if not set_code or card.set_code == set_code:
+            return card
+    return None
+
+def _to_scryfall_identifier(identifier: CardIdentifier) -> Dict[str, str]:
+    """Converts a CardIdentifier into the JSON form the collection endpoint expects."""
+    if identifier.is_printing:
+        return {"set": identifier.set_code, "collector_number": identifier.collector_number}
+    scryfall_identifier = {"name": identifier.name}
+    if identifier.set_code:
+        scryfall_identifier["set"] = identifier.set_code
+    return scryfall_identifier
+
+def _lookup_key(name: str, set_code: Optional[str]) -> tuple:
+    """Builds a case- and whitespace-insensitive key for a card name and optional set."""
+    return (" ".join(name.split()).lower(), set_code.lower() if set_code else None)
+
+def _printing_key(set_code: str, collector_number: str) -> tuple:
+    """Builds the key for one exact printing."""
+    return ("#printing", set_code.lower(), collector_number.lower())
+
+def _fetch_key(identifier: CardIdentifier) -> tuple:
+    """Builds the key used to pair a fetched card with the identifier that requested it."""
+    if identifier.is_printing:
+        return _printing_key(identifier.set_code, identifier.collector_number)
+    return _lookup_key(identifier.name, identifier.set_code)
+
+def _cache_key(identifier: CardIdentifier) -> tuple:
+    """Builds the in-process cache key: the normalized name, set code and collector number."""
+    collector_number = identifier.collector_number.lower() if identifier.collector_number else None
+    return (*_lookup_key(identifier.name, identifier.set_code), collector_number)
+
+def _index_by_lookup_key(cards: Iterable[ScryfallCard]) -> Dict[tuple, ScryfallCard]:
+    """
+    Indexes fetched cards by every name a collection row might have used.
+
+    Multi-faced cards are indexed under their full name and each face name,
+    both with and without their set code. Every card is also indexed by its
+    exact printing.
+    """
+    index: Dict[tuple, ScryfallCard] = {}
+    for card in cards:
+        index.setdefault(_printing_key(card.set, card.collector_number), card)
+        names = {card.name, *card.name.split(" // ")}
+        names.update(face.name for face in card.card_faces or [])
+        for name in names:
+            index.setdefault(_lookup_key(name, None), card)
+            index.setdefault(_lookup_key(name, card.set), card)
+    return index
+
+# =============================================================================
+# Freshness Policy and Bulk Refresh
+# =============================================================================
+
+def needs_refetch(card: ScryfallCardCache) -> bool:
+    """Returns True if a cached row is unusable until it is fetched again."""
+    return (card.schema_version or 0) < CARD_SCHEMA_VERSION
+
+def has_stale_prices(card: ScryfallCardCache, now: Optional[datetime] = None) -> bool:
+    """Returns True if a cached row's prices are older than the configured maximum age."""
+    if card.fetched_at is None:
+        return True
+    fetched_at = card.fetched_at
+    if fetched_at.tzinfo is None:
+        # SQLite does not store offsets; every stored value is UTC.
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+    return fetched_at < (now or _utcnow()) - timedelta(days=CARD_PRICE_MAX_AGE_DAYS)
+
+def refresh_stale_cards(batch_size: int = 750, limit: Optional[int] = None) -> int:
+    """
+    Refetches every stale cache row in bulk, outside the upload hot path.
+
+    A row is stale if it was written by an older schema mapping or its prices
+    have aged past `CARD_PRICE_MAX_AGE_DAYS`. Rows are refetched by Scryfall id
+    through the collection endpoint and upserted one batch per transaction.
+
+    Args:
+        batch_size: The number of rows refreshed per transaction.
+        limit: An optional cap on the total number of rows refreshed.
+
+    Returns:
+        The number of rows refreshed.
+    """
+    price_cutoff = _utcnow() - timedelta(days=CARD_PRICE_MAX_AGE_DAYS)
+    stale_filter = (
+        (ScryfallCardCache.schema_version < CARD_SCHEMA_VERSION)
+        | (ScryfallCardCache.fetched_at == None)  # noqa: E711 - SQL NULL comparison
+        | (ScryfallCardCache.fetched_at < price_cutoff)
+    )
+
+    refreshed = 0
+    with Session(engine) as session:
+        stale_ids = session.exec(select(ScryfallCardCache.id).where(stale_filter)).all()
+        if limit is not None:
+            stale_ids = stale_ids[:limit]
+        print(f"Found {len(stale_ids)} stale cards to refresh.")
+
+        for start in range(0, len(stale_ids), batch_size):
+            chunk = stale_ids[start:start + batch_size]
+            found, not_found = scryfall_client.get_cards_batch([{"id": str(card_id)} for card_id in chunk])
+            refreshed += upsert_scryfall_cards(session, found)
+            session.commit()
+            card_name_index.add_many((uuid.UUID(card.id), card.name, card.set) for card in found)
+            if not_found:
+                print(f"Warning: {len(not_found)} cached cards are no longer available on Scryfall.")
+            print(f"Refreshed {refreshed}/{len(stale_ids)} cards.")
+
+    # Remembered snapshots and analyzed pools may predate the refresh.
+    card_lookup_cache.clear()
+    analyzed_pool_cache.clear()
+    return refreshed
+
+def _utcnow() -> datetime:
+    """Returns the current time as a timezone-aware UTC datetime."""
+    return datetime.now(timezone.utc)
+
+# =============================================================================
+# Scryfall-to-Database Mapping
+# =============================================================================
+
+def scryfall_card_to_row(scryfall_card: ScryfallCard) -> Dict[str, Any]:
+    """
+    Maps a validated ScryfallCard onto the column values of a ScryfallCardCache row.
+
+    This is the single source of truth for the API-to-schema mapping; every
+    write to the cache goes through `upsert_scryfall_cards`.
+    """
     image_uris_dict = {k: str(v) for k, v in scryfall_card.image_uris.items()} if scryfall_card.image_uris else None
-    
-    db_card.name = scryfall_card.name
-    db_card.oracle_text = scryfall_card.oracle_text
-    db_card.type_line = scryfall_card.type_line
-    db_card.mana_cost = scryfall_card.mana_cost
-    db_card.cmc = scryfall_card.cmc
-    db_card.rarity = scryfall_card.rarity
-    db_card.layout = scryfall_card.layout
-    db_card.colors = scryfall_card.colors
-    db_card.color_identity = scryfall_card.color_identity
-    db_card.keywords = scryfall_card.keywords
-    db_card.legalities = scryfall_card.legalities
-    db_card.image_uris = image_uris_dict
-    db_card.set_code = scryfall_card.set
-    db_card.collector_number = scryfall_card.collector_number
-    
-    # --- NEW: Populate card quality metrics ---
-    db_card.edhrec_rank = scryfall_card.edhrec_rank
-    db_card.price_usd = scryfall_card.prices.get("usd") if scryfall_card.prices else None
\ No newline at end of file
+    price_usd = scryfall_card.prices.get("usd") if scryfall_card.prices else None
+
+    return {
+        "id": uuid.UUID(scryfall_card.id),
+        "name": scryfall_card.name,
+        "oracle_text": scryfall_card.oracle_text,
+        "type_line": scryfall_card.type_line,
+        "mana_cost": scryfall_card.mana_cost,
+        "cmc": scryfall_card.cmc,
+        "rarity": scryfall_card.rarity,
+        "layout": scryfall_card.layout,
+        "colors": scryfall_card.colors,
+        "color_identity": scryfall_card.color_identity,
+        "keywords": scryfall_card.keywords,
+        "legalities": scryfall_card.legalities,
+        "color_identity_mask": color_identity_mask(scryfall_card.color_identity),
+        "image_uris": image_uris_dict,
+        "set_code": scryfall_card.set,
+        "collector_number": scryfall_card.collector_number,
+        # --- Card quality metrics ---
+        "edhrec_rank": scryfall_card.edhrec_rank,
+        "price_usd": float(price_usd) if price_usd is not None else None,
+        # --- Cache freshness ---
+        "fetched_at": _utcnow(),
+        "schema_version": CARD_SCHEMA_VERSION,
+    }
+
+def upsert_scryfall_cards(session: Session, scryfall_cards: Iterable[ScryfallCard]) -> int:
+    """
+    Inserts or updates many cache rows with a single executemany statement.
+
+    Rows are keyed on the Scryfall printing id, so re-running an import refreshes
+    existing entries in place. The derived legality and role rows are written
+    alongside. The caller owns the transaction and must commit.
+
+    Args:
+        session: An active database session.
+        scryfall_cards: Validated cards to write to the cache.
+
+    Returns:
+        The number of rows written.
+    """
+    rows = [scryfall_card_to_row(card) for card in scryfall_cards]
+    if not rows:
+        return 0
+
+    statement = sqlite_insert(ScryfallCardCache.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={column: statement.excluded[column] for column in rows[0] if column != "id"},
+    )
+    session.execute(statement, rows)
+    _upsert_legalities(session, [(row["id"], row["legalities"]) for row in rows])
+    store_card_roles(session, [(row["id"], row["type_line"], row["oracle_text"]) for row in rows])
+    return len(rows)
+
+def _upsert_legalities(session: Session, cards: List[Tuple[uuid.UUID, Optional[Dict[str, str]]]]):
+    """Writes the normalized `CardLegality` rows for (card id, legalities) pairs. The caller commits."""
+    rows = [
+        {"card_id": card_id, "format": format_name, "status": status}
+        for card_id, legalities in cards
+        for format_name, status in (legalities or {}).items()
+    ]
+    if not rows:
+        return
+    statement = sqlite_insert(CardLegality.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=["card_id", "format"],
+        set_={"status": statement.excluded.status},
+    )
+    session.execute(statement, rows)
+
+def backfill_card_filters(batch_size: int = 1000) -> int:
+    """
+    Derives the filter columns for cache rows written before they existed.
+
+    The color identity mask and the `CardLegality` rows are computed from the
+    row's own JSON columns, so no Scryfall requests are made.
+
+    Returns:
+        The number of rows backfilled.
+    """
+    set_mask = (
+        update(ScryfallCardCache.__table__)
+        .where(ScryfallCardCache.__table__.c.id == bindparam("b_id"))
+        .values(color_identity_mask=bindparam("b_mask"))
+    )
+    backfilled = 0
+    with Session(engine) as session:
+        while True:
+            statement = (
+                select(ScryfallCardCache.id, ScryfallCardCache.color_identity, ScryfallCardCache.legalities)
+                .where(ScryfallCardCache.color_identity_mask == None)  # noqa: E711 - SQL NULL comparison
+                .limit(batch_size)
+            )
+            rows = session.exec(statement).all()
+            if not rows:
+                break
+            session.execute(set_mask, [{"b_id": card_id, "b_mask": color_identity_mask(colors)} for card_id, colors, _ in rows])
+            _upsert_legalities(session, [(card_id, legalities) for card_id, _, legalities in rows])
+            session.commit()
+            backfilled += len(rows)
+
+    if backfilled:
+        print(f"Backfilled color and legality filters for {backfilled} cached cards.")
+    return backfilled
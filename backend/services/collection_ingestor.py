@@ -2,23 +2,70 @@
 Service for processing user-uploaded card collection CSV files.
 
 This module orchestrates the entire ingestion pipeline:
-1. Reads and parses the CSV file.
-2. For each row, normalizes the data.
-3. Uses the `card_enrichment` service to get canonical card data.
-4. Creates `UserCard` records in the database.
-5. Groups all cards from one upload under a unique `collection_id`.
-6. Reports a summary of the ingestion process, including any failures.
+1. Hashes the upload. A byte-identical re-upload into an existing collection
+   returns it without being parsed.
+2. Decodes and parses the CSV file incrementally, one row at a time.
+3. For each row, normalizes the data.
+4. Groups rows into fixed-size batches and uses the `card_enrichment` service
+   to resolve every distinct card in a batch at once, so cache misses are
+   fetched in a handful of requests.
+5. Merges rows for the same card, finish, condition and language.
+6. Writes a new collection batch by batch under a unique `collection_id`, or,
+   when re-uploading into an existing `collection_id`, diffs the file against
+   the stored `UserCard` rows and applies only the changes.
+7. Reports a summary of the ingestion process, including any failures.
+
+Only one batch of rows is held in memory at a time, so peak memory does not
+grow with the size of the upload.
 """
 
 import csv
+import hashlib
 import io
+import os
 import uuid
-from typing import Dict, List, Any
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple, Union
 from pydantic import BaseModel
-from sqlmodel import Session
-from ..database.connection import engine
-from ..database.models import UserCard
-from .card_enrichment import get_or_create_scryfall_card
+from sqlalchemy import bindparam, insert, update
+from sqlmodel import Session, delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..database.connection import async_engine, engine
+from ..database.models import Collection, UserCard
+from .card_enrichment import CardIdentifier, get_or_create_scryfall_cards, get_or_create_scryfall_cards_async
+from .pool_cache import analyzed_pool_cache
+
+# --- Configuration ---
+# The number of CSV rows resolved and written together.
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "500"))
+# --- End Configuration ---
+
+# A parsed row paired with its zero-based position in the file.
+ParsedRow = Tuple[int, Dict[str, Any]]
+# Rows with the same (card id, is_foil, condition, language) share one `UserCard`.
+UserCardKey = Tuple[uuid.UUID, bool, Optional[str], Optional[str]]
+
+_user_cards = UserCard.__table__
+# Inserts a batch of new `UserCard` rows, returning their ids in parameter order.
+_INSERT_USER_CARDS = insert(_user_cards).returning(_user_cards.c.id, sort_by_parameter_order=True)
+# Adds to the quantity of a `UserCard` inserted by an earlier batch of the same upload.
+_INCREMENT_QUANTITY = (
+    update(_user_cards)
+    .where(_user_cards.c.id == bindparam("b_id"))
+    .values(quantity=_user_cards.c.quantity + bindparam("b_quantity"))
+)
+# Replaces the quantity of an existing `UserCard` during a re-upload.
+_SET_QUANTITY = (
+    update(_user_cards)
+    .where(_user_cards.c.id == bindparam("b_id"))
+    .values(quantity=bindparam("b_quantity"))
+)
+
+class CollectionChanges(BaseModel):
+    """The `UserCard` rows an upload added, changed the quantity of, or removed."""
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
 
 class IngestionResult(BaseModel):
     """A data structure to hold the results of a CSV ingestion process."""
@@ -27,77 +74,417 @@ class IngestionResult(BaseModel):
     successful_rows: int
     failed_rows: int
     failures: List[str]
+    # True if the file was identical to the collection's last upload and was not parsed.
+    unchanged: bool = False
+    changes: Optional[CollectionChanges] = None
+
+class IngestionProgress(BaseModel):
+    """Live row counters for an ingestion in progress, updated after every batch."""
+    rows_parsed: int = 0
+    resolved_from_cache: int = 0
+    fetched_from_scryfall: int = 0
+    failed_rows: int = 0
+
+class CsvReadError(Exception):
+    """Raised when the uploaded file cannot be decoded or parsed as CSV."""
+
+class CollectionNotFoundError(Exception):
+    """Raised when a re-upload targets a `collection_id` that does not exist."""
+
+class NoValidRowsError(Exception):
+    """Raised when not a single row of a re-upload could be parsed and resolved."""
+
+class _IngestionTally:
+    """Running counters and failure messages for an ingestion in progress."""
+
+    def __init__(self, progress: Optional[IngestionProgress] = None):
+        self.progress = progress or IngestionProgress()
+        self.failures: List[str] = []
+
+    @property
+    def total_rows(self) -> int:
+        return self.progress.rows_parsed
+
+    @property
+    def successful_rows(self) -> int:
+        return self.progress.resolved_from_cache + self.progress.fetched_from_scryfall
+
+    def fail(self, message: str):
+        self.failures.append(message)
+        self.progress.failed_rows += 1
+
+    def result(self, collection_id: str, changes: Optional[CollectionChanges] = None) -> IngestionResult:
+        return IngestionResult(
+            collection_id=collection_id,
+            total_rows=self.total_rows,
+            successful_rows=self.successful_rows,
+            failed_rows=len(self.failures),
+            failures=self.failures,
+            changes=changes,
+        )
+
+class _NewCollectionWriter:
+    """Writes a new collection one batch at a time as its rows are resolved."""
+
+    def __init__(self):
+        self.collection_id = str(uuid.uuid4())
+        self.changes = CollectionChanges()
+        # The ids of the `UserCard` rows already inserted by earlier batches.
+        self._written_ids: Dict[UserCardKey, int] = {}
+
+    def add_batch(self, session: Session, quantities: Dict[UserCardKey, int]):
+        """
+        Writes one batch of merged rows in a single transaction.
+
+        Cards first seen in this batch are inserted with one executemany
+        statement; cards an earlier batch already inserted have their
+        quantities increased instead.
+        """
+        if not quantities:
+            return
+        new_keys = [key for key in quantities if key not in self._written_ids]
+        increments = [
+            {"b_id": self._written_ids[key], "b_quantity": quantity}
+            for key, quantity in quantities.items() if key in self._written_ids
+        ]
+
+        if new_keys:
+            inserted_ids = session.execute(
+                _INSERT_USER_CARDS, [_user_card_row(self.collection_id, key, quantities[key]) for key in new_keys]
+            ).scalars().all()
+            self._written_ids.update(zip(new_keys, inserted_ids))
+        if increments:
+            session.execute(_INCREMENT_QUANTITY, increments)
+        session.commit()
+        analyzed_pool_cache.invalidate_collection(self.collection_id)
+        self.changes.added = len(self._written_ids)
+
+    def finish(self, session: Session, content_hash: str, tally: _IngestionTally):
+        """Records the new collection once all of its rows are written."""
+        _record_collection(session, self.collection_id, content_hash, tally)
+        session.commit()
+        print(f"Committed {tally.successful_rows} card rows for collection '{self.collection_id}'.")
+
+    def abort(self, session: Session):
+        """Removes the rows already written so no partial collection is left behind."""
+        session.rollback()
+        session.exec(delete(UserCard).where(UserCard.collection_id == self.collection_id))
+        session.commit()
+        analyzed_pool_cache.invalidate_collection(self.collection_id)
+
+class _CollectionDiffWriter:
+    """
+    Re-uploads a file into an existing collection.
+
+    The merged quantities of the whole file are collected first; only then is
+    the difference from the stored `UserCard` rows applied, in one transaction.
+    A failed re-upload therefore leaves the collection exactly as it was.
+
+    A row that fails to parse or resolve says nothing about whether its card
+    is still owned, so cards are only removed when every row of the file
+    succeeded. A file in which no row succeeded is rejected outright.
+    """
+
+    def __init__(self, session: Session, collection_id: str):
+        self.collection_id = collection_id
+        self.changes = CollectionChanges()
+        self._desired: Dict[UserCardKey, int] = {}
+        self._current: Dict[UserCardKey, Tuple[int, int]] = {}
+        # Collections written before rows were merged may hold several rows per
+        # key; those are folded into the first row of each key.
+        self._merged_keys: Set[UserCardKey] = set()
+        self._redundant_ids: List[int] = []
+
+        statement = select(
+            UserCard.id, UserCard.scryfall_card_id, UserCard.is_foil, UserCard.condition, UserCard.language, UserCard.quantity
+        ).where(UserCard.collection_id == collection_id).order_by(UserCard.id)
+        for user_card_id, card_id, is_foil, condition, language, quantity in session.exec(statement):
+            key = (card_id, is_foil, condition, language)
+            if key in self._current:
+                first_id, total = self._current[key]
+                self._current[key] = (first_id, total + quantity)
+                self._merged_keys.add(key)
+                self._redundant_ids.append(user_card_id)
+            else:
+                self._current[key] = (user_card_id, quantity)
+
+        if not self._current and session.get(Collection, collection_id) is None:
+            raise CollectionNotFoundError(f"Collection '{collection_id}' not found.")
+
+    def add_batch(self, session: Session, quantities: Dict[UserCardKey, int]):
+        """Accumulates one batch of merged rows; nothing is written until `finish`."""
+        for key, quantity in quantities.items():
+            self._desired[key] = self._desired.get(key, 0) + quantity
+
+    def finish(self, session: Session, content_hash: str, tally: _IngestionTally):
+        """
+        Applies the inserts, quantity changes and deletions in one transaction.
+
+        Raises:
+            NoValidRowsError: If no row of the file succeeded.
+        """
+        if tally.successful_rows == 0:
+            raise NoValidRowsError("No row of the file could be read and resolved; the collection was left unchanged.")
+
+        new_keys = [key for key in self._desired if key not in self._current]
+        updates = [
+            {"b_id": user_card_id, "b_quantity": self._desired[key]}
+            for key, (user_card_id, quantity) in self._current.items()
+            if key in self._desired and (self._desired[key] != quantity or key in self._merged_keys)
+        ]
+        removed_ids = [user_card_id for key, (user_card_id, _) in self._current.items() if key not in self._desired]
+        if tally.failures and removed_ids:
+            print(f"Keeping {len(removed_ids)} cards missing from the re-upload of '{self.collection_id}', "
+                  f"since {len(tally.failures)} rows failed.")
+            removed_ids = []
+
+        if new_keys:
+            session.execute(_INSERT_USER_CARDS, [_user_card_row(self.collection_id, key, self._desired[key]) for key in new_keys])
+        if updates:
+            session.execute(_SET_QUANTITY, updates)
+        if removed_ids or self._redundant_ids:
+            session.exec(delete(UserCard).where(UserCard.id.in_(removed_ids + self._redundant_ids)))
+        _record_collection(session, self.collection_id, content_hash, tally)
+        session.commit()
+        analyzed_pool_cache.invalidate_collection(self.collection_id)
+
+        self.changes = CollectionChanges(added=len(new_keys), updated=len(updates), removed=len(removed_ids))
+        print(f"Re-uploaded collection '{self.collection_id}': {self.changes.added} added, "
+              f"{self.changes.updated} updated, {self.changes.removed} removed.")
+
+    def abort(self, session: Session):
+        """Nothing has been written before `finish`, so there is nothing to undo."""
+        session.rollback()
 
-def process_collection_csv(csv_file: io.BytesIO) -> IngestionResult:
+def process_collection_csv(
+    csv_file: BinaryIO,
+    batch_size: int = INGESTION_BATCH_SIZE,
+    progress: Optional[IngestionProgress] = None,
+    collection_id: Optional[str] = None
+) -> IngestionResult:
     """
     Processes a user-uploaded CSV file of their MTG collection.
 
-    This function is transactional: all successful card entries are committed
-    to the database at the end in a single operation. If an error occurs,
-    failed rows are skipped, and the process continues.
+    Rows are streamed from the file and resolved one batch at a time. If a
+    row fails, it is skipped and the process continues. If the upload as a
+    whole fails (e.g. the file is not valid UTF-8), no partial collection is
+    left behind.
 
     Args:
-        csv_file: A file-like object (in bytes) containing the CSV data.
+        csv_file: A seekable binary file-like object containing the CSV data.
+        batch_size: The number of rows resolved and written together.
+        progress: An optional progress object, updated in place after each
+            batch so another thread can report on a long-running upload.
+        collection_id: An existing collection to re-upload into. Its cards are
+            replaced by the file's contents, changing only the rows that differ.
+            If omitted, a new collection is created.
+
+    Raises:
+        CollectionNotFoundError: If `collection_id` does not exist.
 
     Returns:
         An `IngestionResult` instance summarizing the outcome.
     """
-    try:
-        # The 'utf-8-sig' encoding handles CSVs that may have a Byte Order Mark (BOM).
-        csv_text = csv_file.read().decode("utf-8-sig")
-        reader = csv.DictReader(io.StringIO(csv_text))
-        rows = list(reader)
-    except Exception as e:
-        return IngestionResult(collection_id="", total_rows=0, successful_rows=0, failed_rows=0,
-                               failures=[f"Fatal error reading CSV file: {e}"])
-
-    collection_id = str(uuid.uuid4())
-    cards_to_add: List[UserCard] = []
-    failures = []
+    content_hash = _content_hash(csv_file)
+    tally = _IngestionTally(progress)
 
     with Session(engine) as session:
-        for i, row in enumerate(rows):
-            try:
-                parsed_row = _parse_csv_row(row)
-                scryfall_card = get_or_create_scryfall_card(
-                    card_name=parsed_row["name"],
-                    set_code=parsed_row["set_code"],
-                    db_session=session
-                )
+        identical = _find_identical_collection(session, content_hash, collection_id)
+        if identical:
+            return _unchanged_result(identical)
+
+        writer = _CollectionDiffWriter(session, collection_id) if collection_id else _NewCollectionWriter()
+        try:
+            for batch in _iter_row_batches(csv_file, tally, batch_size):
+                fetched: Set[CardIdentifier] = set()
+                resolved_cards = get_or_create_scryfall_cards(_identifiers(batch), db_session=session, fetched_identifiers=fetched)
+                writer.add_batch(session, _merge_batch(batch, resolved_cards, fetched, tally))
+            writer.finish(session, content_hash, tally)
+        except Exception as e:
+            return _abort_ingestion(session, writer, tally, e)
+
+    return tally.result(writer.collection_id, writer.changes)
+
+async def process_collection_csv_async(
+    csv_file: BinaryIO,
+    batch_size: int = INGESTION_BATCH_SIZE,
+    progress: Optional[IngestionProgress] = None,
+    collection_id: Optional[str] = None
+) -> IngestionResult:
+    """
+    Async counterpart of `process_collection_csv` for use in request handlers.
+
+    Queries run on the async engine and cards missing from the cache are
+    fetched with the async Scryfall client, so a large upload does not block
+    the event loop while it waits on the database or the API. The database
+    steps are the same synchronous functions, run through `AsyncSession.run_sync`.
+    """
+    content_hash = _content_hash(csv_file)
+    tally = _IngestionTally(progress)
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        identical = await session.run_sync(_find_identical_collection, content_hash, collection_id)
+        if identical:
+            return _unchanged_result(identical)
 
-                if not scryfall_card:
-                    failures.append(f"Row {i+2}: Card '{parsed_row['name']}' not found on Scryfall.")
-                    continue
-
-                user_card = UserCard(
-                    quantity=parsed_row["quantity"],
-                    is_foil=parsed_row["is_foil"],
-                    collection_id=collection_id,
-                    scryfall_card_id=scryfall_card.id,
-                    condition=parsed_row.get("condition"),
-                    language=parsed_row.get("language"),
+        if collection_id:
+            writer = await session.run_sync(_CollectionDiffWriter, collection_id)
+        else:
+            writer = _NewCollectionWriter()
+        try:
+            for batch in _iter_row_batches(csv_file, tally, batch_size):
+                fetched: Set[CardIdentifier] = set()
+                resolved_cards = await get_or_create_scryfall_cards_async(
+                    _identifiers(batch), db_session=session, fetched_identifiers=fetched
                 )
-                cards_to_add.append(user_card)
-
-            except ValueError as e:
-                failures.append(f"Row {i+2}: {e}")
-            except Exception as e:
-                # Catch unexpected errors to prevent the entire process from crashing.
-                failures.append(f"Row {i+2}: An unexpected error occurred: {e}")
-        
-        if cards_to_add:
-            session.add_all(cards_to_add)
-            session.commit()
-            print(f"Committed {len(cards_to_add)} card rows for collection '{collection_id}'.")
+                await session.run_sync(writer.add_batch, _merge_batch(batch, resolved_cards, fetched, tally))
+            await session.run_sync(writer.finish, content_hash, tally)
+        except Exception as e:
+            return await session.run_sync(_abort_ingestion, writer, tally, e)
+
+    return tally.result(writer.collection_id, writer.changes)
 
+def _content_hash(csv_file: BinaryIO) -> str:
+    """Returns the SHA-256 hex digest of the upload and rewinds it for parsing."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: csv_file.read(1024 * 1024), b""):
+        digest.update(chunk)
+    csv_file.seek(0)
+    return digest.hexdigest()
+
+def _find_identical_collection(session: Session, content_hash: str, collection_id: Optional[str]) -> Optional[Collection]:
+    """
+    Finds the re-upload's target collection if its last upload had exactly
+    this content. A new upload always creates its own collection, even from a
+    file another collection was built from.
+    """
+    if not collection_id:
+        return None
+    collection = session.get(Collection, collection_id)
+    return collection if collection and collection.content_hash == content_hash else None
+
+def _unchanged_result(collection: Collection) -> IngestionResult:
+    """Reports a byte-identical re-upload with the counts of the original upload."""
+    print(f"Upload is identical to collection '{collection.id}'; skipping ingestion.")
     return IngestionResult(
-        collection_id=collection_id,
-        total_rows=len(rows),
-        successful_rows=len(cards_to_add),
-        failed_rows=len(failures),
-        failures=failures,
+        collection_id=collection.id,
+        total_rows=collection.total_rows,
+        successful_rows=collection.successful_rows,
+        failed_rows=collection.total_rows - collection.successful_rows,
+        failures=[],
+        unchanged=True,
+        changes=CollectionChanges(),
     )
 
+def _record_collection(session: Session, collection_id: str, content_hash: str, tally: _IngestionTally):
+    """Creates or updates the `Collection` row for a finished upload. The caller commits."""
+    # An upload with failed rows is not recorded by its hash, so uploading the
+    # same file again retries those rows instead of being skipped as unchanged.
+    if tally.failures:
+        content_hash = ""
+    now = datetime.now(timezone.utc)
+    collection = session.get(Collection, collection_id) or Collection(id=collection_id, content_hash=content_hash, created_at=now, updated_at=now)
+    collection.content_hash = content_hash
+    collection.total_rows = tally.total_rows
+    collection.successful_rows = tally.successful_rows
+    collection.updated_at = now
+    session.add(collection)
+
+def _iter_csv_rows(csv_file: BinaryIO) -> Iterator[Dict[str, str]]:
+    """
+    Decodes and parses the upload incrementally, yielding one row at a time.
+
+    Raises:
+        CsvReadError: If the file cannot be decoded or parsed.
+    """
+    # The 'utf-8-sig' encoding handles CSVs that may have a Byte Order Mark (BOM).
+    text_stream = io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(text_stream)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise CsvReadError(str(e)) from e
+    finally:
+        # Hand the underlying file back to its owner instead of closing it.
+        text_stream.detach()
+
+def _iter_row_batches(csv_file: BinaryIO, tally: _IngestionTally, batch_size: int) -> Iterator[List[ParsedRow]]:
+    """Normalizes rows as they are read and groups the valid ones into batches."""
+    batch: List[ParsedRow] = []
+    for i, row in enumerate(_iter_csv_rows(csv_file)):
+        tally.progress.rows_parsed += 1
+        try:
+            batch.append((i, _parse_csv_row(row)))
+        except ValueError as e:
+            tally.fail(f"Row {i+2}: {e}")
+        except Exception as e:
+            # Catch unexpected errors to prevent the entire process from crashing.
+            tally.fail(f"Row {i+2}: An unexpected error occurred: {e}")
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _identifiers(parsed_rows: List[ParsedRow]) -> List[CardIdentifier]:
+    """Extracts the card identifier of each parsed row."""
+    return [_identifier(parsed_row) for _, parsed_row in parsed_rows]
+
+def _identifier(parsed_row: Dict[str, Any]) -> CardIdentifier:
+    """Builds the card identifier for a single parsed row."""
+    return CardIdentifier(parsed_row["name"], parsed_row["set_code"], parsed_row["collector_number"])
+
+def _merge_batch(
+    parsed_rows: List[ParsedRow],
+    resolved_cards: Dict[CardIdentifier, Any],
+    fetched: Set[CardIdentifier],
+    tally: _IngestionTally
+) -> Dict[UserCardKey, int]:
+    """
+    Sums the quantities of a batch's rows per printing, finish, condition and language.
+
+    Rows whose card could not be resolved are recorded as failures.
+    """
+    quantities: Dict[UserCardKey, int] = {}
+    for i, parsed_row in parsed_rows:
+        identifier = _identifier(parsed_row)
+        scryfall_card = resolved_cards.get(identifier)
+        if not scryfall_card:
+            tally.fail(f"Row {i+2}: Card '{parsed_row['name']}' not found on Scryfall.")
+            continue
+        if identifier in fetched:
+            tally.progress.fetched_from_scryfall += 1
+        else:
+            tally.progress.resolved_from_cache += 1
+
+        key = (scryfall_card.id, parsed_row["is_foil"], parsed_row.get("condition"), parsed_row.get("language"))
+        quantities[key] = quantities.get(key, 0) + parsed_row["quantity"]
+    return quantities
+
+def _user_card_row(collection_id: str, key: UserCardKey, quantity: int) -> Dict[str, Any]:
+    """Builds the column values of a new `UserCard` row."""
+    card_id, is_foil, condition, language = key
+    return {"collection_id": collection_id, "scryfall_card_id": card_id, "is_foil": is_foil,
+            "condition": condition, "language": language, "quantity": quantity}
+
+def _abort_ingestion(
+    session: Session,
+    writer: Union[_NewCollectionWriter, _CollectionDiffWriter],
+    tally: _IngestionTally,
+    error: Exception
+) -> IngestionResult:
+    """Undoes a failed upload's writes and reports the fatal error."""
+    writer.abort(session)
+
+    if isinstance(error, CsvReadError):
+        failure = f"Fatal error reading CSV file: {error}"
+    elif isinstance(error, NoValidRowsError):
+        failure = f"Fatal error: {error}"
+    else:
+        failure = f"Fatal error resolving cards: {error}"
+    return IngestionResult(collection_id="", total_rows=tally.total_rows, successful_rows=0,
+                           failed_rows=tally.total_rows, failures=tally.failures + [failure])
+
 def _parse_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
     """
     Normalizes and validates a single row from the CSV data.
@@ -125,13 +512,17 @@ def _parse_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
     except (ValueError, TypeError):
         raise ValueError(f"Invalid quantity '{row.get('quantity')}'; must be a whole number.")
 
-    set_code = row.get("set code") or row.get("set") # Handle both 'set code' and 'set'
+    set_code = row.get("set code") or row.get("set") or row.get("edition code") # Handle common export spellings
     if set_code:
         set_code = set_code.lower()
 
+    # Moxfield and ManaBox export 'Collector Number'; Deckbox exports 'Card Number'.
+    collector_number = row.get("collector number") or row.get("collector_number") or row.get("card number")
+
     return {
         "name": card_name,
         "set_code": set_code,
+        "collector_number": collector_number or None,
         "quantity": quantity,
         "is_foil": row.get("foil", "").lower() in ["foil", "true"],
         "condition": row.get("condition"),
@@ -0,0 +1,129 @@
+"""
+Recommends color identities for a deck from what a collection can support.
+
+Instead of building a deck for each of the 31 non-empty color identities, the
+collection's pool for the format is loaded once, with every color allowed, and
+summarized as a histogram over the 32 color identity masks: how many copies
+of non-land cards, of lands and of each scored role fall under each exact
+mask. The cards a deck of colors S may play are those whose mask is a submask
+of S (see `colors.submasks`), so every identity's totals are a sum over its
+submasks. For all 31 identities at once this is one 32x32 matrix product,
+whatever the size of the collection.
+
+Identities are ranked by `identity_score`. The best few can then be built in
+full with the batch builder.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..api_models import ColorRecommendation, DeckSpec
+from ..database.connection import async_engine
+from .colors import ALL_COLORS_MASK, mask_to_colors
+from .deck_builder import AnalyzedCard, DeckConstruction, build_decks_async, load_buildable_pools, nonland_target
+from .role_classifier import ROLE_BITS
+
+# --- Ranking Weights ---
+# Share of the score for meeting the spec's role targets; the rest rewards
+# pool depth relative to the deck's non-land slots.
+ROLE_COVERAGE_WEIGHT = 0.7
+# --- End Ranking Weights ---
+
+MASK_COUNT = ALL_COLORS_MASK + 1
+# IDENTITY_SUBMASKS[s, m] is 1 when a card of identity m can be played in a deck of identity s.
+IDENTITY_SUBMASKS = np.array(
+    [[1.0 if mask & ~identity == 0 else 0.0 for mask in range(MASK_COUNT)] for identity in range(MASK_COUNT)]
+)
+
+class IdentityTotals:
+    """
+    The playable copies of non-land cards, lands and each scored role under
+    every color identity, as arrays indexed by mask.
+    """
+
+    def __init__(self, deck: DeckConstruction):
+        limit = 1 if deck.spec.format == "commander" else 4
+        self.role_names = [role for _, role in deck.scored_roles]
+        # Cards are counted as the builder sees them: one entry per name.
+        cards: List[AnalyzedCard] = list(deck.available_pool.values())
+        masks = np.array([card.color_identity_mask for card in cards], dtype=np.int64)
+        copies = np.array([min(card.quantity, limit) for card in cards], dtype=np.float64)
+        role_masks = np.array([card.role_mask for card in cards], dtype=np.int64)
+        is_land = (role_masks & ROLE_BITS["land"]) != 0
+
+        def totals(weights: np.ndarray) -> np.ndarray:
+            return IDENTITY_SUBMASKS @ np.bincount(masks, weights=weights, minlength=MASK_COUNT)
+
+        self.nonland = totals(np.where(is_land, 0.0, copies))
+        self.lands = totals(np.where(is_land, copies, 0.0))
+        self.roles = {
+            role: totals(np.where(~is_land & ((role_masks & bit) != 0), copies, 0.0))
+            for bit, role in deck.scored_roles
+        }
+
+def identity_score(totals: IdentityTotals, identity: int, spec: DeckSpec, role_targets: Dict[str, int]) -> float:
+    """
+    Scores a color identity between 0 and 1: `ROLE_COVERAGE_WEIGHT` for the
+    average share of each role target the pool can fill, and the rest for
+    the share of the deck's non-land slots it can fill at all.
+    """
+    depth = min(1.0, totals.nonland[identity] / max(1, nonland_target(spec)))
+    targeted = [role for role in totals.role_names if role_targets[role] > 0]
+    if targeted:
+        coverage = sum(min(1.0, totals.roles[role][identity] / role_targets[role]) for role in targeted) / len(targeted)
+    else:
+        coverage = 1.0
+    return ROLE_COVERAGE_WEIGHT * coverage + (1 - ROLE_COVERAGE_WEIGHT) * depth
+
+def rank_color_identities(pool: List[AnalyzedCard], spec: DeckSpec, max_colors: int = 5) -> List[ColorRecommendation]:
+    """
+    Ranks every non-empty color identity of at most `max_colors` colors for a
+    pool that allows all colors. Ties go to fewer colors, whose mana is more
+    consistent, then to the deeper pool.
+    """
+    deck = DeckConstruction(spec, pool)
+    totals = IdentityTotals(deck)
+    recommendations = []
+    for identity in range(1, MASK_COUNT):
+        colors = mask_to_colors(identity)
+        if len(colors) > max_colors:
+            continue
+        recommendations.append(ColorRecommendation(
+            color_identity=colors,
+            score=identity_score(totals, identity, spec, deck.role_targets),
+            pool_depth=int(totals.nonland[identity]),
+            land_count=int(totals.lands[identity]),
+            role_counts={role: int(totals.roles[role][identity]) for role in totals.role_names},
+        ))
+    recommendations.sort(key=lambda rec: (-rec.score, len(rec.color_identity), -rec.pool_depth))
+    return recommendations
+
+async def recommend_colors_async(
+    collection_id: str, spec: DeckSpec, top_k: int = 5, build_top: int = 0, max_colors: int = 5
+) -> List[ColorRecommendation]:
+    """
+    Ranks the color identities a collection supports for a spec's format and
+    role targets, ignoring its `color_identity`.
+
+    The all-colors pool comes from the analyzed pool cache when possible. With
+    `build_top`, decks for the best `build_top` identities are built in
+    parallel with `build_decks_async` and attached to their recommendations.
+
+    Returns:
+        The best `top_k` recommendations, best first.
+    """
+    all_colors = spec.copy(update={"color_identity": set(mask_to_colors(ALL_COLORS_MASK))})
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        pool, = await session.run_sync(lambda sync_session: load_buildable_pools(collection_id, [all_colors], sync_session))
+    recommendations = rank_color_identities(pool, spec, max_colors)[:top_k]
+    print(f"Ranked color identities over {len(pool)} cards; best: {''.join(recommendations[0].color_identity) if recommendations else 'none'}.")
+
+    to_build = recommendations[:build_top]
+    if to_build:
+        specs = [spec.copy(update={"color_identity": set(rec.color_identity)}) for rec in to_build]
+        decklists = await build_decks_async(collection_id, specs)
+        for recommendation, decklist in zip(to_build, decklists):
+            recommendation.decklist = decklist
+    return recommendations
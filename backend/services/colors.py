@@ -0,0 +1,40 @@
+"""
+Helpers for representing color identities as 5-bit integer masks.
+
+A color identity such as {"W", "U"} is stored as the mask 0b00011, so "is this
+card's identity inside the deck's colors" becomes an integer test the database
+can answer from an index: a card fits a deck exactly when its mask is one of
+the submasks of the deck's mask.
+"""
+
+from typing import Iterable, List
+
+# The bit for each color, in WUBRG order.
+COLOR_BITS = {"W": 1, "U": 2, "B": 4, "R": 8, "G": 16}
+ALL_COLORS_MASK = 0b11111
+
+def color_identity_mask(colors: Iterable[str]) -> int:
+    """Converts color codes such as ["W", "U"] to a bitmask. Unknown codes are ignored."""
+    mask = 0
+    for color in colors or ():
+        mask |= COLOR_BITS.get(color.upper(), 0)
+    return mask
+
+def mask_to_colors(mask: int) -> List[str]:
+    """Converts a bitmask back to color codes in WUBRG order."""
+    return [color for color, bit in COLOR_BITS.items() if mask & bit]
+
+def submasks(mask: int) -> List[int]:
+    """
+    Returns every mask whose colors are a subset of `mask`, including 0 (colorless).
+
+    These are exactly the color identities allowed in a deck of color `mask`;
+    there are at most 32 of them.
+    """
+    result = []
+    submask = mask
+    while True:
+        result.append(submask)
+        if submask == 0:
+            return result
+        submask = (submask - 1) & mask
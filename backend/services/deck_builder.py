@@ -5,16 +5,36 @@ This module contains the functions and heuristics for constructing a deck from a
 user's collection based on a given set of specifications (format, colors, etc.).
 """
 
+import asyncio
+import heapq
+import os
 import random
 import re
+import sys
+import uuid
 from collections import defaultdict
-from typing import List, Dict, Set, Optional
-from pydantic import BaseModel
+from concurrent.futures import ProcessPoolExecutor
+from typing import FrozenSet, List, Dict, NamedTuple, Set, Optional, Tuple
+import numpy as np
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..database.connection import engine
-from ..database.models import UserCard, ScryfallCardCache
+from ..database.connection import async_engine, engine
+from ..database.models import CardLegality, CardRole, UserCard, ScryfallCardCache
 from ..api_models import DeckSpec, Decklist
+from .card_embeddings import card_synergies
+from .colors import color_identity_mask, submasks
+from .pool_cache import analyzed_pool_cache
+from .role_classifier import CLASSIFIER_VERSION, ROLE_BITS, classify_card_roles, mask_to_roles, role_mask
+
+LAND_ROLE = ROLE_BITS["land"]
+
+# --- Configuration ---
+# The default card selection strategy, one of `SELECTION_ENGINES`.
+DECK_BUILDER_ENGINE = os.getenv("DECK_BUILDER_ENGINE", "vectorized")
+# Worker processes that build the decks of a batch request in parallel.
+DECK_BUILD_WORKERS = int(os.getenv("DECK_BUILD_WORKERS", str(os.cpu_count() or 1)))
+# --- End Configuration ---
 
 # =============================================================================
 # Data Models
@@ -31,17 +51,55 @@ from ..api_models import DeckSpec, Decklist
 #     target_board_wipes: int = 2 # New target for our expanded roles
 #     target_lands: int = 37
 
-class AnalyzedCard(BaseModel):
-    """A richer representation of a card for deck building."""
-    scryfall_id: str
-    name: str
-    quantity: int
-    type_line: str
-    oracle_text: Optional[str] = None
-    mana_cost: Optional[str] = None
-    color_identity: List[str]
-    mana_value: float
-    roles: List[str] = []
+class AnalyzedCard:
+    """
+    A card in a deck-building pool: only what the builder, the scorer and the
+    land base need, in a compact record.
+
+    Pools can hold tens of thousands of cards and are kept in memory by the
+    pool cache, so cards use `__slots__` instead of a per-instance dict, share
+    their repeated strings (names, type lines and mana costs repeat across
+    printings) through `sys.intern`, and store their roles as a bitmask (see
+    `role_classifier.ROLES` and `role_mask`). The oracle text is not kept.
+    """
+    __slots__ = (
+        "scryfall_id", "name", "quantity", "type_line", "mana_cost", "mana_value", "role_mask",
+        "color_identity_mask", "edhrec_rank", "price_usd",
+    )
+
+    def __init__(
+        self,
+        scryfall_id: str,
+        name: str,
+        quantity: int,
+        type_line: str,
+        mana_cost: Optional[str],
+        mana_value: float,
+        role_mask: int = 0,
+        color_identity_mask: int = 0,
+        edhrec_rank: Optional[int] = None,
+        price_usd: Optional[float] = None,
+    ):
+        self.scryfall_id = scryfall_id
+        self.name = sys.intern(name)
+        self.quantity = quantity
+        self.type_line = sys.intern(type_line)
+        self.mana_cost = sys.intern(mana_cost) if mana_cost else None
+        self.mana_value = mana_value
+        self.role_mask = role_mask
+        # See `colors.color_identity_mask`.
+        self.color_identity_mask = color_identity_mask
+        # Quality signals, where Scryfall has them.
+        self.edhrec_rank = edhrec_rank
+        self.price_usd = price_usd
+
+    @property
+    def roles(self) -> List[str]:
+        """The card's role names, sorted."""
+        return mask_to_roles(self.role_mask)
+
+    def __repr__(self) -> str:
+        return f"AnalyzedCard(name={self.name!r}, quantity={self.quantity}, roles={self.roles})"
 
 # class Decklist(BaseModel):
 #     """Represents the final, constructed deck."""
@@ -51,11 +109,21 @@ class AnalyzedCard(BaseModel):
 
 class DeckConstruction:
     """A stateful class to manage the deck building process."""
-    def __init__(self, spec: DeckSpec, initial_pool: List[AnalyzedCard]):
+    def __init__(self, spec: DeckSpec, initial_pool: List[AnalyzedCard], synergy: Optional[Dict[str, float]] = None):
         self.spec = spec
         self.main_deck: Dict[str, int] = {}
         self.available_pool: Dict[str, AnalyzedCard] = {c.name: c for c in initial_pool}
         self.role_counts: Dict[str, int] = defaultdict(int)
+        # How many cards of each scored role the spec asks for.
+        self.role_targets: Dict[str, int] = {
+            "removal": spec.target_removal, "ramp": spec.target_ramp,
+            "draw": spec.target_draw, "threat": spec.target_creatures,
+            "board_wipe": spec.target_board_wipes,
+        }
+        # The scored roles as (bit, name) pairs, in role name order.
+        self.scored_roles: List[Tuple[int, str]] = [(ROLE_BITS[role], role) for role in sorted(self.role_targets)]
+        # Static score bonuses by card name for synergy with the spec's theme (see `pool_synergy`).
+        self.synergy: Dict[str, float] = synergy or {}
     
     @property
     def total_cards(self) -> int:
@@ -74,7 +142,7 @@ class DeckConstruction:
             return False
 
         self.main_deck[card_name] = current_deck_qty + 1
-        for role in card.roles:
+        for role in mask_to_roles(card.role_mask):
             self.role_counts[role] += 1
         return True
 
@@ -85,10 +153,9 @@ class DeckConstruction:
 def _generate_basic_land_base(deck: DeckConstruction, pool: List[AnalyzedCard], lands_to_add: int) -> Dict[str, int]:
     """Generates a basic land base based on the color pips of spells in the deck."""
     pip_counts = defaultdict(int)
-    card_map = {c.name: c for c in pool}
     
     for card_name, qty in deck.main_deck.items():
-        card = card_map.get(card_name)
+        card = deck.available_pool.get(card_name)
         if card and card.mana_cost:
             mana_symbols = re.findall(r'\{([WUBRG])\}', card.mana_cost, re.IGNORECASE)
             for symbol in mana_symbols:
@@ -136,15 +203,10 @@ def _generate_basic_land_base(deck: DeckConstruction, pool: List[AnalyzedCard],
 def score_card(card: AnalyzedCard, deck: DeckConstruction) -> float:
     """Calculates a heuristic score for a card based on the current deck state."""
     score = 1.0
-    spec = deck.spec
-    role_targets = {
-        "removal": spec.target_removal, "ramp": spec.target_ramp,
-        "draw": spec.target_draw, "threat": spec.target_creatures,
-        "board_wipe": spec.target_board_wipes,
-    }
-    
-    for role in card.roles:
-        if role in role_targets:
+    role_targets = deck.role_targets
+
+    for bit, role in deck.scored_roles:
+        if card.role_mask & bit:
             current_count = deck.role_counts[role]
             target_count = role_targets[role]
             if current_count < target_count:
@@ -152,128 +214,397 @@ def score_card(card: AnalyzedCard, deck: DeckConstruction) -> float:
     
     if card.mana_value > 5:
         score -= (card.mana_value - 5) * 0.5
+
+    if deck.synergy:
+        score += deck.synergy.get(card.name, 0.0)
         
     return score
 
+def pool_synergy(spec: DeckSpec, pool: List[AnalyzedCard]) -> Dict[str, float]:
+    """
+    Computes each card's static synergy bonus for a spec's theme and commander.
+
+    The pool's similarities to the theme come from one matrix-vector product
+    over the card embedding index. They are rescaled within the pool: cards at
+    or below the pool's mean similarity get nothing, and the bonus rises
+    linearly to `spec.synergy_weight` for the closest card. Only the ranking
+    within the pool matters, not the model's absolute similarity scale.
+
+    Returns:
+        Positive bonuses by card name; empty when the spec has no theme or
+        commander, or they cannot be scored.
+    """
+    if not spec.synergy_weight or not pool:
+        return {}
+    names = list(dict.fromkeys(card.name for card in pool))
+    similarities = card_synergies(names, spec.theme, spec.commander)
+    if similarities is None or np.isnan(similarities).all():
+        return {}
+    mean, best = np.nanmean(similarities), np.nanmax(similarities)
+    if best <= mean:
+        return {}
+    bonuses = spec.synergy_weight * np.clip((similarities - mean) / (best - mean), 0.0, 1.0)
+    return {name: float(bonus) for name, bonus in zip(names, bonuses) if bonus > 0}
+
+# Cards must score above this to be picked by the greedy selection.
+MIN_PICK_SCORE = -1.0
+
+def _select_nonland_cards(deck: DeckConstruction, target_count: int):
+    """
+    Greedily adds the highest-scoring non-land card until the deck holds
+    `target_count` cards or no card can be added.
+
+    Candidates sit in a max-heap keyed by score, ties going to the card that
+    comes first in the pool. A card's score only ever falls as the deck fills
+    its roles, so a heap entry is an upper bound: the top entry is rescored
+    when popped and picked only if its score still holds, otherwise it is
+    pushed back with the new score. Only cards that reach the top are
+    rescored, instead of the whole pool on every pick.
+
+    Cards scoring `MIN_PICK_SCORE` or less (very expensive cards) are never picked.
+    """
+    limit = 1 if deck.spec.format == "commander" else 4
+    heap = [
+        (-score_card(card, deck), position, card_name)
+        for position, (card_name, card) in enumerate(deck.available_pool.items())
+        if not card.role_mask & LAND_ROLE and min(card.quantity, limit) > 0
+    ]
+    heapq.heapify(heap)
+
+    total_cards = deck.total_cards
+    while total_cards < target_count and heap:
+        negative_score, position, card_name = heapq.heappop(heap)
+        card = deck.available_pool[card_name]
+        current_score = score_card(card, deck)
+        if current_score != -negative_score:
+            heapq.heappush(heap, (-current_score, position, card_name))
+            continue
+        if current_score <= MIN_PICK_SCORE:
+            break
+
+        deck.add_card(card_name)
+        total_cards += 1
+        if deck.main_deck[card_name] < min(card.quantity, limit):
+            heapq.heappush(heap, (-score_card(card, deck), position, card_name))
+
+class ScoringMatrix:
+    """
+    A pool of cards laid out as arrays, so that the whole pool can be scored
+    in a few vectorized operations.
+
+    Rows follow the pool's order. Role columns are sorted by name, and the
+    role terms are added column by column, in the order `score_card` adds
+    them. The scores are therefore bit-identical to `score_card`'s.
+    """
+
+    def __init__(self, cards: List[AnalyzedCard], role_names: List[str], synergy: Optional[Dict[str, float]] = None):
+        self.role_names = sorted(role_names)
+        role_masks = np.array([card.role_mask for card in cards], dtype=np.int64).reshape(-1, 1)
+        role_bits = np.array([ROLE_BITS[role] for role in self.role_names], dtype=np.int64)
+        self.has_role = ((role_masks & role_bits) != 0).astype(np.float64)
+        mana_value = np.array([card.mana_value for card in cards], dtype=np.float64)
+        self.mana_penalty = np.where(mana_value > 5, (mana_value - 5) * 0.5, 0.0)
+        self.quantity = np.array([card.quantity for card in cards], dtype=np.int64)
+        self.is_land = (role_masks[:, 0] & LAND_ROLE) != 0
+        self.synergy = np.array([synergy.get(card.name, 0.0) for card in cards]) if synergy else None
+
+    def role_terms(self, deck: DeckConstruction) -> List[float]:
+        """The score each role column currently contributes, as computed by `score_card`."""
+        terms = []
+        for role in self.role_names:
+            current_count = deck.role_counts[role]
+            target_count = deck.role_targets[role]
+            terms.append(10 * (1 - (current_count / target_count)) if current_count < target_count else 0.0)
+        return terms
+
+    def scores(self, deck: DeckConstruction) -> np.ndarray:
+        """Scores every card in the pool against the deck's current role counts."""
+        scores = np.ones(len(self.quantity))
+        for column, term in enumerate(self.role_terms(deck)):
+            if term:
+                scores += self.has_role[:, column] * term
+        scores -= self.mana_penalty
+        if self.synergy is not None:
+            scores += self.synergy
+        return scores
+
+def _select_nonland_cards_vectorized(deck: DeckConstruction, target_count: int):
+    """
+    The same greedy selection as `_select_nonland_cards`, but every pick scores
+    the whole pool at once with a `ScoringMatrix`. `argmax` returns the first
+    of several equal scores, so ties go to the first card in the pool as well.
+    """
+    limit = 1 if deck.spec.format == "commander" else 4
+    card_names = list(deck.available_pool)
+    if not card_names:
+        return
+    matrix = ScoringMatrix(list(deck.available_pool.values()), list(deck.role_targets), deck.synergy)
+    already_in_deck = np.array([deck.main_deck.get(name, 0) for name in card_names], dtype=np.int64)
+    remaining = np.minimum(matrix.quantity, limit) - already_in_deck
+    remaining[matrix.is_land] = 0
+
+    total_cards = deck.total_cards
+    while total_cards < target_count:
+        scores = matrix.scores(deck)
+        scores[remaining <= 0] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] <= MIN_PICK_SCORE:
+            break
+        deck.add_card(card_names[best])
+        remaining[best] -= 1
+        total_cards += 1
+
+# The selection strategies `build_deck_from_pool` can use. All of them build
+# the same deck.
+SELECTION_ENGINES = {
+    "heap": _select_nonland_cards,
+    "vectorized": _select_nonland_cards_vectorized,
+}
+
 def build_deck(collection_id: str, spec: DeckSpec) -> Decklist:
     """The main entry point for the deck building pipeline."""
     with Session(engine) as session:
-        buildable_pool = get_buildable_cards(collection_id, spec, db_session=session)
-        if not buildable_pool:
-            return Decklist(main_deck={}, sideboard={}, message="No buildable cards found.")
+        buildable_pool, = load_buildable_pools(collection_id, [spec], db_session=session)
+    return build_deck_from_pool(spec, buildable_pool)
 
-        deck = DeckConstruction(spec, buildable_pool)
-        target_deck_size = 100 if spec.format == "commander" else 60
-        non_land_target = target_deck_size - spec.target_lands
+async def build_deck_async(collection_id: str, spec: DeckSpec) -> Decklist:
+    """
+    Async counterpart of `build_deck` for use in request handlers.
 
-        while deck.total_cards < non_land_target:
-            best_card_name = None
-            best_score = -1.0
-            
-            for card_name, card in deck.available_pool.items():
-                current_deck_qty = deck.main_deck.get(card_name, 0)
-                limit = 1 if spec.format == "commander" else 4
-                if current_deck_qty < card.quantity and current_deck_qty < limit:
-                    if "land" not in card.roles:
-                        current_score = score_card(card, deck)
-                        if current_score > best_score:
-                            best_score = current_score
-                            best_card_name = card_name
-            
-            if best_card_name:
-                deck.add_card(best_card_name)
-            else:
-                break
-        
-        lands_in_deck = {}
-        for card in buildable_pool:
-            if "land" in card.roles and card.name not in deck.main_deck:
-                is_basic = any(lt in card.type_line.lower() for lt in ["plains", "island", "swamp", "mountain", "forest"])
-                if not is_basic:
-                    if sum(lands_in_deck.values()) < (spec.target_lands * 0.5):
-                        deck.add_card(card.name)
-                        lands_in_deck[card.name] = 1
-
-        remaining_lands = spec.target_lands - len(lands_in_deck)
-        if remaining_lands > 0:
-            basic_land_base = _generate_basic_land_base(deck, buildable_pool, remaining_lands)
-            deck.main_deck.update(basic_land_base)
-        
-        message = f"Deck built successfully with {deck.total_cards} cards!"
-        if deck.total_cards != target_deck_size:
-            message += f" WARNING: Final deck count is {deck.total_cards}, which is incorrect for the '{spec.format}' format."
-
-        return Decklist(
-            main_deck=deck.main_deck,
-            sideboard={},
-            message=message
-        )
+    The pool is loaded on the async engine, and the CPU-bound construction runs
+    in a worker thread so it does not stall other requests on the event loop.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        buildable_pool, = await session.run_sync(lambda sync_session: load_buildable_pools(collection_id, [spec], sync_session))
+    return await asyncio.to_thread(build_deck_from_pool, spec, buildable_pool)
+
+def build_decks(collection_id: str, specs: List[DeckSpec]) -> List[Decklist]:
+    """Builds one deck per spec from a collection, loading the collection only once."""
+    with Session(engine) as session:
+        pools = load_buildable_pools(collection_id, specs, session)
+    return [build_deck_from_pool(spec, pool) for spec, pool in zip(specs, pools)]
+
+async def build_decks_async(collection_id: str, specs: List[DeckSpec]) -> List[Decklist]:
+    """
+    Async counterpart of `build_decks` for use in request handlers.
+
+    The collection is loaded once for all specs, and the decks are then built
+    in parallel on the shared deck-building process pool.
+
+    Returns:
+        The decklists, in the order of `specs`.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        pools = await session.run_sync(lambda sync_session: load_buildable_pools(collection_id, specs, sync_session))
+    # Scored here so that the embedding index and model are only loaded in this process.
+    synergies = await asyncio.to_thread(lambda: [pool_synergy(spec, pool) for spec, pool in zip(specs, pools)])
+
+    loop = asyncio.get_running_loop()
+    executor = get_deck_build_executor()
+    builds = [
+        loop.run_in_executor(executor, build_deck_from_pool, spec, pool, None, synergy)
+        for spec, pool, synergy in zip(specs, pools, synergies)
+    ]
+    return list(await asyncio.gather(*builds))
+
+_deck_build_executor: Optional[ProcessPoolExecutor] = None
+
+def get_deck_build_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    Returns the process pool shared by batch builds, creating it on first use.
+
+    Returns `None` when `DECK_BUILD_WORKERS` is 1, in which case batch builds
+    run on the event loop's default thread pool instead.
+    """
+    global _deck_build_executor
+    if _deck_build_executor is None and DECK_BUILD_WORKERS > 1:
+        _deck_build_executor = ProcessPoolExecutor(max_workers=DECK_BUILD_WORKERS)
+    return _deck_build_executor
+
+def shutdown_deck_build_executor():
+    """Stops the shared deck-building process pool, if it was started."""
+    global _deck_build_executor
+    if _deck_build_executor is not None:
+        _deck_build_executor.shutdown(cancel_futures=True)
+        _deck_build_executor = None
+
+def build_deck_from_pool(
+    spec: DeckSpec, buildable_pool: List[AnalyzedCard], engine: Optional[str] = None, synergy: Optional[Dict[str, float]] = None
+) -> Decklist:
+    """
+    Builds a deck from an already loaded and analyzed pool of cards.
+
+    Args:
+        spec: The deck specification.
+        buildable_pool: The cards to build from.
+        engine: The name of a `SELECTION_ENGINES` strategy; defaults to `DECK_BUILDER_ENGINE`.
+        synergy: Precomputed `pool_synergy` bonuses; computed here if not given.
+    """
+    select_nonland_cards = SELECTION_ENGINES.get(engine or DECK_BUILDER_ENGINE)
+    if select_nonland_cards is None:
+        raise ValueError(f"Unknown deck builder engine '{engine or DECK_BUILDER_ENGINE}'. Choose one of: {', '.join(SELECTION_ENGINES)}.")
+    if not buildable_pool:
+        return Decklist(main_deck={}, sideboard={}, message="No buildable cards found.")
+
+    if synergy is None:
+        synergy = pool_synergy(spec, buildable_pool)
+    deck = DeckConstruction(spec, buildable_pool, synergy)
+    select_nonland_cards(deck, nonland_target(spec))
+    return finish_deck(deck, buildable_pool)
+
+def deck_size(spec: DeckSpec) -> int:
+    """The number of cards in a finished deck of the spec's format."""
+    return 100 if spec.format == "commander" else 60
+
+def nonland_target(spec: DeckSpec) -> int:
+    """The number of non-land cards the greedy selection aims for."""
+    return deck_size(spec) - spec.target_lands
+
+def finish_deck(deck: DeckConstruction, buildable_pool: List[AnalyzedCard]) -> Decklist:
+    """Adds the land base to a deck whose non-land cards have been chosen."""
+    spec = deck.spec
+    target_deck_size = deck_size(spec)
+
+    lands_in_deck = {}
+    for card in buildable_pool:
+        if card.role_mask & LAND_ROLE and card.name not in deck.main_deck:
+            is_basic = any(lt in card.type_line.lower() for lt in ["plains", "island", "swamp", "mountain", "forest"])
+            if not is_basic:
+                if sum(lands_in_deck.values()) < (spec.target_lands * 0.5):
+                    deck.add_card(card.name)
+                    lands_in_deck[card.name] = 1
+
+    remaining_lands = spec.target_lands - len(lands_in_deck)
+    if remaining_lands > 0:
+        basic_land_base = _generate_basic_land_base(deck, buildable_pool, remaining_lands)
+        deck.main_deck.update(basic_land_base)
+    
+    message = f"Deck built successfully with {deck.total_cards} cards!"
+    if deck.total_cards != target_deck_size:
+        message += f" WARNING: Final deck count is {deck.total_cards}, which is incorrect for the '{spec.format}' format."
+
+    return Decklist(
+        main_deck=deck.main_deck,
+        sideboard={},
+        message=message
+    )
 
 # =============================================================================
 # Card Analysis and Filtering
 # =============================================================================
 
-def analyze_card_roles(card: AnalyzedCard) -> List[str]:
-    """Assigns functional roles to a card based on its type and oracle text."""
-    roles = set()
-    type_line = card.type_line.lower()
-    oracle_text = (card.oracle_text or "").lower()
-    
-    if "add" in oracle_text and ("{" in oracle_text or "mana" in oracle_text): roles.add("ramp")
-    if "search your library for a basic land card" in oracle_text: roles.add("ramp")
-    if re.search(r"\bdraw(s)?\b.*\bcard(s)?\b", oracle_text): roles.add("draw")
-    if "search your library for a card" in oracle_text and "put it into your hand" in oracle_text: roles.add("tutor")
-    
-    if re.search(r"\bdestroy all creatures\b", oracle_text) or re.search(r"\bexile all creatures\b", oracle_text):
-        roles.add("board_wipe")
-        roles.add("removal")
+# Legality statuses that allow a card in a deck.
+PLAYABLE_LEGALITIES = ["legal", "restricted"]
 
-    removal_patterns = [r"\bdestroy(s)?\b.*\btarget\b", r"\bexile(s)?\b.*\btarget\b", r"\bdeal(s)?\b.*\bdamage\b.*\bto any target\b", r"\bdeal(s)?\b.*\bdamage\b.*\btarget creature\b", r"\bfight(s)?\b.*\banother target creature\b"]
-    if any(re.search(p, oracle_text) for p in removal_patterns): roles.add("removal")
-    
-    disruption_patterns = [r"\bcounter(s)?\b.*\btarget\b.*\bspell\b", r"target player.*discards"]
-    if any(re.search(p, oracle_text) for p in disruption_patterns): roles.add("disruption")
+class PoolCard(NamedTuple):
+    """A card loaded for one or more specs, with what is needed to filter it per spec."""
+    card: AnalyzedCard
+    # The requested formats the card is playable in.
+    formats: FrozenSet[str]
 
-    if re.search(r"\bgain(s)? hexproof\b", oracle_text) or re.search(r"\bgain(s)? indestructible\b", oracle_text):
-        roles.add("protection")
-        
-    if re.search(r"creatures you control get \+\d+/\+\d+", oracle_text):
-        roles.add("anthem")
-    
-    if "creature" in type_line: roles.add("threat")
-    if "land" in type_line: roles.add("land")
-    if not roles: roles.add("synergy")
-    
-    return sorted(list(roles))
+def load_pool(collection_id: str, specs: List[DeckSpec], db_session: Session) -> List[PoolCard]:
+    """
+    Loads the cards in a collection that are buildable for at least one of
+    `specs`, together with their roles, in a single query.
 
-def get_buildable_cards(collection_id: str, spec: DeckSpec, db_session: Session) -> List[AnalyzedCard]:
-    """Filters a user's collection and analyzes each card for its roles."""
-    statement = (select(UserCard, ScryfallCardCache).join(ScryfallCardCache).where(UserCard.collection_id == collection_id))
-    results = db_session.exec(statement).all()
-    
-    buildable_pool: List[AnalyzedCard] = []
-    spec_color_set = set(spec.color_identity)
+    The legality and color identity filters are applied by the database, using
+    the normalized legality table and the color identity bitmask, for the union
+    of the specs' formats and colors. `filter_pool` then narrows the result to
+    each spec. Roles are read from the `CardRole` table rather than computed
+    here. Cards come back in the order they were added to the collection.
+    """
+    formats = sorted({spec.format for spec in specs})
+    allowed_masks = sorted({mask for spec in specs for mask in submasks(color_identity_mask(spec.color_identity))})
+    card = ScryfallCardCache
+    statement = (
+        select(
+            UserCard.id, UserCard.quantity, card.id, card.name, card.type_line, card.oracle_text, card.mana_cost,
+            card.cmc, card.color_identity_mask, card.edhrec_rank, card.price_usd, card.roles_version, CardLegality.format,
+        )
+        .select_from(UserCard)
+        .join(card, UserCard.scryfall_card_id == card.id)
+        .join(CardLegality, CardLegality.card_id == card.id)
+        .where(
+            UserCard.collection_id == collection_id,
+            CardLegality.format.in_(formats),
+            CardLegality.status.in_(PLAYABLE_LEGALITIES),
+            card.color_identity_mask.in_(allowed_masks),
+        )
+        .order_by(UserCard.id)
+    )
+    rows_by_user_card: Dict[int, tuple] = {}
+    formats_by_user_card: Dict[int, Set[str]] = defaultdict(set)
+    for row in db_session.exec(statement):
+        rows_by_user_card.setdefault(row[0], row)
+        formats_by_user_card[row[0]].add(row[-1])
 
-    for user_card, scryfall_card in results:
-        legality = scryfall_card.legalities.get(spec.format)
-        if legality not in ["legal", "restricted"]: continue
-        
-        card_color_set = set(scryfall_card.color_identity)
-        if not card_color_set.issubset(spec_color_set): continue
+    roles_statement = (
+        select(CardRole.card_id, CardRole.role)
+        .join(UserCard, UserCard.scryfall_card_id == CardRole.card_id)
+        .where(UserCard.collection_id == collection_id)
+    )
+    stored_role_masks: Dict[uuid.UUID, int] = defaultdict(int)
+    for card_id, role in db_session.exec(roles_statement):
+        stored_role_masks[card_id] |= ROLE_BITS[role]
+
+    # Most cards share one of a handful of format sets.
+    shared_formats: Dict[FrozenSet[str], FrozenSet[str]] = {}
+    pool: List[PoolCard] = []
+    for user_card_id, row in rows_by_user_card.items():
+        (_, quantity, card_id, name, type_line, oracle_text, mana_cost,
+         mana_value, color_mask, edhrec_rank, price_usd, roles_version, _) = row
+        if roles_version == CLASSIFIER_VERSION:
+            card_role_mask = stored_role_masks[card_id]
+        else:
+            # Not yet retagged by the current classifier; see `reclassify_card_roles`.
+            card_role_mask = role_mask(classify_card_roles(type_line, oracle_text))
 
-        temp_card_data = AnalyzedCard(
-            scryfall_id=str(scryfall_card.id), name=scryfall_card.name, quantity=user_card.quantity,
-            type_line=scryfall_card.type_line, oracle_text=scryfall_card.oracle_text, mana_cost=scryfall_card.mana_cost,
-            color_identity=scryfall_card.color_identity, mana_value=scryfall_card.cmc,
-        )
-        card_roles = analyze_card_roles(temp_card_data)
-        
         analyzed_card = AnalyzedCard(
-            scryfall_id=str(scryfall_card.id), name=scryfall_card.name, quantity=user_card.quantity,
-            type_line=scryfall_card.type_line, oracle_text=scryfall_card.oracle_text, mana_cost=scryfall_card.mana_cost,
-            color_identity=scryfall_card.color_identity, mana_value=scryfall_card.cmc, roles=card_roles
+            scryfall_id=str(card_id), name=name, quantity=quantity, type_line=type_line, mana_cost=mana_cost,
+            mana_value=mana_value, role_mask=card_role_mask, color_identity_mask=color_mask,
+            edhrec_rank=edhrec_rank, price_usd=price_usd,
         )
-        buildable_pool.append(analyzed_card)
-        
-    print(f"Found and analyzed {len(buildable_pool)} unique buildable cards in the collection.")
-    return buildable_pool
\ No newline at end of file
+        card_formats = frozenset(formats_by_user_card[user_card_id])
+        pool.append(PoolCard(analyzed_card, shared_formats.setdefault(card_formats, card_formats)))
+
+    return pool
+
+def filter_pool(pool: List[PoolCard], spec: DeckSpec) -> List[AnalyzedCard]:
+    """Returns the cards of a loaded pool that are buildable for `spec`, in pool order."""
+    allowed_masks = set(submasks(color_identity_mask(spec.color_identity)))
+    return [
+        pool_card.card for pool_card in pool
+        if spec.format in pool_card.formats and pool_card.card.color_identity_mask in allowed_masks
+    ]
+
+def load_buildable_pools(collection_id: str, specs: List[DeckSpec], db_session: Session) -> List[List[AnalyzedCard]]:
+    """
+    Returns the buildable pool of each spec, in the order of `specs`.
+
+    Pools are served from `analyzed_pool_cache` where possible. The specs that
+    miss are loaded together with a single `load_pool`, and their pools are
+    cached for the next build; when every spec hits, the database is not
+    queried at all. The returned pools are shared and must not be modified.
+    """
+    pools = [analyzed_pool_cache.get(collection_id, spec) for spec in specs]
+    missing = [spec for spec, pool in zip(specs, pools) if pool is None]
+    if not missing:
+        return pools
+
+    generation = analyzed_pool_cache.generation(collection_id)
+    pool = load_pool(collection_id, missing, db_session)
+    print(f"Loaded {len(pool)} candidate cards for {len(missing)} of {len(specs)} deck specs.")
+    for index, spec in enumerate(specs):
+        if pools[index] is None:
+            pools[index] = filter_pool(pool, spec)
+            analyzed_pool_cache.put(collection_id, spec, pools[index], generation)
+    return pools
+
+def get_buildable_cards(collection_id: str, spec: DeckSpec, db_session: Session) -> List[AnalyzedCard]:
+    """
+    Loads the cards in a collection that are legal in the spec's format and
+    within its color identity, together with their roles.
+    """
+    buildable_pool = filter_pool(load_pool(collection_id, [spec], db_session), spec)
+    print(f"Found {len(buildable_pool)} unique buildable cards in the collection.")
+    return buildable_pool
@@ -0,0 +1,271 @@
+"""
+Improves greedy decks with time-budgeted local search.
+
+The greedy builder commits to each pick and never revisits it. The optimizer
+takes the greedy deck's non-land cards as a starting point and runs simulated
+annealing over one-for-one swaps with the rest of the pool, maximizing a deck
+quality objective:
+
+- role coverage: credit for each scored role up to its target in the spec;
+- mana curve: a penalty per expensive card, as in `score_card`, and a penalty
+  for an average mana value far from `TARGET_AVERAGE_MANA_VALUE`;
+- card quality: a bonus for a good EDHREC rank and, more weakly, a high
+  price, for cards where Scryfall has them;
+- synergy: the same static bonus for the spec's theme or commander as in
+  the greedy builder (see `deck_builder.pool_synergy`).
+
+Several independent restarts run in parallel on the deck-building process
+pool, all against one wall-clock deadline, and the best deck wins. Restarts
+queued behind busy workers only get what is left of the budget, and results
+that are not back shortly after the deadline are dropped, so a request never
+outlasts its budget. Each restart's search path depends only on its seed,
+never on the clock; the deadline only decides how far along that path it gets. Runs that reach
+`max_iterations` within the budget are therefore fully reproducible.
+"""
+
+import asyncio
+import math
+import random
+import time
+from concurrent.futures import Executor, TimeoutError as FuturesTimeoutError
+from typing import List, Optional, Tuple
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..api_models import DeckSpec, Decklist, OptimizerSettings
+from ..database.connection import async_engine
+from .role_classifier import ROLE_BITS
+from .deck_builder import (
+    DECK_BUILDER_ENGINE, LAND_ROLE, SELECTION_ENGINES, AnalyzedCard, DeckConstruction,
+    finish_deck, get_deck_build_executor, load_buildable_pools, nonland_target, pool_synergy,
+)
+
+# --- Objective Weights ---
+# Credit for fully meeting one role target; partial coverage earns a share.
+ROLE_WEIGHT = 10.0
+# Cards above this mana value cost HIGH_MANA_VALUE_PENALTY per extra point.
+HIGH_MANA_VALUE = 5
+HIGH_MANA_VALUE_PENALTY = 0.5
+# Penalty per point of difference between the average and the target mana value.
+CURVE_WEIGHT = 5.0
+TARGET_AVERAGE_MANA_VALUE = 3.0
+# Bonus for the best EDHREC rank, falling off logarithmically to 0 at MAX_EDHREC_RANK.
+EDHREC_WEIGHT = 1.0
+MAX_EDHREC_RANK = 30_000
+# Bonus for price as a rough proxy for power, capped at PRICE_CAP_USD.
+PRICE_WEIGHT = 0.5
+PRICE_CAP_USD = 50.0
+# --- End Objective Weights ---
+
+# --- Search Settings ---
+# Steps per annealing cycle: the temperature cools from the initial to the
+# final value over a cycle, then the search reheats from the best deck found.
+ANNEALING_CYCLE_LENGTH = 50_000
+INITIAL_TEMPERATURE = 2.0
+FINAL_TEMPERATURE = 0.01
+# How many iterations run between checks of the clock.
+CLOCK_CHECK_INTERVAL = 256
+# How long past the deadline to wait for a restart's result to come back.
+RESULT_GRACE_SECONDS = 1.0
+# --- End Search Settings ---
+
+class SearchProblem:
+    """
+    The non-land cards of a pool, reduced to what the objective needs.
+
+    Candidates are indexed in pool order. A deck is a list of candidate
+    indices, one per copy.
+    """
+
+    def __init__(self, deck: DeckConstruction):
+        limit = 1 if deck.spec.format == "commander" else 4
+        self.role_names = sorted(role for role, target in deck.role_targets.items() if target > 0)
+        role_bits = [ROLE_BITS[role] for role in self.role_names]
+        self.role_targets = [deck.role_targets[role] for role in self.role_names]
+
+        self.names: List[str] = []
+        self.caps: List[int] = []
+        self.roles: List[Tuple[int, ...]] = []
+        self.mana_values: List[float] = []
+        self.static_values: List[float] = []
+        for name, card in deck.available_pool.items():
+            if card.role_mask & LAND_ROLE or min(card.quantity, limit) <= 0:
+                continue
+            self.names.append(name)
+            self.caps.append(min(card.quantity, limit))
+            self.roles.append(tuple(index for index, bit in enumerate(role_bits) if card.role_mask & bit))
+            self.mana_values.append(card.mana_value)
+            self.static_values.append(card_static_value(card) + deck.synergy.get(name, 0.0))
+        self.index_by_name = {name: index for index, name in enumerate(self.names)}
+
+    def objective(self, slots: List[int]) -> float:
+        """Scores a deck given as candidate indices."""
+        role_counts = [0] * len(self.role_names)
+        for index in slots:
+            for role in self.roles[index]:
+                role_counts[role] += 1
+        mana_value_sum = sum(self.mana_values[index] for index in slots)
+        static_sum = sum(self.static_values[index] for index in slots)
+        return self._role_value(role_counts) + static_sum + self.curve_value(mana_value_sum, len(slots))
+
+    def _role_value(self, role_counts: List[int]) -> float:
+        return sum(ROLE_WEIGHT * min(count, target) / target for count, target in zip(role_counts, self.role_targets))
+
+    @staticmethod
+    def curve_value(mana_value_sum: float, size: int) -> float:
+        """The curve part of the objective for a deck's total mana value and size."""
+        if not size:
+            return 0.0
+        return -CURVE_WEIGHT * abs(mana_value_sum / size - TARGET_AVERAGE_MANA_VALUE)
+
+def card_static_value(card: AnalyzedCard) -> float:
+    """The part of a card's contribution to the objective that does not depend on the rest of the deck."""
+    value = 0.0
+    if card.mana_value > HIGH_MANA_VALUE:
+        value -= (card.mana_value - HIGH_MANA_VALUE) * HIGH_MANA_VALUE_PENALTY
+    if card.edhrec_rank is not None:
+        value += EDHREC_WEIGHT * max(0.0, 1 - math.log1p(card.edhrec_rank) / math.log1p(MAX_EDHREC_RANK))
+    if card.price_usd:
+        value += PRICE_WEIGHT * min(1.0, math.log1p(card.price_usd) / math.log1p(PRICE_CAP_USD))
+    return value
+
+def anneal(problem: SearchProblem, start: List[int], seed: int, deadline: float, max_iterations: Optional[int] = None) -> Tuple[float, List[int], int]:
+    """
+    Runs one simulated annealing restart from a starting deck.
+
+    Each step swaps one copy in the deck for a copy of a random candidate,
+    keeping the deck size fixed. Improvements are always accepted, and
+    regressions with a probability that falls as the temperature cools
+    geometrically over a cycle of `ANNEALING_CYCLE_LENGTH` steps (or
+    `max_iterations`, if that is shorter). When a cycle
+    ends, the search reheats from the best deck so far, until the `deadline`
+    (a `time.time()` timestamp, comparable across processes) passes or
+    `max_iterations` runs out. Runs in worker processes.
+
+    Returns:
+        The best objective found, the deck that achieved it and the number of
+        steps taken.
+    """
+    rng = random.Random(seed)
+    if not start or len(problem.names) < 2:
+        return problem.objective(start), list(start), 0
+
+    role_weights = [ROLE_WEIGHT / target for target in problem.role_targets]
+    targets, roles, caps = problem.role_targets, problem.roles, problem.caps
+    mana_values, static_values = problem.mana_values, problem.static_values
+    size = len(start)
+    cycle_length = min(ANNEALING_CYCLE_LENGTH, max_iterations or ANNEALING_CYCLE_LENGTH)
+    cooling = (FINAL_TEMPERATURE / INITIAL_TEMPERATURE) ** (1 / cycle_length)
+
+    best, best_slots = problem.objective(start), list(start)
+    iteration = 0
+    while max_iterations is None or iteration < max_iterations:
+        if iteration % cycle_length == 0:
+            # Start a cycle from the best deck so far.
+            slots = list(best_slots)
+            current = best
+            temperature = INITIAL_TEMPERATURE
+            copies = [0] * len(problem.names)
+            role_counts = [0] * len(problem.role_names)
+            for index in slots:
+                copies[index] += 1
+                for role in roles[index]:
+                    role_counts[role] += 1
+            mana_value_sum = sum(mana_values[index] for index in slots)
+        if iteration % CLOCK_CHECK_INTERVAL == 0 and time.time() >= deadline:
+            break
+        iteration += 1
+        temperature *= cooling
+        position = rng.randrange(size)
+        removed, added = slots[position], rng.randrange(len(caps))
+        if added == removed or copies[added] >= caps[added]:
+            continue
+
+        delta = static_values[added] - static_values[removed]
+        for role in roles[removed]:
+            if role not in roles[added] and role_counts[role] <= targets[role]:
+                delta -= role_weights[role]
+        for role in roles[added]:
+            if role not in roles[removed] and role_counts[role] < targets[role]:
+                delta += role_weights[role]
+        new_mana_value_sum = mana_value_sum - mana_values[removed] + mana_values[added]
+        delta += problem.curve_value(new_mana_value_sum, size) - problem.curve_value(mana_value_sum, size)
+
+        if delta < 0 and rng.random() >= math.exp(delta / temperature):
+            continue
+        slots[position] = added
+        copies[removed] -= 1
+        copies[added] += 1
+        for role in roles[removed]:
+            role_counts[role] -= 1
+        for role in roles[added]:
+            role_counts[role] += 1
+        mana_value_sum = new_mana_value_sum
+        current += delta
+        if current > best:
+            best, best_slots = current, list(slots)
+
+    # Recompute exactly; the running total accumulates rounding error.
+    return problem.objective(best_slots), best_slots, iteration
+
+def optimize_deck_from_pool(
+    spec: DeckSpec, buildable_pool: List[AnalyzedCard], settings: OptimizerSettings, executor: Optional[Executor] = None
+) -> Decklist:
+    """
+    Builds the greedy deck from a pool, then improves its non-land cards.
+
+    With an `executor`, the restarts run concurrently until one deadline, the
+    time budget from now. Without one, they run one after another and split
+    the budget evenly. Either way, the call returns within about the budget.
+    """
+    if not buildable_pool:
+        return Decklist(main_deck={}, sideboard={}, message="No buildable cards found.")
+
+    synergy = pool_synergy(spec, buildable_pool)
+    greedy_deck = DeckConstruction(spec, buildable_pool, synergy)
+    SELECTION_ENGINES[DECK_BUILDER_ENGINE](greedy_deck, nonland_target(spec))
+    problem = SearchProblem(greedy_deck)
+    start = [problem.index_by_name[name] for name, count in greedy_deck.main_deck.items() for _ in range(count)]
+    greedy_score = problem.objective(start)
+
+    seeds = [settings.seed * 1_000_003 + restart for restart in range(settings.restarts)]
+    started = time.time()
+    deadline = started + settings.time_budget_seconds
+    results: List[Tuple[float, List[int], int]] = []
+    if executor is None:
+        share = settings.time_budget_seconds / settings.restarts
+        for restart, seed in enumerate(seeds, start=1):
+            results.append(anneal(problem, start, seed, started + share * restart, settings.max_iterations))
+    else:
+        futures = [executor.submit(anneal, problem, start, seed, deadline, settings.max_iterations) for seed in seeds]
+        cutoff = deadline + RESULT_GRACE_SECONDS
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0.0, cutoff - time.time())))
+            except FuturesTimeoutError:
+                future.cancel()
+        if len(results) < len(futures):
+            print(f"Dropped {len(futures) - len(results)} optimizer restarts that did not finish within the time budget.")
+    finished = len(results)
+    if not results:
+        results = [(greedy_score, start, 0)]
+
+    # The first restart wins ties, so the choice does not depend on timing.
+    best_score, best_slots, _ = max(results, key=lambda result: result[0])
+    steps = sum(result[2] for result in results)
+
+    deck = DeckConstruction(spec, buildable_pool, synergy)
+    for index in sorted(best_slots):
+        deck.add_card(problem.names[index])
+    decklist = finish_deck(deck, buildable_pool)
+    decklist.message += (
+        f" Optimized deck quality from {greedy_score:.1f} to {best_score:.1f}"
+        f" ({steps} search steps across {finished} restarts)."
+    )
+    return decklist
+
+async def optimize_deck_async(collection_id: str, spec: DeckSpec, settings: OptimizerSettings) -> Decklist:
+    """Loads a collection's pool and runs `optimize_deck_from_pool` on the deck-building process pool."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        buildable_pool, = await session.run_sync(lambda sync_session: load_buildable_pools(collection_id, [spec], sync_session))
+    print(f"Optimizing a deck from {len(buildable_pool)} buildable cards for {settings.time_budget_seconds}s.")
+    return await asyncio.to_thread(optimize_deck_from_pool, spec, buildable_pool, settings, get_deck_build_executor())
@@ -0,0 +1,344 @@
+"""
+Estimates how a built deck draws by goldfishing it: playing many games
+against no opponent and counting how often the mana works out.
+
+Each game shuffles the deck, draws seven cards and takes London mulligans
+until it keeps a hand with an acceptable number of lands, putting the extra
+cards on the bottom (the most expensive spells first, keeping about three
+lands in seven). It then draws for `turns` turns, playing a land every turn
+it has one. The report gives the mulligan rate, the chance of making every
+land drop through each turn, and, per color, the chance of casting a spell
+on curve: a spell of mana value N on turn N.
+
+Games run in batches of `SIMULATION_CHUNK_SIZE` as NumPy arrays, one row per
+game: the shuffles are a partial Fisher-Yates over the top of every deck at
+once, and each turn is a handful of array operations over all the games. The
+chunks draw from independent seeds spawned from the caller's seed, so a
+report only depends on the seed, whether the chunks run here or spread over
+the deck-building process pool.
+
+Mana is counted per color: a spell is castable when enough lands are in play
+and, for each color, at least as many lands can produce that color as the
+spell has pips of it. A land producing several colors counts for each, so
+multicolored spells are slightly optimistic. Hybrid and Phyrexian symbols
+count as generic mana, as in the land base generator.
+"""
+
+import asyncio
+import re
+from concurrent.futures import Executor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..api_models import Decklist, SimulationReport, SimulationSettings
+from ..database.connection import async_engine, engine
+from ..database.models import ScryfallCardCache
+from .deck_builder import get_deck_build_executor
+
+# --- Configuration ---
+# Games simulated per batch of array operations.
+SIMULATION_CHUNK_SIZE = 25_000
+HAND_SIZE = 7
+# The share of lands kept when a mulligan puts cards on the bottom.
+KEEP_LAND_RATIO = 3 / 7
+# --- End Configuration ---
+
+COLORS = ["W", "U", "B", "R", "G"]
+BASIC_LAND_TYPES = {"Plains": "W", "Island": "U", "Swamp": "B", "Mountain": "R", "Forest": "G"}
+_MANA_SYMBOL = re.compile(r"\{([WUBRG])\}")
+
+class CardProfile(NamedTuple):
+    """What the simulation needs to know about one card."""
+    is_land: bool
+    mana_value: int
+    # Colored pips in the mana cost, in `COLORS` order.
+    pips: Tuple[int, ...]
+    # For lands, whether they can produce each color.
+    produces: Tuple[bool, ...]
+
+class DeckProfile(NamedTuple):
+    """A decklist as arrays with one row per distinct card."""
+    counts: np.ndarray
+    is_land: np.ndarray
+    mana_value: np.ndarray
+    pips: np.ndarray
+    produces: np.ndarray
+    unknown_cards: List[str]
+
+    @property
+    def size(self) -> int:
+        return int(self.counts.sum())
+
+# =============================================================================
+# Card Profiles
+# =============================================================================
+
+def land_colors(type_line: str, oracle_text: Optional[str]) -> Tuple[bool, ...]:
+    """
+    The colors a land can produce: those of its basic land types, and the mana
+    symbols on its "Add" lines. "Mana of any color" produces every color.
+    """
+    colors = {color for land_type, color in BASIC_LAND_TYPES.items() if land_type in type_line}
+    for line in (oracle_text or "").splitlines():
+        if "mana of any color" in line.lower():
+            colors.update(COLORS)
+        elif "add " in line.lower():
+            colors.update(_MANA_SYMBOL.findall(line))
+    return tuple(color in colors for color in COLORS)
+
+def card_profile(type_line: Optional[str], oracle_text: Optional[str], mana_cost: Optional[str], mana_value: float) -> CardProfile:
+    """Profiles a card from its front face."""
+    front_type_line = (type_line or "").split("//")[0]
+    if "Land" in front_type_line:
+        return CardProfile(True, 0, (0,) * len(COLORS), land_colors(front_type_line, oracle_text))
+    symbols = _MANA_SYMBOL.findall((mana_cost or "").split("//")[0])
+    return CardProfile(False, int(round(mana_value)), tuple(symbols.count(color) for color in COLORS), (False,) * len(COLORS))
+
+def basic_land_profile(name: str) -> Optional[CardProfile]:
+    """Profiles a basic land by name, for decks whose land base was generated rather than owned."""
+    land_type = name.replace("Snow-Covered ", "")
+    if land_type == "Wastes":
+        return CardProfile(True, 0, (0,) * len(COLORS), (False,) * len(COLORS))
+    if land_type in BASIC_LAND_TYPES:
+        return card_profile(f"Basic Land — {land_type}", None, None, 0)
+    return None
+
+def load_card_profiles(names: List[str], db_session: Session) -> Dict[str, CardProfile]:
+    """Profiles cards by name from the card cache. Missing names are left out."""
+    statement = select(
+        ScryfallCardCache.name, ScryfallCardCache.type_line, ScryfallCardCache.oracle_text,
+        ScryfallCardCache.mana_cost, ScryfallCardCache.cmc,
+    ).where(ScryfallCardCache.name.in_(names))
+    profiles: Dict[str, CardProfile] = {}
+    for name, type_line, oracle_text, mana_cost, mana_value in db_session.exec(statement):
+        # Every printing has the same rules text.
+        if name not in profiles:
+            profiles[name] = card_profile(type_line, oracle_text, mana_cost, mana_value)
+    return profiles
+
+def deck_profile(decklist: Decklist, profiles: Dict[str, CardProfile]) -> DeckProfile:
+    """
+    Lays a decklist out as arrays. Basic lands need no profile; other cards
+    without one are simulated as spells that are never cast.
+    """
+    names = [name for name, count in decklist.main_deck.items() if count > 0]
+    unknown_cards = []
+    rows = []
+    for name in names:
+        profile = profiles.get(name) or basic_land_profile(name)
+        if profile is None:
+            unknown_cards.append(name)
+            profile = CardProfile(False, 0, (0,) * len(COLORS), (False,) * len(COLORS))
+        rows.append(profile)
+    return DeckProfile(
+        counts=np.array([decklist.main_deck[name] for name in names], dtype=np.int64),
+        is_land=np.array([row.is_land for row in rows], dtype=bool),
+        mana_value=np.array([row.mana_value for row in rows], dtype=np.int64),
+        pips=np.array([row.pips for row in rows], dtype=np.int16).reshape(-1, len(COLORS)),
+        produces=np.array([row.produces for row in rows], dtype=bool).reshape(-1, len(COLORS)),
+        unknown_cards=unknown_cards,
+    )
+
+# =============================================================================
+# Simulation
+# =============================================================================
+
+class SimulationCounts(NamedTuple):
+    """Raw event counts from a batch of games; added up across batches."""
+    games: int
+    mulligans: int
+    # Games by the number of mulligans taken.
+    mulligan_counts: np.ndarray
+    # Per turn.
+    land_drops: np.ndarray
+    # Per color column (`COLORS`, then "any") and turn.
+    drawn: np.ndarray
+    cast: np.ndarray
+
+    def __add__(self, other: "SimulationCounts") -> "SimulationCounts":
+        return SimulationCounts(*(mine + theirs for mine, theirs in zip(self, other)))
+
+def _top_cards(rng: np.random.Generator, deck: np.ndarray, games: int, depth: int) -> np.ndarray:
+    """
+    Shuffles `games` copies of a deck and returns the top `depth` cards of
+    each. Only the top of the deck is shuffled: step i swaps position i with a
+    random later position in every row at once.
+    """
+    order = np.tile(deck, (games, 1))
+    rows = np.arange(games)
+    for position in range(depth):
+        swap = rng.integers(position, len(deck), size=games)
+        swapped = order[rows, swap]
+        order[rows, swap] = order[:, position]
+        order[:, position] = swapped
+    return order[:, :depth]
+
+def _kept_cards(profile: DeckProfile, hands: np.ndarray, mulligans: np.ndarray) -> np.ndarray:
+    """
+    Chooses the cards each game keeps from its last seven-card draw, putting
+    one card on the bottom per mulligan. About `KEEP_LAND_RATIO` of the kept
+    cards are lands, where the hand allows; the spells kept are the cheapest.
+    """
+    is_land = profile.is_land[hands]
+    lands = is_land.sum(axis=1)
+    kept = HAND_SIZE - mulligans
+    lands_kept = np.minimum(lands, np.maximum(kept - (HAND_SIZE - lands), np.rint(kept * KEEP_LAND_RATIO).astype(np.int64)))
+    spells_kept = kept - lands_kept
+
+    land_rank = np.cumsum(is_land, axis=1) - 1
+    spell_cost = np.where(is_land, np.iinfo(np.int64).max, profile.mana_value[hands])
+    spell_rank = np.argsort(np.argsort(spell_cost, axis=1, kind="stable"), axis=1)
+    return np.where(is_land, land_rank < lands_kept[:, None], spell_rank < spells_kept[:, None])
+
+def _games_per_color(games_with: np.ndarray, color_masks: np.ndarray) -> np.ndarray:
+    """
+    Counts, per color bit, the games with at least one spell of that color,
+    given one (game, color mask) pair per spell, sorted by game.
+    """
+    counts = np.zeros(len(COLORS) + 1, dtype=np.int64)
+    if not len(games_with):
+        return counts
+    game_starts = np.flatnonzero(np.concatenate([[True], games_with[1:] != games_with[:-1]]))
+    game_masks = np.bitwise_or.reduceat(color_masks, game_starts)
+    for bit in range(len(counts)):
+        counts[bit] = np.count_nonzero(game_masks & (1 << bit))
+    return counts
+
+def _simulate_chunk(profile: DeckProfile, settings: SimulationSettings, games: int, seed: np.random.SeedSequence) -> SimulationCounts:
+    """Plays a batch of games. Runs in worker processes."""
+    rng = np.random.default_rng(seed)
+    deck = np.repeat(np.arange(len(profile.counts), dtype=np.int16), profile.counts)
+    turns = settings.turns
+    # Cards drawn by the end of each turn, after the opening hand.
+    draws = [turn - 1 if settings.on_the_play else turn for turn in range(1, turns + 1)]
+    depth = HAND_SIZE + draws[-1]
+
+    def keepable(top: np.ndarray) -> np.ndarray:
+        lands = profile.is_land[top[:, :HAND_SIZE]].sum(axis=1)
+        return (lands >= settings.min_keep_lands) & (lands <= settings.max_keep_lands)
+
+    cards = _top_cards(rng, deck, games, depth)
+    mulligans = np.zeros(games, dtype=np.int64)
+    pending = ~keepable(cards)
+    first_mulligans = int(pending.sum())
+    for mulligan in range(1, settings.max_mulligans + 1):
+        redrawn = np.flatnonzero(pending)
+        if not redrawn.size:
+            break
+        cards[redrawn] = _top_cards(rng, deck, redrawn.size, depth)
+        mulligans[redrawn] = mulligan
+        pending[redrawn] = ~keepable(cards[redrawn])
+
+    # The kept hand followed by the draws, with bottomed cards masked out.
+    in_game = np.ones(cards.shape, dtype=bool)
+    in_game[:, :HAND_SIZE] = _kept_cards(profile, cards[:, :HAND_SIZE], mulligans)
+    is_land = profile.is_land[cards] & in_game
+    lands_seen = np.cumsum(is_land, axis=1)
+
+    # The lands in play are the first ones seen, so the sources on the
+    # battlefield after k land drops are a prefix sum over the lands in order.
+    # No more than `turns` lands are ever played.
+    lands_first = np.argsort(~is_land, axis=1, kind="stable")[:, :turns]
+    land_cards = np.take_along_axis(cards, lands_first, axis=1)
+    land_produces = profile.produces[land_cards] & np.take_along_axis(is_land, lands_first, axis=1)[:, :, None]
+    sources_after = np.concatenate(
+        [np.zeros((games, 1, len(COLORS)), dtype=np.int16), np.cumsum(land_produces, axis=1, dtype=np.int16)], axis=1
+    )
+
+    # Every spell that could be cast on curve in some turn, as a flat list of
+    # (game, card) pairs. Each turn only checks its own mana value.
+    is_spell = in_game & ~is_land
+    mana_value = profile.mana_value[cards]
+    pair_games, pair_positions = np.nonzero(is_spell & (mana_value >= 1) & (mana_value <= turns))
+    pair_cards = cards[pair_games, pair_positions]
+    pair_mana_values = profile.mana_value[pair_cards]
+    pair_pips = profile.pips[pair_cards]
+    # A bit per color of the spell, in `COLORS` order, then a bit set for every spell.
+    color_bits = np.concatenate([1 << np.arange(len(COLORS)), [1 << len(COLORS)]])
+    pair_colors = np.concatenate([pair_pips > 0, np.ones((len(pair_cards), 1), dtype=bool)], axis=1) @ color_bits
+
+    land_drops = np.zeros(turns, dtype=np.int64)
+    drawn = np.zeros((len(COLORS) + 1, turns), dtype=np.int64)
+    cast = np.zeros((len(COLORS) + 1, turns), dtype=np.int64)
+    lands_played = np.zeros(games, dtype=np.int64)
+    for turn in range(1, turns + 1):
+        seen = HAND_SIZE + draws[turn - 1]
+        lands_played = np.minimum(lands_played + 1, lands_seen[:, seen - 1])
+        on_curve_mana = lands_played >= turn
+        land_drops[turn - 1] = on_curve_mana.sum()
+
+        this_turn = (pair_mana_values == turn) & (pair_positions < seen)
+        games_with, colors = pair_games[this_turn], pair_colors[this_turn]
+        sources = sources_after[games_with, lands_played[games_with]]
+        castable = on_curve_mana[games_with] & (pair_pips[this_turn] <= sources).all(axis=1)
+        # Pairs come out of `np.nonzero` in game order, as `_games_per_color` needs.
+        drawn[:, turn - 1] = _games_per_color(games_with, colors)
+        cast[:, turn - 1] = _games_per_color(games_with[castable], colors[castable])
+
+    return SimulationCounts(
+        games=games,
+        mulligans=first_mulligans,
+        mulligan_counts=np.bincount(mulligans, minlength=settings.max_mulligans + 1),
+        land_drops=land_drops,
+        drawn=drawn,
+        cast=cast,
+    )
+
+def simulate_deck(profile: DeckProfile, settings: SimulationSettings, executor: Optional[Executor] = None) -> SimulationReport:
+    """
+    Goldfishes a profiled deck. With an `executor`, the batches of games run
+    across its workers.
+
+    Raises:
+        ValueError: If the deck is too small to draw the hands and turns asked for.
+    """
+    draws = settings.turns - 1 if settings.on_the_play else settings.turns
+    if profile.size < HAND_SIZE + draws:
+        raise ValueError(f"A {profile.size}-card deck cannot draw {HAND_SIZE} cards and {draws} more.")
+
+    chunks = [min(SIMULATION_CHUNK_SIZE, settings.simulations - start) for start in range(0, settings.simulations, SIMULATION_CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(settings.seed).spawn(len(chunks))
+    if executor is None:
+        results = [_simulate_chunk(profile, settings, games, seed) for games, seed in zip(chunks, seeds)]
+    else:
+        futures = [executor.submit(_simulate_chunk, profile, settings, games, seed) for games, seed in zip(chunks, seeds)]
+        results = [future.result() for future in futures]
+    counts = sum(results[1:], results[0])
+
+    games = counts.games
+    with np.errstate(invalid="ignore", divide="ignore"):
+        when_drawn = np.where(counts.drawn > 0, counts.cast / counts.drawn, 0.0)
+    color_keys = COLORS + ["any"]
+    return SimulationReport(
+        simulations=games,
+        deck_size=profile.size,
+        mulligan_rate=counts.mulligans / games,
+        hand_sizes={HAND_SIZE - mulligans: count / games for mulligans, count in enumerate(counts.mulligan_counts.tolist())},
+        land_drops=(counts.land_drops / games).tolist(),
+        on_curve={key: (counts.cast[index] / games).tolist() for index, key in enumerate(color_keys)},
+        on_curve_when_drawn={key: when_drawn[index].tolist() for index, key in enumerate(color_keys)},
+        unknown_cards=profile.unknown_cards,
+    )
+
+def simulate_decklist(decklist: Decklist, settings: Optional[SimulationSettings] = None) -> SimulationReport:
+    """Goldfishes a decklist, looking its cards up in the card cache. The Python entry point."""
+    settings = settings or SimulationSettings()
+    with Session(engine) as session:
+        profiles = load_card_profiles(list(decklist.main_deck), session)
+    executor = get_deck_build_executor() if settings.parallel else None
+    return simulate_deck(deck_profile(decklist, profiles), settings, executor)
+
+async def simulate_decklist_async(decklist: Decklist, settings: SimulationSettings) -> SimulationReport:
+    """
+    Async counterpart of `simulate_decklist` for use in request handlers. The
+    simulation runs in a worker thread, or on the process pool if `parallel`.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        profiles = await session.run_sync(lambda sync_session: load_card_profiles(list(decklist.main_deck), sync_session))
+    profile = deck_profile(decklist, profiles)
+    executor = get_deck_build_executor() if settings.parallel else None
+    print(f"Simulating {settings.simulations} games of a {profile.size}-card deck over {settings.turns} turns.")
+    return await asyncio.to_thread(simulate_deck, profile, settings, executor)
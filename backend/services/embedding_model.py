@@ -0,0 +1,53 @@
+"""
+The sentence-transformer model shared by the rules search and the card
+embedding index.
+
+The model is large, so a process loads it once, on first use, as the ChromaDB
+embedding function the rules collection queries with, and the card embedding
+index embeds through that same instance. If loading fails (for example, the
+model cannot be downloaded while offline), the error is raised to the caller
+and further attempts are held off for `EMBEDDING_MODEL_RETRY_SECONDS`, so a
+broken model does not stall every request that wants it.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Optional
+
+# --- Configuration ---
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_MODEL_RETRY_SECONDS = float(os.getenv("EMBEDDING_MODEL_RETRY_SECONDS", "60"))
+# --- End Configuration ---
+
+_embedding_function: Optional[Any] = None
+_failure: Optional[Exception] = None
+_failed_at = 0.0
+_lock = threading.Lock()
+
+def get_embedding_function():
+    """
+    Returns the process-wide `SentenceTransformerEmbeddingFunction`, loading
+    the model the first time.
+
+    Raises:
+        Exception: Whatever loading the model raised, or a `RuntimeError` if
+            it failed less than `EMBEDDING_MODEL_RETRY_SECONDS` ago.
+    """
+    global _embedding_function, _failure, _failed_at
+    if _embedding_function is not None:
+        return _embedding_function
+    with _lock:
+        if _embedding_function is not None:
+            return _embedding_function
+        if _failure is not None and time.monotonic() - _failed_at < EMBEDDING_MODEL_RETRY_SECONDS:
+            raise RuntimeError(f"Embedding model '{EMBEDDING_MODEL_NAME}' failed to load recently: {_failure}")
+        try:
+            from chromadb.utils import embedding_functions
+            print(f"Loading embedding model '{EMBEDDING_MODEL_NAME}'...")
+            _embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL_NAME)
+        except Exception as e:
+            _failure, _failed_at = e, time.monotonic()
+            raise
+        _failure = None
+        return _embedding_function
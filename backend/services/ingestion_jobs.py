@@ -0,0 +1,146 @@
+"""
+Runs collection uploads as background jobs.
+
+Ingesting a large collection can take minutes when many cards have to be
+fetched from Scryfall, which is longer than a client should hold a request
+open. Instead, the upload is spooled to a temporary file and handed to a small
+worker pool, and the caller gets a job id back immediately. The job's live
+`IngestionProgress` and final `IngestionResult` can then be polled or streamed.
+
+The pool is bounded so that several concurrent uploads share a fixed number of
+worker threads rather than crowding out the request handlers serving chat and
+deck building.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
+from .collection_ingestor import IngestionProgress, IngestionResult, process_collection_csv
+
+# --- Configuration ---
+# The number of uploads ingested at the same time. Further uploads queue.
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "2"))
+# How long a finished job stays available for status requests.
+INGESTION_JOB_RETENTION_SECONDS = float(os.getenv("INGESTION_JOB_RETENTION_SECONDS", "3600"))
+# --- End Configuration ---
+
+class IngestionJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class IngestionJob(BaseModel):
+    """The state of one background upload."""
+    job_id: str
+    filename: str
+    # The existing collection being re-uploaded into, if any.
+    collection_id: Optional[str] = None
+    status: IngestionJobStatus = IngestionJobStatus.QUEUED
+    progress: IngestionProgress = Field(default_factory=IngestionProgress)
+    result: Optional[IngestionResult] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (IngestionJobStatus.COMPLETED, IngestionJobStatus.FAILED)
+
+class IngestionJobManager:
+    """Queues uploads on a bounded thread pool and tracks their progress."""
+
+    def __init__(self, max_workers: int = INGESTION_MAX_WORKERS, retention_seconds: float = INGESTION_JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, csv_path: Path, filename: str, collection_id: Optional[str] = None) -> IngestionJob:
+        """
+        Queues a spooled upload for ingestion.
+
+        Args:
+            csv_path: A temporary copy of the upload. The job owns the file and
+                deletes it when ingestion finishes.
+            filename: The original filename, for display.
+            collection_id: An existing collection to re-upload into.
+
+        Returns:
+            A snapshot of the newly queued job.
+        """
+        job = IngestionJob(job_id=str(uuid.uuid4()), filename=filename, collection_id=collection_id)
+        with self._lock:
+            self._prune_finished_jobs()
+            self._jobs[job.job_id] = job
+        future = self._executor.submit(self._run, job, csv_path)
+        future.add_done_callback(lambda future: self._discard_if_cancelled(future, job, csv_path))
+        print(f"Queued ingestion job '{job.job_id}' for '{filename}'.")
+        return job.copy(deep=True)
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Returns a consistent snapshot of a job, or `None` if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.copy(deep=True) if job else None
+
+    def shutdown(self):
+        """
+        Stops accepting jobs. Jobs already running are left to finish; queued
+        jobs are cancelled, marked failed, and their spooled uploads deleted.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: IngestionJob, csv_path: Path):
+        """Ingests one upload on a worker thread."""
+        with self._lock:
+            job.status = IngestionJobStatus.RUNNING
+        try:
+            with open(csv_path, "rb") as csv_file:
+                result = process_collection_csv(csv_file, progress=job.progress, collection_id=job.collection_id)
+            with self._lock:
+                job.result = result
+                job.status = IngestionJobStatus.COMPLETED if result.collection_id else IngestionJobStatus.FAILED
+                if not result.collection_id:
+                    job.error = result.failures[-1]
+        except Exception as e:
+            print(f"ERROR: Ingestion job '{job.job_id}' failed: {e}")
+            with self._lock:
+                job.status = IngestionJobStatus.FAILED
+                job.error = str(e)
+        finally:
+            self._finish(job, csv_path)
+
+    def _discard_if_cancelled(self, future: Future, job: IngestionJob, csv_path: Path):
+        """Fails a job that was cancelled before it started, which `_run` never sees."""
+        if not future.cancelled():
+            return
+        with self._lock:
+            job.status = IngestionJobStatus.FAILED
+            job.error = "The server shut down before the upload was ingested."
+        self._finish(job, csv_path)
+
+    def _finish(self, job: IngestionJob, csv_path: Path):
+        """Records when a job finished and deletes its spooled upload."""
+        with self._lock:
+            job.finished_at = datetime.now(timezone.utc)
+            self._finished_at[job.job_id] = time.monotonic()
+        csv_path.unlink(missing_ok=True)
+
+    def _prune_finished_jobs(self):
+        """Forgets jobs that finished longer ago than the retention period. Must hold the lock."""
+        cutoff = time.monotonic() - self.retention_seconds
+        for job_id in [job_id for job_id, finished in self._finished_at.items() if finished < cutoff]:
+            del self._finished_at[job_id]
+            self._jobs.pop(job_id, None)
+
+# A process-wide job manager shared by the upload endpoints.
+ingestion_job_manager = IngestionJobManager()
@@ -0,0 +1,205 @@
+"""
+An in-memory index for resolving card names against the local card cache.
+
+Collection exports spell the same card in many ways: different casing, stray
+whitespace, missing accents or apostrophes, a single face of a split or
+double-faced card, or an outright typo. This index normalizes all of those
+locally so `card_enrichment` only goes to Scryfall for cards it has never seen.
+
+`resolve` only accepts exact matches:
+1. On the normalized full name (e.g. "fire ice" for "Fire // Ice").
+2. On a normalized face name (e.g. "fire").
+
+`resolve_typo` is a typo-tolerant match: candidates sharing the most
+character trigrams with the query are verified with a bounded edit distance,
+and a match is only accepted if it is unambiguous. A name one edit away from
+a cached card may well be another real card ("Flame Lash" is not "Flame
+Slash"), so it is only used once Scryfall has found no card by that exact
+name, in place of Scryfall's own fuzzy search.
+"""
+
+import re
+import threading
+import unicodedata
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from ..database.models import ScryfallCardCache
+
+# --- Configuration ---
+# Names shorter than this many characters are only matched exactly.
+FUZZY_MIN_LENGTH = 5
+# One typo is tolerated per this many characters, e.g. two edits for a
+# 20-character name. Short names allow at most one.
+FUZZY_CHARS_PER_EDIT = 10
+# The number of trigram candidates verified with the edit distance.
+FUZZY_CANDIDATES = 8
+# --- End Configuration ---
+
+_APOSTROPHES = re.compile(r"['’`]")
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+_DIGITS = re.compile(r"[0-9]+")
+
+def normalize_card_name(name: str) -> str:
+    """
+    Reduces a card name to a canonical lookup form.
+
+    Accents are stripped, apostrophes removed, and any other run of punctuation
+    or whitespace collapsed to one space: "Lim-Dûl's Vault" becomes
+    "lim duls vault".
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    ascii_name = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    ascii_name = _APOSTROPHES.sub("", ascii_name)
+    return _NON_ALPHANUMERIC.sub(" ", ascii_name).strip()
+
+def _trigrams(normalized_name: str) -> Set[str]:
+    """Returns the character trigrams of a name, padded so short words still produce some."""
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """Returns the Levenshtein distance between two strings, or `limit + 1` once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class CardNameIndex:
+    """Maps normalized card and face names to cached printings."""
+
+    def __init__(self):
+        # normalized name -> {set code or None for "any printing": card id}
+        self._by_name: Dict[str, Dict[Optional[str], uuid.UUID]] = {}
+        self._by_face: Dict[str, Dict[Optional[str], uuid.UUID]] = {}
+        self._names_by_trigram: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def ensure_loaded(self, session: Session):
+        """Builds the index from the card cache the first time it is needed."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            from .card_enrichment import CARD_SCHEMA_VERSION  # Imported here to avoid a cycle.
+            statement = (
+                select(ScryfallCardCache.id, ScryfallCardCache.name, ScryfallCardCache.set_code)
+                .where(ScryfallCardCache.schema_version >= CARD_SCHEMA_VERSION)
+            )
+            for card_id, name, set_code in session.exec(statement):
+                self.add(card_id, name, set_code)
+            self._loaded = True
+            print(f"Card name index built with {len(self._by_name)} names.")
+
+    def add(self, card_id: uuid.UUID, name: str, set_code: Optional[str]):
+        """Registers a cached printing under its full name and each face name."""
+        full_name = normalize_card_name(name)
+        set_code = set_code.lower() if set_code else None
+        with self._lock:
+            self._register(self._by_name, full_name, card_id, set_code)
+            for trigram in _trigrams(full_name):
+                self._names_by_trigram[trigram].add(full_name)
+
+            faces = name.split(" // ")
+            if len(faces) > 1:
+                for face in faces:
+                    self._register(self._by_face, normalize_card_name(face), card_id, set_code)
+
+    def add_many(self, cards: Iterable[Tuple[uuid.UUID, str, Optional[str]]]):
+        """Registers several (id, name, set code) printings."""
+        with self._lock:
+            for card_id, name, set_code in cards:
+                self.add(card_id, name, set_code)
+
+    def resolve(self, name: str, set_code: Optional[str] = None) -> Optional[uuid.UUID]:
+        """
+        Finds a cached printing for a name as written in a collection file.
+
+        Args:
+            name: The card name, in any casing, spacing or accenting.
+            set_code: An optional set code; if given, only that printing matches.
+
+        Returns:
+            The id of a matching cached printing, or `None` if the name is not
+            known locally.
+        """
+        normalized = normalize_card_name(name)
+        return self._pick_printing(self._by_name.get(normalized) or self._by_face.get(normalized), set_code)
+
+    def resolve_typo(self, name: str, set_code: Optional[str] = None) -> Optional[uuid.UUID]:
+        """
+        Finds a cached printing for a misspelled name. Only call this for names
+        known not to be real card names, since a real card one edit away from
+        a cached one would be matched to the wrong card.
+
+        Returns:
+            The id of the printing of the single cached name within the typo
+            budget, or `None` if there is none or the match is ambiguous.
+        """
+        closest = self._closest_name(normalize_card_name(name))
+        return self._pick_printing(self._by_name.get(closest) if closest else None, set_code)
+
+    @staticmethod
+    def _pick_printing(printings: Optional[Dict[Optional[str], uuid.UUID]], set_code: Optional[str]) -> Optional[uuid.UUID]:
+        if not printings:
+            return None
+        return printings.get(set_code.lower() if set_code else None)
+
+    def clear(self):
+        """Empties the index; it is rebuilt on next use."""
+        with self._lock:
+            self._by_name.clear()
+            self._by_face.clear()
+            self._names_by_trigram.clear()
+            self._loaded = False
+
+    @staticmethod
+    def _register(table: Dict[str, Dict[Optional[str], uuid.UUID]], key: str, card_id: uuid.UUID, set_code: Optional[str]):
+        """Records a printing under a key, keeping the first printing seen as the default."""
+        printings = table.setdefault(key, {})
+        printings.setdefault(None, card_id)
+        if set_code:
+            printings[set_code] = card_id
+
+    def _closest_name(self, normalized: str) -> Optional[str]:
+        """Returns the single indexed name within the typo budget of `normalized`, if any."""
+        if len(normalized) < FUZZY_MIN_LENGTH:
+            return None
+
+        shared_counts: Dict[str, int] = defaultdict(int)
+        for trigram in _trigrams(normalized):
+            for candidate in self._names_by_trigram.get(trigram, ()):
+                shared_counts[candidate] += 1
+        candidates: List[str] = sorted(shared_counts, key=shared_counts.get, reverse=True)[:FUZZY_CANDIDATES]
+
+        limit = max(1, len(normalized) // FUZZY_CHARS_PER_EDIT)
+        # A differing number is a different card ("+2 Mace" is not "+1 Mace"), never a typo.
+        digits = _DIGITS.findall(normalized)
+        best_name, best_distance, ambiguous = None, limit + 1, False
+        for candidate in candidates:
+            if _DIGITS.findall(candidate) != digits:
+                continue
+            distance = _bounded_edit_distance(normalized, candidate, limit)
+            if distance < best_distance:
+                best_name, best_distance, ambiguous = candidate, distance, False
+            elif distance == best_distance and distance <= limit:
+                ambiguous = True
+        return None if ambiguous else best_name
+
+# A process-wide index shared by all enrichment calls.
+card_name_index = CardNameIndex()
@@ -0,0 +1,112 @@
+"""
+An in-process cache of analyzed deck-building pools.
+
+Loading a pool joins a collection's cards with the card cache and legalities
+and turns every row into an `AnalyzedCard`, which dominates the cost of a
+build once the selection itself is fast. Users typically rebuild the same
+collection many times while tuning a spec, so the finished pools are kept in
+memory, keyed by collection, format and color identity. A build whose pool is
+cached does not touch the database at all.
+
+Entries are dropped when:
+
+- the collection's `UserCard` rows are written (see `collection_ingestor`);
+- the card data they were built from changes in this process (a price
+  refresh or a role reclassification), which clears the whole cache;
+- they are older than `POOL_CACHE_TTL_SECONDS`, which bounds how stale a pool
+  can get when the database is written by another process, such as a script
+  or another server worker;
+- the cache exceeds `POOL_CACHE_MAX_BYTES` or `POOL_CACHE_MAX_ENTRIES`, in
+  least recently used order.
+"""
+
+import os
+import sys
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, Optional
+from ..api_models import DeckSpec
+from .cache import MISSING, CacheStats, LRUCache
+
+# --- Configuration ---
+POOL_CACHE_MAX_ENTRIES = int(os.getenv("POOL_CACHE_MAX_ENTRIES", "256"))
+POOL_CACHE_MAX_BYTES = int(os.getenv("POOL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+POOL_CACHE_TTL_SECONDS = float(os.getenv("POOL_CACHE_TTL_SECONDS", "600"))
+# --- End Configuration ---
+
+# Per-card overhead not visible through the card's own fields: the object
+# header, its slot in the pool list and the roles list's contents.
+_CARD_OVERHEAD_BYTES = 120
+
+def estimate_pool_bytes(pool: List[Any]) -> int:
+    """
+    Estimates the memory held by a pool of analyzed cards.
+
+    Counts each card's field values shallowly, so strings shared between cards
+    are counted once per card. The estimate is meant for bounding the cache,
+    not for exact accounting.
+    """
+    total = sys.getsizeof(pool)
+    for card in pool:
+        fields = card.__dict__ if hasattr(card, "__dict__") else {slot: getattr(card, slot) for slot in card.__slots__}
+        total += _CARD_OVERHEAD_BYTES + sum(sys.getsizeof(value) for value in fields.values())
+    return total
+
+class AnalyzedPoolCache:
+    """
+    Buildable pools by (collection id, format, color identity).
+
+    Each collection has a generation number, bumped by every invalidation. A
+    pool is only stored if its collection's generation did not change while
+    it was being loaded, so a build racing an upload cannot cache the
+    collection's old contents after the upload invalidated them.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self._cache = LRUCache(max_size=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes, size_of=estimate_pool_bytes)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(collection_id: str, spec: DeckSpec) -> Hashable:
+        """The cache key of a spec's pool. Only the format and colors affect it."""
+        return (collection_id, spec.format, "".join(sorted(spec.color_identity)))
+
+    def generation(self, collection_id: str) -> int:
+        """The collection's current generation; read it before loading a pool to `put`."""
+        with self._lock:
+            return self._generations[collection_id]
+
+    def get(self, collection_id: str, spec: DeckSpec) -> Optional[List[Any]]:
+        """Returns the cached pool for a spec, or `None` if it must be loaded. Callers must not modify it."""
+        pool = self._cache.get(self.key(collection_id, spec))
+        return None if pool is MISSING else pool
+
+    def put(self, collection_id: str, spec: DeckSpec, pool: List[Any], generation: int):
+        """Stores a pool loaded while the collection was at `generation`."""
+        with self._lock:
+            if self._generations[collection_id] != generation:
+                return
+            self._cache.set(self.key(collection_id, spec), pool)
+
+    def invalidate_collection(self, collection_id: str):
+        """Drops every pool of a collection. Call after committing a write to its cards."""
+        with self._lock:
+            self._generations[collection_id] += 1
+            self._cache.invalidate_where(lambda key: key[0] == collection_id)
+
+    def clear(self):
+        """Drops every pool, e.g. after the card data they were built from changed."""
+        with self._lock:
+            for collection_id in self._generations:
+                self._generations[collection_id] += 1
+            self._cache.clear()
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
+
+analyzed_pool_cache = AnalyzedPoolCache(
+    max_entries=POOL_CACHE_MAX_ENTRIES,
+    max_bytes=POOL_CACHE_MAX_BYTES,
+    ttl_seconds=POOL_CACHE_TTL_SECONDS,
+)
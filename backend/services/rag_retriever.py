@@ -7,14 +7,14 @@ import re
 from pathlib import Path
 from typing import List, Dict
 import chromadb
-from chromadb.utils import embedding_functions
 from pydantic import BaseModel, Field
 
+from .embedding_model import get_embedding_function
+
 # --- Configuration ---
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 CHROMA_DB_PATH = PROJECT_ROOT / "data" / "chroma_db"
 COLLECTION_NAME = "mtg_rules"
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 # --- End Configuration ---
 
 class QueryResult(BaseModel):
@@ -42,7 +42,8 @@ class RAGRetriever:
 
         print("Initializing RAGRetriever...")
         self.client = chromadb.PersistentClient(path=str(CHROMA_DB_PATH))
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL_NAME)
+        # Shared with the card embedding index, so the model is loaded once per process.
+        self.embedding_function = get_embedding_function()
         
         try:
             self.collection = self.client.get_collection(name=COLLECTION_NAME, embedding_function=self.embedding_function)
@@ -0,0 +1,69 @@
+"""
+A token-bucket rate limiter shared by the synchronous and asynchronous API clients.
+
+The bucket refills continuously at `rate` tokens per second up to `capacity`.
+Each request takes one token; when the bucket is empty the caller is told how
+long to wait for its turn. Because the bookkeeping happens under a lock and
+never sleeps, one bucket can pace threads and asyncio tasks at the same time,
+and concurrent callers are spaced out instead of all waking at once.
+"""
+
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """A thread-safe token bucket that works with both blocking and async callers."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Tokens added per second, i.e. the sustained request rate.
+            capacity: The maximum number of tokens, i.e. the allowed burst size.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Adds the tokens accrued since the last update. Must hold the lock."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Takes one token and returns how many seconds the caller must wait before using it.
+
+        The token count may go negative; the deficit is the queue of callers
+        that have reserved a future slot.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def pause(self, seconds: float):
+        """
+        Delays every future reservation until at least `seconds` from now, e.g.
+        after a 429 response. Pauses overlap rather than add up: several
+        requests rate limited at once push the next slot back only as far as
+        the longest of them.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def acquire(self):
+        """Blocks the current thread until a token is available."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until a token is available."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
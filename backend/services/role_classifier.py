@@ -0,0 +1,220 @@
+"""
+Classifies cards into functional deck-building roles.
+
+A card's roles ("ramp", "draw", "removal", "threat"...) depend only on its type
+line and oracle text, so they are computed once, when the card is written to
+the cache, and stored in the `CardRole` table. Deck builds read the stored
+roles and never run the classifier themselves.
+
+Each row records the `CLASSIFIER_VERSION` that tagged it. Changing the rules
+below requires bumping the version; `reclassify_card_roles` then retags the
+outdated rows in bulk, at startup or from `scripts/reclassify_card_roles.py`.
+"""
+
+import re
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+from sqlalchemy import bindparam, delete, insert, update
+from sqlmodel import Session, select
+from ..database.connection import engine
+from ..database.models import CardRole, ScryfallCardCache
+from .pool_cache import analyzed_pool_cache
+
+# Bump this whenever `classify_card_roles` changes its output, so stored roles
+# are recomputed.
+CLASSIFIER_VERSION = 1
+# Distinct texts sent to a worker process at a time by `classify_batch`.
+CLASSIFY_CHUNK_SIZE = 500
+
+# Every role the classifier can assign, in sorted order. A set of roles can be
+# stored as a bitmask with one bit per role, in this order, so iterating the
+# set bits from the lowest visits the roles in sorted order too.
+ROLES: Tuple[str, ...] = (
+    "anthem", "board_wipe", "disruption", "draw", "land", "protection",
+    "ramp", "removal", "synergy", "threat", "tutor",
+)
+ROLE_BITS: Dict[str, int] = {role: 1 << index for index, role in enumerate(ROLES)}
+
+# The text a card is classified from: its type line and oracle text.
+CardText = Tuple[Optional[str], Optional[str]]
+# A card to classify: its cache id, type line and oracle text.
+RoleInput = Tuple[uuid.UUID, Optional[str], Optional[str]]
+
+# =============================================================================
+# Classification Rules
+# =============================================================================
+
+class RoleRule(NamedTuple):
+    """
+    One oracle-text rule: the card gets `roles` if every string in `all_of`
+    occurs in its lowercased text, at least one of `any_of` does (when given),
+    and `pattern` matches (when given).
+
+    The substring checks are a cheap prefilter: each names text the pattern
+    cannot match without, so the pattern only runs on the few cards that could
+    match it. Patterns keep the per-line semantics of `.` by spelling it
+    `[^\n]`, and use lazy repeats, which find the same matches as greedy ones
+    without first running to the end of the line and backtracking.
+    """
+    roles: Tuple[str, ...]
+    all_of: Tuple[str, ...]
+    any_of: Tuple[str, ...] = ()
+    pattern: Optional[Pattern] = None
+
+ORACLE_RULES: List[RoleRule] = [
+    RoleRule(("ramp",), ("add",), any_of=("{", "mana")),
+    RoleRule(("ramp",), ("search your library for a basic land card",)),
+    RoleRule(("draw",), ("draw", "card"), pattern=re.compile(r"\bdraws?\b[^\n]*?\bcards?\b")),
+    RoleRule(("tutor",), ("search your library for a card", "put it into your hand")),
+    RoleRule(("board_wipe", "removal"), ("destroy all creatures",), pattern=re.compile(r"\bdestroy all creatures\b")),
+    RoleRule(("board_wipe", "removal"), ("exile all creatures",), pattern=re.compile(r"\bexile all creatures\b")),
+    RoleRule(("removal",), ("destroy", "target"), pattern=re.compile(r"\bdestroys?\b[^\n]*?\btarget\b")),
+    RoleRule(("removal",), ("exile", "target"), pattern=re.compile(r"\bexiles?\b[^\n]*?\btarget\b")),
+    RoleRule(("removal",), ("deal", "damage", "to any target"), pattern=re.compile(r"\bdeals?\b[^\n]*?\bdamage\b[^\n]*?\bto any target\b")),
+    RoleRule(("removal",), ("deal", "damage", "target creature"), pattern=re.compile(r"\bdeals?\b[^\n]*?\bdamage\b[^\n]*?\btarget creature\b")),
+    RoleRule(("removal",), ("fight", "another target creature"), pattern=re.compile(r"\bfights?\b[^\n]*?\banother target creature\b")),
+    RoleRule(("disruption",), ("counter", "target", "spell"), pattern=re.compile(r"\bcounters?\b[^\n]*?\btarget\b[^\n]*?\bspell\b")),
+    RoleRule(("disruption",), ("target player", "discards"), pattern=re.compile(r"target player[^\n]*?discards")),
+    RoleRule(("protection",), ("hexproof",), pattern=re.compile(r"\bgains? hexproof\b")),
+    RoleRule(("protection",), ("indestructible",), pattern=re.compile(r"\bgains? indestructible\b")),
+    RoleRule(("anthem",), ("creatures you control get +",), pattern=re.compile(r"creatures you control get \+\d+/\+\d+")),
+]
+
+def classify_card_roles(type_line: Optional[str], oracle_text: Optional[str]) -> List[str]:
+    """Assigns functional roles to a card based on its type and oracle text."""
+    roles = set()
+    type_line = (type_line or "").lower()
+    oracle_text = (oracle_text or "").lower()
+
+    for rule_roles, all_of, any_of, pattern in ORACLE_RULES:
+        for literal in all_of:
+            if literal not in oracle_text:
+                break
+        else:
+            if any_of and not any(literal in oracle_text for literal in any_of):
+                continue
+            if roles.issuperset(rule_roles):
+                continue
+            if pattern is None or pattern.search(oracle_text):
+                roles.update(rule_roles)
+
+    if "creature" in type_line: roles.add("threat")
+    if "land" in type_line: roles.add("land")
+    if not roles: roles.add("synergy")
+
+    return sorted(roles)
+
+def role_mask(roles: Iterable[str]) -> int:
+    """Converts role names to a bitmask (see `ROLES`)."""
+    mask = 0
+    for role in roles:
+        mask |= ROLE_BITS[role]
+    return mask
+
+def mask_to_roles(mask: int) -> List[str]:
+    """Converts a role bitmask back to sorted role names."""
+    return [role for role in ROLES if mask & ROLE_BITS[role]]
+
+def _classify_texts(texts: List[CardText]) -> List[List[str]]:
+    """Classifies a chunk of (type line, oracle text) pairs. Runs in worker processes."""
+    return [classify_card_roles(type_line, oracle_text) for type_line, oracle_text in texts]
+
+def classify_batch(cards: Iterable[CardText], executor: Optional[Executor] = None, chunk_size: int = CLASSIFY_CHUNK_SIZE) -> List[List[str]]:
+    """
+    Classifies many cards, given as (type line, oracle text) pairs.
+
+    Each distinct text is classified once. With an `executor` (typically a
+    `ProcessPoolExecutor`), the distinct texts are classified in chunks across
+    its workers.
+
+    Returns:
+        The roles of each card, in input order.
+    """
+    cards = list(cards)
+    distinct_texts = list(dict.fromkeys(cards))
+    if executor is None:
+        distinct_roles = _classify_texts(distinct_texts)
+    else:
+        chunks = [distinct_texts[start:start + chunk_size] for start in range(0, len(distinct_texts), chunk_size)]
+        distinct_roles = [roles for chunk_roles in executor.map(_classify_texts, chunks) for roles in chunk_roles]
+    roles_by_text = dict(zip(distinct_texts, distinct_roles))
+    return [roles_by_text[card] for card in cards]
+
+# =============================================================================
+# Persistence
+# =============================================================================
+
+def store_card_roles(session: Session, cards: Iterable[RoleInput], executor: Optional[Executor] = None) -> int:
+    """
+    Classifies cards and replaces their `CardRole` rows. The caller commits.
+
+    Printings of the same card share their text, so each distinct
+    (type line, oracle text) pair is classified only once. See `classify_batch`
+    for `executor`.
+
+    Returns:
+        The number of cards tagged.
+    """
+    cards = list(cards)
+    if not cards:
+        return 0
+
+    card_roles = classify_batch([(type_line, oracle_text) for _, type_line, oracle_text in cards], executor=executor)
+    role_rows = [
+        {"card_id": card_id, "role": role}
+        for (card_id, _, _), roles in zip(cards, card_roles)
+        for role in roles
+    ]
+
+    card_ids = [{"b_id": card_id} for card_id, _, _ in cards]
+    session.execute(delete(CardRole.__table__).where(CardRole.__table__.c.card_id == bindparam("b_id")), card_ids)
+    session.execute(insert(CardRole.__table__), role_rows)
+    session.execute(
+        update(ScryfallCardCache.__table__)
+        .where(ScryfallCardCache.__table__.c.id == bindparam("b_id"))
+        .values(roles_version=CLASSIFIER_VERSION),
+        card_ids,
+    )
+    return len(cards)
+
+def reclassify_card_roles(batch_size: int = 5000, force: bool = False, workers: int = 1) -> int:
+    """
+    Retags every cached card whose roles were written by another classifier version.
+
+    Args:
+        batch_size: Cards tagged per transaction.
+        force: Retag every card, even those already at the current version.
+        workers: Worker processes to classify with. With 1, cards are
+            classified in this process.
+
+    Returns:
+        The number of cards retagged.
+    """
+    reclassified = 0
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        with Session(engine) as session:
+            if force:
+                session.execute(update(ScryfallCardCache.__table__).values(roles_version=0))
+                session.commit()
+            while True:
+                statement = (
+                    select(ScryfallCardCache.id, ScryfallCardCache.type_line, ScryfallCardCache.oracle_text)
+                    .where(ScryfallCardCache.roles_version != CLASSIFIER_VERSION)
+                    .limit(batch_size)
+                )
+                rows = session.exec(statement).all()
+                if not rows:
+                    break
+                reclassified += store_card_roles(session, rows, executor=executor)
+                session.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if reclassified:
+        # Cached pools hold the old roles.
+        analyzed_pool_cache.clear()
+        print(f"Classified roles for {reclassified} cached cards (classifier version {CLASSIFIER_VERSION}).")
+    return reclassified
@@ -5,18 +5,39 @@ This module provides a class-based client for fetching card data from Scryfall.
 It includes features such as automatic retries for transient network errors,
 adherence to Scryfall's requested API rate limits, and data validation using
 Pydantic models to ensure the received data conforms to expectations.
+
+Two clients are provided: a blocking `ScryfallClient` for scripts, and an
+`AsyncScryfallClient` for use inside the API's request handlers. Both draw from
+the same process-wide token bucket, so together they never exceed Scryfall's
+rate guidance.
 """
 
-import time
+import asyncio
+import os
 import requests
-from typing import List, Dict, Optional
+import httpx
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, List, Dict, Optional, Tuple
+from urllib.parse import quote
 from pydantic import BaseModel, Field, HttpUrl
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from .rate_limiter import TokenBucket
 
 # --- Constants ---
-SCRYFALL_API_BASE_URL = "https://api.scryfall.com"
-# Scryfall's API guidelines request a 50-100ms delay between requests.
-SCRYFALL_REQUEST_DELAY_SECONDS = 0.1
+SCRYFALL_API_BASE_URL = os.getenv("SCRYFALL_API_BASE_URL", "https://api.scryfall.com")
+# Scryfall's API guidelines ask for no more than 10 requests per second on average.
+SCRYFALL_REQUESTS_PER_SECOND = float(os.getenv("SCRYFALL_REQUESTS_PER_SECOND", "10"))
+SCRYFALL_BURST_SIZE = float(os.getenv("SCRYFALL_BURST_SIZE", "2"))
+# The number of requests the async client keeps in flight at once.
+SCRYFALL_MAX_IN_FLIGHT = int(os.getenv("SCRYFALL_MAX_IN_FLIGHT", "4"))
+SCRYFALL_REQUEST_TIMEOUT_SECONDS = 30.0
+# The /cards/collection endpoint accepts at most 75 identifiers per request.
+SCRYFALL_COLLECTION_BATCH_SIZE = 75
+# How long to back off after a 429 or 503 without a usable Retry-After
+# header, and the longest Retry-After honored.
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+MAX_RETRY_AFTER_SECONDS = 60.0
 # --- End Constants ---
 
 # --- Pydantic Models for API Response Validation ---
@@ -51,7 +72,10 @@ class ScryfallCard(BaseModel):
     edhrec_rank: Optional[int] = None
     prices: Optional[Dict[str, Optional[str]]] = None
 
-# --- API Client ---
+# A single bucket shared by every client in the process.
+scryfall_rate_limiter = TokenBucket(rate=SCRYFALL_REQUESTS_PER_SECOND, capacity=SCRYFALL_BURST_SIZE)
+
+# --- API Clients ---
 
 class ScryfallClient:
     """A client for the Scryfall API with built-in retries and rate limiting."""
@@ -61,24 +85,30 @@ class ScryfallClient:
         self.session = requests.Session()
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
+    def _make_request(self, endpoint: str, params: Optional[Dict] = None, json_body: Optional[Dict] = None) -> Optional[Dict]:
         """
-        Internal method to execute a GET request with resilience.
+        Internal method to execute a request with resilience.
         
-        This method automatically retries on transient errors and respects the
-        API rate limit. It returns None for 404 Not Found errors and raises
-        exceptions for other HTTP errors to trigger the retry logic.
+        A GET request is sent unless `json_body` is given, in which case the body
+        is POSTed. This method automatically retries on transient errors and
+        respects the API rate limit. It returns None for 404 Not Found errors and
+        raises exceptions for other HTTP errors to trigger the retry logic. A 429
+        response, or a 503 with a Retry-After header, also pauses the shared
+        rate limiter, as in `AsyncScryfallClient`.
         """
-        time.sleep(SCRYFALL_REQUEST_DELAY_SECONDS)
+        scryfall_rate_limiter.acquire()
         
         try:
-            response = self.session.get(f"{self.base_url}/{endpoint}", params=params)
+            method = "POST" if json_body is not None else "GET"
+            response = self.session.request(method, f"{self.base_url}/{endpoint}", params=params, json=json_body,
+                                            timeout=SCRYFALL_REQUEST_TIMEOUT_SECONDS)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404:
                 print(f"Scryfall API: Resource not found for endpoint '{endpoint}' with params {params}")
                 return None
+            _pause_for_retry_after(e.response.status_code, e.response.headers.get("Retry-After"))
             print(f"Scryfall API: HTTP error occurred: {e}")
             raise
         except requests.exceptions.RequestException as e:
@@ -96,14 +126,221 @@ class ScryfallClient:
         Returns:
             A validated `ScryfallCard` model instance if found, otherwise `None`.
         """
-        params = {"fuzzy": card_name}
-        if set_code:
-            params["set"] = set_code
-            
+        params = _named_card_params(card_name, set_code)
         print(f"Querying Scryfall API for card: '{card_name}' (Set: {set_code or 'Any'})")
         
         card_data = self._make_request("cards/named", params=params)
         return ScryfallCard.parse_obj(card_data) if card_data else None
 
+    def get_card_by_set_and_number(self, set_code: str, collector_number: str) -> Optional[ScryfallCard]:
+        """
+        Fetches one exact printing by its set code and collector number.
+
+        Args:
+            set_code: The printing's set code, e.g. "m10".
+            collector_number: The printing's collector number within the set.
+
+        Returns:
+            A validated `ScryfallCard` model instance if found, otherwise `None`.
+        """
+        print(f"Querying Scryfall API for printing: {set_code.upper()} #{collector_number}")
+
+        card_data = self._make_request(_printing_endpoint(set_code, collector_number))
+        return ScryfallCard.parse_obj(card_data) if card_data else None
+
+    def get_cards_batch(self, identifiers: List[Dict[str, str]]) -> Tuple[List[ScryfallCard], List[Dict[str, str]]]:
+        """
+        Fetches many cards at once using Scryfall's collection endpoint.
+
+        Identifiers are sent in chunks of up to 75 per request. Each identifier is
+        a dictionary in one of the forms Scryfall accepts, e.g. `{"name": ...}`,
+        `{"name": ..., "set": ...}` or `{"set": ..., "collector_number": ...}`.
+        Unlike `get_card_by_name`, name matching is exact rather than fuzzy.
+
+        Args:
+            identifiers: The card identifiers to resolve.
+
+        Returns:
+            A tuple of the validated cards that were found and the identifiers
+            Scryfall reported as not found.
+        """
+        found: List[ScryfallCard] = []
+        not_found: List[Dict[str, str]] = []
+
+        for chunk in _chunk_identifiers(identifiers):
+            print(f"Querying Scryfall API for a batch of {len(chunk)} cards.")
+            response = self._make_request("cards/collection", json_body={"identifiers": chunk})
+            _collect_batch_response(response, chunk, found, not_found)
+
+        return found, not_found
+
+def _is_retryable_error(error: BaseException) -> bool:
+    """Returns True for transport failures, rate limiting (429) and server errors (5xx)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+def _retry_after_seconds(value: Optional[str]) -> float:
+    """
+    Parses a Retry-After header, which is either a number of seconds or an
+    HTTP date. Falls back to `DEFAULT_RETRY_AFTER_SECONDS` when it is missing
+    or malformed, and is capped at `MAX_RETRY_AFTER_SECONDS`.
+    """
+    if not value:
+        return DEFAULT_RETRY_AFTER_SECONDS
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER_SECONDS
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+def _pause_for_retry_after(status_code: int, retry_after: Optional[str]):
+    """
+    Pauses the shared rate limiter after a 429 response, or a 503 with a
+    Retry-After header, so every client in the process backs off together.
+    """
+    if status_code == 429 or (status_code == 503 and retry_after):
+        scryfall_rate_limiter.pause(_retry_after_seconds(retry_after))
+
+class AsyncScryfallClient:
+    """
+    An asyncio client for the Scryfall API.
+
+    Requests are paced by the shared token bucket and several may be in flight
+    at once, so waiting on Scryfall never blocks the event loop. Use it as an
+    async context manager so the underlying connection pool is closed:
+
+        async with AsyncScryfallClient() as client:
+            card = await client.get_card_by_name("Sol Ring")
+    """
+
+    def __init__(self, base_url: str = SCRYFALL_API_BASE_URL, max_in_flight: int = SCRYFALL_MAX_IN_FLIGHT):
+        self.base_url = base_url
+        self.max_in_flight = max_in_flight
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncScryfallClient":
+        self._client = httpx.AsyncClient(base_url=self.base_url, timeout=SCRYFALL_REQUEST_TIMEOUT_SECONDS)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    @retry(
+        retry=retry_if_exception(_is_retryable_error),
+        stop=stop_after_attempt(4),
+        wait=wait_exponential(multiplier=0.5, min=0.5, max=10),
+        reraise=True,
+    )
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None, json_body: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Internal method to execute a request with resilience.
+
+        Mirrors `ScryfallClient._make_request`: a GET is sent unless `json_body`
+        is given, 404 responses return None, and transient failures are retried
+        with exponential backoff using non-blocking sleeps. A 429 response, or a
+        503 with a Retry-After header, also pauses the shared rate limiter so
+        every client backs off together.
+        """
+        if self._client is None:
+            raise RuntimeError("AsyncScryfallClient must be used as an async context manager.")
+
+        async with self._semaphore:
+            await scryfall_rate_limiter.acquire_async()
+            try:
+                method = "POST" if json_body is not None else "GET"
+                response = await self._client.request(method, f"/{endpoint}", params=params, json=json_body)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    print(f"Scryfall API: Resource not found for endpoint '{endpoint}' with params {params}")
+                    return None
+                _pause_for_retry_after(e.response.status_code, e.response.headers.get("Retry-After"))
+                print(f"Scryfall API: HTTP error occurred: {e}")
+                raise
+            except httpx.HTTPError as e:
+                print(f"Scryfall API: A request error occurred: {e}")
+                raise
+
+    async def get_card_by_name(self, card_name: str, set_code: Optional[str] = None) -> Optional[ScryfallCard]:
+        """Async counterpart of `ScryfallClient.get_card_by_name`."""
+        params = _named_card_params(card_name, set_code)
+        print(f"Querying Scryfall API for card: '{card_name}' (Set: {set_code or 'Any'})")
+
+        card_data = await self._make_request("cards/named", params=params)
+        return ScryfallCard.parse_obj(card_data) if card_data else None
+
+    async def get_card_by_set_and_number(self, set_code: str, collector_number: str) -> Optional[ScryfallCard]:
+        """Async counterpart of `ScryfallClient.get_card_by_set_and_number`."""
+        print(f"Querying Scryfall API for printing: {set_code.upper()} #{collector_number}")
+
+        card_data = await self._make_request(_printing_endpoint(set_code, collector_number))
+        return ScryfallCard.parse_obj(card_data) if card_data else None
+
+    async def get_cards_batch(self, identifiers: List[Dict[str, str]]) -> Tuple[List[ScryfallCard], List[Dict[str, str]]]:
+        """
+        Async counterpart of `ScryfallClient.get_cards_batch`.
+
+        The chunks of 75 identifiers are requested concurrently, subject to the
+        client's in-flight limit and the shared rate limiter.
+        """
+        chunks = list(_chunk_identifiers(identifiers))
+        print(f"Querying Scryfall API for {len(identifiers)} cards in {len(chunks)} batches.")
+        responses = await asyncio.gather(
+            *(self._make_request("cards/collection", json_body={"identifiers": chunk}) for chunk in chunks)
+        )
+
+        found: List[ScryfallCard] = []
+        not_found: List[Dict[str, str]] = []
+        for chunk, response in zip(chunks, responses):
+            _collect_batch_response(response, chunk, found, not_found)
+        return found, not_found
+
+# --- Helpers shared by both clients ---
+
+def _named_card_params(card_name: str, set_code: Optional[str]) -> Dict[str, str]:
+    """Builds the query parameters for the fuzzy /cards/named endpoint."""
+    params = {"fuzzy": card_name}
+    if set_code:
+        params["set"] = set_code
+    return params
+
+def _printing_endpoint(set_code: str, collector_number: str) -> str:
+    """Builds the /cards/{set}/{number} endpoint path for one printing."""
+    return f"cards/{quote(set_code.lower(), safe='')}/{quote(collector_number, safe='')}"
+
+def _chunk_identifiers(identifiers: List[Dict[str, str]]):
+    """Splits identifiers into chunks the /cards/collection endpoint accepts."""
+    for start in range(0, len(identifiers), SCRYFALL_COLLECTION_BATCH_SIZE):
+        yield identifiers[start:start + SCRYFALL_COLLECTION_BATCH_SIZE]
+
+def _collect_batch_response(
+    response: Optional[Dict[str, Any]],
+    chunk: List[Dict[str, str]],
+    found: List[ScryfallCard],
+    not_found: List[Dict[str, str]],
+):
+    """Validates one /cards/collection response and appends its results."""
+    if not response:
+        not_found.extend(chunk)
+        return
+
+    for card_data in response.get("data", []):
+        try:
+            found.append(ScryfallCard.parse_obj(card_data))
+        except Exception as e:
+            print(f"Scryfall API: Skipping card '{card_data.get('name')}' that failed validation: {e}")
+    not_found.extend(response.get("not_found", []))
+
 # A singleton instance of the client for convenient access across the application.
 scryfall_client = ScryfallClient()
\ No newline at end of file
@@ -1,12 +1,15 @@
 """
 The main entry point for the Streamlit web user interface.
 """
+import time
 import streamlit as st
 import requests
 from collections import defaultdict
 
 # --- Configuration ---
 BACKEND_URL = "http://localhost:8000/api/v1"
+# How often the upload progress is refreshed while a collection is ingested.
+JOB_POLL_SECONDS = 1.0
 # Pre-defined colors for UI consistency
 COLORS = {"W": "White", "U": "Blue", "B": "Black", "R": "Red", "G": "Green"}
 
@@ -47,23 +50,55 @@ with st.sidebar:
     st.write("Upload your collection to enable the deck builder.")
     with st.form("upload_form", clear_on_submit=True):
         uploaded_file = st.file_uploader("Upload collection CSV", type="csv", label_visibility="collapsed")
+        update_active = st.checkbox(
+            "Update the active collection", value=False, disabled=not st.session_state.collection_id,
+            help="Re-upload into the active collection; only the cards that changed are written."
+        )
         submitted = st.form_submit_button("Process Collection")
         if submitted and uploaded_file is not None:
-            with st.spinner("Processing your collection..."):
-                files = {"file": (uploaded_file.name, uploaded_file, "text/csv")}
-                try:
-                    res = requests.post(f"{BACKEND_URL}/collections/upload", files=files, timeout=600)
-                    if res.status_code == 200:
-                        data = res.json()
-                        st.session_state.collection_id = data.get("collection_id")
-                        st.session_state.upload_summary = data.get("message")
+            files = {"file": (uploaded_file.name, uploaded_file, "text/csv")}
+            params = {"collection_id": st.session_state.collection_id} if update_active and st.session_state.collection_id else {}
+            try:
+                res = requests.post(f"{BACKEND_URL}/collections/jobs", files=files, params=params, timeout=60)
+                if res.status_code == 202:
+                    job = res.json()
+                    progress_bar = st.progress(0.0, text="Queued...")
+                    # Poll the job until the backend reports it finished.
+                    while job["status"] in ("queued", "running"):
+                        time.sleep(JOB_POLL_SECONDS)
+                        job_res = requests.get(f"{BACKEND_URL}/collections/jobs/{job['job_id']}", timeout=30)
+                        if job_res.status_code != 200:
+                            # The job expired or the backend restarted; stop polling.
+                            job = {"status": "failed", "error": f"{job_res.status_code} - {job_res.text}"}
+                            break
+                        job = job_res.json()
+                        progress = job["progress"]
+                        done = progress["resolved_from_cache"] + progress["fetched_from_scryfall"] + progress["failed_rows"]
+                        progress_bar.progress(
+                            done / progress["rows_parsed"] if progress["rows_parsed"] else 0.0,
+                            text=f"{done}/{progress['rows_parsed']} rows processed "
+                                 f"({progress['fetched_from_scryfall']} fetched from Scryfall, {progress['failed_rows']} failed)",
+                        )
+                    progress_bar.empty()
+
+                    result = job.get("result") or {}
+                    if job["status"] == "completed" and result.get("successful_rows"):
+                        st.session_state.collection_id = result["collection_id"]
+                        st.session_state.upload_summary = f"Ingested {result['successful_rows']}/{result['total_rows']} rows."
+                        if result.get("unchanged"):
+                            st.session_state.upload_summary = "Collection unchanged since its last upload."
+                        elif params and result.get("changes"):
+                            changes = result["changes"]
+                            st.session_state.upload_summary += f" {changes['added']} added, {changes['updated']} updated, {changes['removed']} removed."
                         st.session_state.upload_error = ""
                         st.session_state.messages = [{"role": "assistant", "content": f"Collection loaded! {st.session_state.upload_summary} Let's build a deck! What are you thinking of?"}]
                         st.session_state.decklist = None # Clear old decklist on new upload
                     else:
-                        st.session_state.upload_error = f"Error: {res.status_code} - {res.text}"
-                except requests.exceptions.RequestException as e:
-                    st.session_state.upload_error = f"Connection Error: {e}"
+                        st.session_state.upload_error = f"Error: {job.get('error') or (result.get('failures') or ['No cards could be ingested.'])[0]}"
+                else:
+                    st.session_state.upload_error = f"Error: {res.status_code} - {res.text}"
+            except requests.exceptions.RequestException as e:
+                st.session_state.upload_error = f"Connection Error: {e}"
     
     if st.session_state.upload_summary:
         st.success(st.session_state.upload_summary)
@@ -139,7 +174,48 @@ if st.session_state.collection_id:
         with col5:
             target_draw = st.slider("Card Draw Spells", 0, 20, 8)
 
+        col6, col7 = st.columns(2)
+        with col6:
+            theme = st.text_input("Theme (optional)", placeholder="e.g. +1/+1 counters", help="Favor cards whose rules text fits this theme.")
+        with col7:
+            commander = st.text_input("Commander (optional)", help="Favor cards that work with this commander. Use its exact card name.")
+
+        optimize = st.checkbox("Optimize the deck", help="Improve the heuristic deck with a short search that can swap cards out.")
+        optimize_seconds = st.slider("Optimization time (seconds)", 1, 30, 3)
+
         build_button = st.form_submit_button("Build Deck", use_container_width=True)
+        recommend_button = st.form_submit_button(
+            "Recommend Colors", use_container_width=True,
+            help="Rank the color identities your collection supports best for this format and these targets.",
+        )
+
+    if recommend_button:
+        # --- API Call to Recommend Colors ---
+        spec = {
+            "format": format,
+            "color_identity": color_identity,
+            "target_lands": target_lands,
+            "target_creatures": target_creatures,
+            "target_ramp": target_ramp,
+            "target_removal": target_removal,
+            "target_draw": target_draw,
+            "target_board_wipes": 2
+        }
+        with st.spinner("Comparing every color combination..."):
+            try:
+                res = requests.post(f"{BACKEND_URL}/decks/recommend-colors",
+                                    json={"collection_id": st.session_state.collection_id, "spec": spec}, timeout=60)
+                if res.status_code == 200:
+                    st.subheader("Recommended Colors")
+                    st.table([
+                        {"Colors": " ".join(COLORS[c] for c in rec["color_identity"]), "Score": f"{rec['score']:.2f}",
+                         "Non-land cards": rec["pool_depth"], "Lands": rec["land_count"], **rec["role_counts"]}
+                        for rec in res.json()
+                    ])
+                else:
+                    st.error(f"Error recommending colors: {res.status_code} - {res.text}")
+            except requests.exceptions.RequestException as e:
+                st.error(f"Connection Error: {e}")
 
     if build_button:
         # --- API Call to Build Deck ---
@@ -151,13 +227,17 @@ if st.session_state.collection_id:
             "target_ramp": target_ramp,
             "target_removal": target_removal,
             "target_draw": target_draw,
-            "target_board_wipes": 2 # Hardcoded for now, can be a slider later
+            "target_board_wipes": 2, # Hardcoded for now, can be a slider later
+            "theme": theme or None,
+            "commander": commander or None
         }
         
         payload = {
             "collection_id": st.session_state.collection_id,
             "spec": spec
         }
+        if optimize:
+            payload["optimize"] = {"time_budget_seconds": optimize_seconds}
         
         with st.spinner("Building your deck... The algorithm is at work!"):
             try:
@@ -196,5 +276,25 @@ if st.session_state.collection_id:
             land_list = [f"{qty}x {name}" for name, qty in sorted(lands.items())]
             st.text("\n".join(land_list))
 
+        # --- Draw Simulation ---
+        if st.button("Simulate Draws", help="Play 100,000 goldfish games to see how the mana works out."):
+            with st.spinner("Shuffling..."):
+                try:
+                    res = requests.post(f"{BACKEND_URL}/decks/simulate", json={"decklist": st.session_state.decklist}, timeout=60)
+                    if res.status_code == 200:
+                        report = res.json()
+                        st.metric(label="Mulligan Rate", value=f"{report['mulligan_rate']:.1%}")
+                        turns = [f"Turn {turn}" for turn in range(1, len(report["land_drops"]) + 1)]
+                        st.write("**Chance of making every land drop**")
+                        st.bar_chart({"Land drops": dict(zip(turns, report["land_drops"]))})
+                        st.write("**Chance of casting a spell on curve, by color**")
+                        st.line_chart({color: dict(zip(turns, chances)) for color, chances in report["on_curve"].items() if any(chances)})
+                        if report["unknown_cards"]:
+                            st.warning(f"Not in the card cache, so never cast: {', '.join(report['unknown_cards'])}")
+                    else:
+                        st.error(f"Error simulating deck: {res.status_code} - {res.text}")
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Connection Error: {e}")
+
 else:
     st.info("Upload your collection in the sidebar to activate the deck builder.")
\ No newline at end of file
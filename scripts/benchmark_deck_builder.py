@@ -0,0 +1,139 @@
+"""
+A command-line benchmark for the deck builder's greedy card selection.
+
+Synthetic pools of analyzed cards of several sizes are built in memory, and the
+non-land selection phase of `build_deck` is timed for each pool with:
+
+1. The reference implementation below, which rescans and rescores the whole
+   pool on every pick. It is kept here verbatim as the specification the
+   optimized selection must reproduce.
+2. Each of the deck builder's `SELECTION_ENGINES`: the lazily rescored heap
+   and the NumPy-vectorized scorer.
+
+Every run checks that each engine produces the same cards in the same order as
+the reference, so the script doubles as an equivalence check. A microbenchmark
+then compares scoring a whole pool once with `score_card` against one
+`ScoringMatrix.scores` call, and checks the scores are bit-identical. No
+database is needed.
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from backend.api_models import DeckSpec
+from backend.services.deck_builder import SELECTION_ENGINES, AnalyzedCard, DeckConstruction, ScoringMatrix, score_card
+from backend.services.role_classifier import role_mask
+
+# --- Configuration ---
+DEFAULT_POOL_SIZES = [1_000, 5_000, 20_000]
+# Roles drawn for synthetic cards, with their relative weights.
+SYNTHETIC_ROLES = {"threat": 30, "removal": 12, "ramp": 10, "draw": 10, "board_wipe": 2, "disruption": 6, "synergy": 20, "land": 10}
+SPECS = {
+    "commander": DeckSpec(format="commander", color_identity={"W", "U", "B", "R", "G"}),
+    "modern": DeckSpec(format="modern", color_identity={"W", "U", "B", "R", "G"}, target_creatures=20,
+                       target_removal=8, target_ramp=4, target_draw=4, target_board_wipes=1, target_lands=22),
+}
+# --- End Configuration ---
+
+def synthetic_pool(size: int, seed: int) -> List[AnalyzedCard]:
+    """
+    Builds a pool of random cards. Integer mana values make many cards tie on
+    score, and about one card in a hundred reuses an earlier card's name, as
+    printings of the same card do, so tie-breaking is exercised too.
+    """
+    rng = random.Random(seed)
+    roles, weights = list(SYNTHETIC_ROLES), list(SYNTHETIC_ROLES.values())
+    pool = []
+    for i in range(size):
+        name = f"Synthetic Card {rng.randrange(i)}" if i and rng.random() < 0.01 else f"Synthetic Card {i}"
+        card_roles = sorted(set(rng.choices(roles, weights, k=rng.choice([1, 1, 2, 3]))))
+        pool.append(AnalyzedCard(
+            scryfall_id=str(i), name=name, quantity=rng.randint(1, 4),
+            type_line="Land" if "land" in card_roles else "Creature", mana_cost=None,
+            mana_value=float(rng.choice([0, 1, 2, 2, 3, 3, 4, 5, 6, 7, 9, 11])), role_mask=role_mask(card_roles),
+        ))
+    return pool
+
+def reference_select_nonland_cards(deck: DeckConstruction, target_count: int):
+    """The original selection loop: rescan and rescore the whole pool on every pick."""
+    spec = deck.spec
+    while deck.total_cards < target_count:
+        best_card_name = None
+        best_score = -1.0
+
+        for card_name, card in deck.available_pool.items():
+            current_deck_qty = deck.main_deck.get(card_name, 0)
+            limit = 1 if spec.format == "commander" else 4
+            if current_deck_qty < card.quantity and current_deck_qty < limit:
+                if "land" not in card.roles:
+                    current_score = score_card(card, deck)
+                    if current_score > best_score:
+                        best_score = current_score
+                        best_card_name = card_name
+
+        if best_card_name:
+            deck.add_card(best_card_name)
+        else:
+            break
+
+def time_selection(select: Callable, spec: DeckSpec, pool: List[AnalyzedCard], repeat: int) -> Tuple[float, Dict[str, int]]:
+    """Returns the best time of `repeat` runs of a selection function, and the deck it built."""
+    best = float("inf")
+    for _ in range(repeat):
+        deck = DeckConstruction(spec, pool)
+        target_count = (100 if spec.format == "commander" else 60) - spec.target_lands
+        start = time.perf_counter()
+        select(deck, target_count)
+        best = min(best, time.perf_counter() - start)
+    return best, deck.main_deck
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Benchmark the deck builder's greedy selection on synthetic pools.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_POOL_SIZES, help="Pool sizes to benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is reported.")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the synthetic pools.")
+    args = parser.parse_args()
+
+    engines = list(SELECTION_ENGINES)
+    print("Greedy selection (best of runs, ms; speedup over the reference in brackets)")
+    print(f"{'format':>10} {'pool':>7} | {'reference':>9} | " + " | ".join(f"{name:>17}" for name in engines) + " | identical")
+    for size in args.sizes:
+        pool = synthetic_pool(size, args.seed + size)
+        for format_name, spec in SPECS.items():
+            reference_time, reference_deck = time_selection(reference_select_nonland_cards, spec, pool, args.repeat)
+            columns, identical = [], True
+            for name in engines:
+                engine_time, engine_deck = time_selection(SELECTION_ENGINES[name], spec, pool, args.repeat)
+                identical &= list(engine_deck.items()) == list(reference_deck.items())
+                columns.append(f"{engine_time * 1000:8.1f} ({reference_time / engine_time:5.1f}x)")
+            print(f"{format_name:>10} {size:>7} | {reference_time * 1000:9.1f} | " + " | ".join(columns) + f" | {'yes' if identical else 'NO'}")
+
+    print("\nScoring a whole pool once (best of runs, ms)")
+    print(f"{'pool':>7} | {'score_card':>10} {'vectorized':>10} {'speedup':>8} | bit-identical")
+    for size in args.sizes:
+        pool = synthetic_pool(size, args.seed + size)
+        deck = DeckConstruction(SPECS["commander"], pool)
+        for card in pool[:40]:
+            deck.add_card(card.name)
+        cards = list(deck.available_pool.values())
+        matrix = ScoringMatrix(cards, list(deck.role_targets))
+
+        python_time, vectorized_time = float("inf"), float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            python_scores = [score_card(card, deck) for card in cards]
+            python_time = min(python_time, time.perf_counter() - start)
+            start = time.perf_counter()
+            vectorized_scores = matrix.scores(deck)
+            vectorized_time = min(vectorized_time, time.perf_counter() - start)
+        identical = np.array_equal(np.array(python_scores), vectorized_scores)
+        print(f"{size:>7} | {python_time * 1000:10.2f} {vectorized_time * 1000:10.3f} {python_time / vectorized_time:7.0f}x | "
+              f"{'yes' if identical else 'NO'}")
+
+if __name__ == "__main__":
+    main()
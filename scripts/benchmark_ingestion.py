@@ -0,0 +1,217 @@
+"""
+A command-line benchmark for collection ingestion.
+
+This script starts a local stand-in for the Scryfall API that serves synthetic
+cards, points the application at it and a throwaway SQLite database, and then
+times ingesting the same synthetic CSV on an empty cache with each path:
+
+1. The legacy per-row path, which resolves each card with its own request.
+2. The batched path used by `process_collection_csv`, which resolves all
+   cache misses through the `/cards/collection` endpoint.
+3. The async batched path used by the upload endpoint, which keeps several
+   `/cards/collection` requests in flight at once.
+
+The shared Scryfall rate limiter applies to every path, so the comparison
+reflects the number of round trips each path makes.
+
+With `--warm`, the cache is pre-populated instead and the benchmark reports
+rows per second for collections of several sizes, which isolates the cost of
+parsing, merging duplicate rows and writing `UserCard` records.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+# --- Configuration ---
+DEFAULT_ROWS = 1000
+DEFAULT_WARM_SIZES = [1_000, 10_000, 100_000]
+# The number of distinct cards in the warm cache. Larger collections repeat
+# cards, so some of their rows are merged.
+WARM_CATALOG_SIZE = 20_000
+SYNTHETIC_SET_CODE = "bch"
+# --- End Configuration ---
+
+def synthetic_card(name: str, set_code: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Returns a Scryfall-shaped card object for names of the form 'Bench Card N'."""
+    if not name.lower().startswith("bench card "):
+        return None
+    number = name.split()[-1]
+    return {
+        "object": "card",
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"bench/{number}")),
+        "name": f"Bench Card {number}",
+        "lang": "en",
+        "oracle_text": "Draw a card.",
+        "mana_cost": "{1}{U}",
+        "cmc": 2.0,
+        "type_line": "Instant",
+        "colors": ["U"],
+        "color_identity": ["U"],
+        "keywords": [],
+        "legalities": {"commander": "legal", "modern": "legal"},
+        "rarity": "common",
+        "set": set_code or SYNTHETIC_SET_CODE,
+        "collector_number": number,
+        "layout": "normal",
+        "edhrec_rank": int(number) + 1,
+        "prices": {"usd": "0.10"},
+    }
+
+class StandInScryfallHandler(BaseHTTPRequestHandler):
+    """Serves the subset of the Scryfall API that the ingestion pipeline uses."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/cards/named":
+            card = synthetic_card(params.get("fuzzy", [""])[0], params.get("set", [None])[0])
+            self._reply(200 if card else 404, card or {"object": "error"})
+        else:
+            self._reply(404, {"object": "error"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if urlparse(self.path).path != "/cards/collection":
+            self._reply(404, {"object": "error"})
+            return
+        found, not_found = [], []
+        for identifier in body["identifiers"]:
+            card = synthetic_card(identifier.get("name", ""), identifier.get("set"))
+            (found if card else not_found).append(card or identifier)
+        self._reply(200, {"object": "list", "data": found, "not_found": not_found})
+
+    def _reply(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Keep the benchmark output readable.
+
+def build_csv(rows: int) -> bytes:
+    """Builds a collection CSV with one distinct synthetic card per row."""
+    lines = ["Name,Quantity,Set Code"]
+    lines += [f"Bench Card {i},1,{SYNTHETIC_SET_CODE}" for i in range(rows)]
+    return "\n".join(lines).encode("utf-8")
+
+def build_warm_csv(rows: int) -> bytes:
+    """Builds a collection CSV that cycles through the warm catalog, alternating finishes."""
+    lines = ["Name,Quantity,Set Code,Foil"]
+    lines += [
+        f"Bench Card {i % WARM_CATALOG_SIZE},1,{SYNTHETIC_SET_CODE},{'foil' if (i // WARM_CATALOG_SIZE) % 2 else ''}"
+        for i in range(rows)
+    ]
+    return "\n".join(lines).encode("utf-8")
+
+def run_warm_benchmark(sizes):
+    """Times ingestion of collections of each size against a fully populated cache."""
+    from sqlmodel import Session, delete, func, select
+    from backend.database.connection import engine
+    from backend.database.models import UserCard
+    from backend.services.card_enrichment import upsert_scryfall_cards
+    from backend.services.collection_ingestor import process_collection_csv
+    from backend.services.scryfall_client import ScryfallCard
+
+    with Session(engine) as session:
+        upsert_scryfall_cards(session, [ScryfallCard.parse_obj(synthetic_card(f"Bench Card {i}")) for i in range(WARM_CATALOG_SIZE)])
+        session.commit()
+
+    print(f"\nWarm-cache ingestion ({WARM_CATALOG_SIZE:,} cached cards):")
+    for rows in sizes:
+        csv_bytes = build_warm_csv(rows)
+        start = time.perf_counter()
+        result = process_collection_csv(io.BytesIO(csv_bytes))
+        seconds = time.perf_counter() - start
+
+        with Session(engine) as session:
+            stored_quantity = session.exec(select(func.sum(UserCard.quantity)).where(UserCard.collection_id == result.collection_id)).one()
+            stored_rows = session.exec(select(func.count()).where(UserCard.collection_id == result.collection_id)).one()
+            session.exec(delete(UserCard))
+            session.commit()
+        if result.successful_rows != rows or stored_quantity != rows:
+            print(f"Error: ingested {result.successful_rows}/{rows} rows with total quantity {stored_quantity}.", file=sys.stderr)
+            sys.exit(1)
+        print(f"  {rows:>9,} rows: {seconds:8.2f}s ({rows / seconds:,.0f} rows/s, {stored_rows:,} UserCard rows)")
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Benchmark cold-cache collection ingestion against a local Scryfall stand-in.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Number of distinct cards in the synthetic CSV.")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the batched path.")
+    parser.add_argument("--warm", action="store_true", help="Time ingestion against a pre-populated cache instead.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_WARM_SIZES, help="Collection sizes for --warm.")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInScryfallHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Both settings are read at import time, so they must be set before the
+    # application modules are imported.
+    workdir = tempfile.mkdtemp(prefix="mtg-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(workdir) / 'bench.db'}"
+    os.environ["SCRYFALL_API_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    from sqlmodel import Session, delete
+    from backend.database.connection import engine, create_db_and_tables
+    from backend.database.models import ScryfallCardCache, UserCard
+    from backend.services.card_enrichment import get_or_create_scryfall_card
+    from backend.services.collection_ingestor import process_collection_csv, process_collection_csv_async
+
+    create_db_and_tables()
+    if args.warm:
+        run_warm_benchmark(args.sizes)
+        server.shutdown()
+        return
+    csv_bytes = build_csv(args.rows)
+
+    def reset_database():
+        with Session(engine) as session:
+            session.exec(delete(UserCard))
+            session.exec(delete(ScryfallCardCache))
+            session.commit()
+
+    timings = {}
+    if not args.skip_legacy:
+        reset_database()
+        start = time.perf_counter()
+        with Session(engine) as session:
+            for i in range(args.rows):
+                get_or_create_scryfall_card(f"Bench Card {i}", SYNTHETIC_SET_CODE, db_session=session)
+        timings["per-row"] = time.perf_counter() - start
+
+    for label, ingest in [
+        ("batched", process_collection_csv),
+        ("async", lambda csv_file: asyncio.run(process_collection_csv_async(csv_file))),
+    ]:
+        reset_database()
+        start = time.perf_counter()
+        result = ingest(io.BytesIO(csv_bytes))
+        timings[label] = time.perf_counter() - start
+        if result.successful_rows != args.rows:
+            print(f"Error: {label} ingestion resolved {result.successful_rows}/{args.rows} rows.", file=sys.stderr)
+            sys.exit(1)
+
+    server.shutdown()
+    print(f"\nCold-cache ingestion of {args.rows:,} distinct cards:")
+    for label, seconds in timings.items():
+        print(f"  {label:>8}: {seconds:8.2f}s ({args.rows / seconds:,.0f} rows/s)")
+    if "per-row" in timings:
+        print(f"  speedup: {timings['per-row'] / timings['batched']:.1f}x")
+
+if __name__ == "__main__":
+    main()
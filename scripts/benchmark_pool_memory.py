@@ -0,0 +1,165 @@
+"""
+A command-line benchmark for the memory and speed of deck-building pools.
+
+A synthetic collection is laid out as the rows `load_pool` reads, with
+realistic duplication: several printings per card name, and type lines and
+mana costs drawn from small vocabularies. The rows are turned into a pool
+twice:
+
+1. With the pydantic model below, which the deck builder used before the
+   compact pool and is kept here verbatim for comparison. Every card carries
+   its oracle text, color identity and roles as lists of strings.
+2. With the compact `AnalyzedCard` records the deck builder runs on now.
+
+For each pool the script reports the memory it holds (measured with
+`tracemalloc`), the time to build it, its pickled size (what a batch build
+sends to each worker process) and the time to score every card once with
+`score_card`. No database is needed.
+"""
+
+import argparse
+import gc
+import pickle
+import random
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from backend.api_models import DeckSpec
+from backend.services.deck_builder import AnalyzedCard, DeckConstruction, score_card
+from backend.services.role_classifier import ROLES, role_mask
+
+# --- Configuration ---
+DEFAULT_POOL_SIZES = [10_000, 50_000]
+# Distinct card names per pool card: most cards are owned in a few printings.
+NAMES_PER_CARD = 0.4
+TYPE_LINES = ["Creature — Human Wizard", "Creature — Elf Druid", "Creature — Dragon", "Instant", "Sorcery",
+              "Artifact", "Enchantment — Aura", "Legendary Creature — Angel", "Land", "Basic Land — Forest"]
+MANA_COSTS = ["{1}{W}", "{2}{U}{U}", "{B}", "{3}{R}", "{G}{G}", "{4}", "{X}{R}{R}", "{1}{W}{U}", ""]
+SPEC = DeckSpec(format="commander", color_identity={"W", "U", "B", "R", "G"})
+# --- End Configuration ---
+
+class ReferenceAnalyzedCard(BaseModel):
+    """A richer representation of a card for deck building."""
+    scryfall_id: str
+    name: str
+    quantity: int
+    type_line: str
+    oracle_text: Optional[str] = None
+    mana_cost: Optional[str] = None
+    color_identity: List[str]
+    mana_value: float
+    roles: List[str] = []
+    # Quality signals, where Scryfall has them.
+    edhrec_rank: Optional[int] = None
+    price_usd: Optional[float] = None
+
+def reference_score_card(card: ReferenceAnalyzedCard, deck: DeckConstruction) -> float:
+    """The original `score_card`, over role name lists."""
+    score = 1.0
+    role_targets = deck.role_targets
+
+    for role in card.roles:
+        if role in role_targets:
+            current_count = deck.role_counts[role]
+            target_count = role_targets[role]
+            if current_count < target_count:
+                score += 10 * (1 - (current_count / target_count))
+
+    if card.mana_value > 5:
+        score -= (card.mana_value - 5) * 0.5
+
+    return score
+
+def synthetic_rows(size: int, seed: int) -> List[tuple]:
+    """
+    Builds rows as the database returns them. Each row's strings are fresh
+    objects, as they are when decoded from a query result.
+    """
+    rng = random.Random(seed)
+    distinct_names = max(1, int(size * NAMES_PER_CARD))
+    rows = []
+    for i in range(size):
+        name_index = rng.randrange(distinct_names)
+        card_roles = sorted(set(rng.choices(ROLES, k=rng.choice([1, 1, 2, 3]))))
+        oracle_text = " ".join(rng.choice(["Draw a card.", "Destroy target creature.", "Flying",
+                                           "Add {G}.", "Creatures you control get +1/+1."]) for _ in range(rng.randint(2, 8)))
+        rows.append((
+            f"{i:08x}-0000-4000-8000-000000000000", "".join(["Synthetic Card ", str(name_index)]), rng.randint(1, 4),
+            "".join(rng.choice(TYPE_LINES)), "".join(rng.choice(MANA_COSTS)) or None, oracle_text,
+            rng.sample("WUBRG", rng.randint(0, 2)), float(rng.randint(0, 9)), card_roles,
+            rng.choice([None, rng.randint(1, 30000)]), rng.choice([None, round(rng.uniform(0.1, 40), 2)]),
+        ))
+    return rows
+
+def reference_card(row: tuple) -> ReferenceAnalyzedCard:
+    """Builds a card as the deck builder did before the compact pool."""
+    scryfall_id, name, quantity, type_line, mana_cost, oracle_text, colors, mana_value, roles, edhrec_rank, price_usd = row
+    return ReferenceAnalyzedCard(
+        scryfall_id=scryfall_id, name=name, quantity=quantity, type_line=type_line, oracle_text=oracle_text,
+        mana_cost=mana_cost, color_identity=colors, mana_value=mana_value, roles=roles,
+        edhrec_rank=edhrec_rank, price_usd=price_usd,
+    )
+
+def compact_card(row: tuple) -> AnalyzedCard:
+    """Builds a card as `load_pool` does."""
+    scryfall_id, name, quantity, type_line, mana_cost, _, _, mana_value, roles, edhrec_rank, price_usd = row
+    return AnalyzedCard(
+        scryfall_id=scryfall_id, name=name, quantity=quantity, type_line=type_line, mana_cost=mana_cost,
+        mana_value=mana_value, role_mask=role_mask(roles), edhrec_rank=edhrec_rank, price_usd=price_usd,
+    )
+
+def measure_pool(make_card: Callable[[tuple], object], size: int, seed: int) -> Tuple[int, float, list]:
+    """Returns the memory a pool holds once built, the time to build it, and the pool."""
+    gc.collect()
+    tracemalloc.start()
+    rows = synthetic_rows(size, seed)
+    start = time.perf_counter()
+    pool = [make_card(row) for row in rows]
+    elapsed = time.perf_counter() - start
+    # Only what the pool keeps alive once the rows are gone counts, including
+    # the row strings it still references.
+    del rows
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, elapsed, pool
+
+def time_scoring(score: Callable, pool: list, repeat: int) -> float:
+    """Returns the best time of `repeat` runs scoring every card once."""
+    deck = DeckConstruction(SPEC, [])
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for card in pool:
+            score(card, deck)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Compare the memory and speed of pydantic and compact deck-building pools.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_POOL_SIZES, help="Pool sizes to benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scoring measurement; the best is reported.")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the synthetic rows.")
+    args = parser.parse_args()
+
+    print(f"{'pool':>7} {'model':>9} | {'memory':>9} {'per card':>9} | {'build':>8} | {'pickled':>9} | {'score all':>9}")
+    for size in args.sizes:
+        results = {}
+        for model, make_card, score in [("pydantic", reference_card, reference_score_card), ("compact", compact_card, score_card)]:
+            held, build_time, pool = measure_pool(make_card, size, args.seed + size)
+            pickled = len(pickle.dumps(pool, protocol=pickle.HIGHEST_PROTOCOL))
+            score_time = time_scoring(score, pool, args.repeat)
+            results[model] = (held, build_time, pickled, score_time)
+            print(f"{size:>7} {model:>9} | {held / 2**20:7.1f}MB {held / size:8.0f}B | {build_time * 1000:6.0f}ms | "
+                  f"{pickled / 2**20:7.1f}MB | {score_time * 1000:7.1f}ms")
+            del pool
+        before, after = results["pydantic"], results["compact"]
+        print(f"{size:>7} {'ratio':>9} | {before[0] / after[0]:8.1f}x {'':>9} | {before[1] / after[1]:7.1f}x | "
+              f"{before[2] / after[2]:8.1f}x | {before[3] / after[3]:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+A command-line benchmark for the card role classifier.
+
+The corpus is either a Scryfall bulk-data dump (`default_cards` or
+`oracle_cards`, as for `import_scryfall_bulk`) or, without a path, every card
+in the local cache. Its type lines and oracle texts are classified with:
+
+1. The reference implementation below, which lowercases the text and runs
+   every rule's regex on every card. It is kept here verbatim as the
+   specification the compiled rules must reproduce.
+2. `classify_card_roles`, one card at a time.
+3. `classify_batch` in this process, which also classifies each distinct
+   text only once.
+4. `classify_batch` fanned out across a process pool.
+
+Throughput is reported in cards per second, and every engine's output is
+checked against the reference.
+"""
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlmodel import Session, select
+
+from backend.database.connection import engine
+from backend.database.models import ScryfallCardCache
+from backend.services.role_classifier import CardText, classify_batch, classify_card_roles
+from scripts.import_scryfall_bulk import iter_json_array
+
+def reference_classify_card_roles(type_line: Optional[str], oracle_text: Optional[str]) -> List[str]:
+    """The original classifier: lowercase the text and run every rule's regex."""
+    roles = set()
+    type_line = (type_line or "").lower()
+    oracle_text = (oracle_text or "").lower()
+
+    if "add" in oracle_text and ("{" in oracle_text or "mana" in oracle_text): roles.add("ramp")
+    if "search your library for a basic land card" in oracle_text: roles.add("ramp")
+    if re.search(r"\bdraw(s)?\b.*\bcard(s)?\b", oracle_text): roles.add("draw")
+    if "search your library for a card" in oracle_text and "put it into your hand" in oracle_text: roles.add("tutor")
+
+    if re.search(r"\bdestroy all creatures\b", oracle_text) or re.search(r"\bexile all creatures\b", oracle_text):
+        roles.add("board_wipe")
+        roles.add("removal")
+
+    removal_patterns = [r"\bdestroy(s)?\b.*\btarget\b", r"\bexile(s)?\b.*\btarget\b", r"\bdeal(s)?\b.*\bdamage\b.*\bto any target\b", r"\bdeal(s)?\b.*\bdamage\b.*\btarget creature\b", r"\bfight(s)?\b.*\banother target creature\b"]
+    if any(re.search(p, oracle_text) for p in removal_patterns): roles.add("removal")
+
+    disruption_patterns = [r"\bcounter(s)?\b.*\btarget\b.*\bspell\b", r"target player.*discards"]
+    if any(re.search(p, oracle_text) for p in disruption_patterns): roles.add("disruption")
+
+    if re.search(r"\bgain(s)? hexproof\b", oracle_text) or re.search(r"\bgain(s)? indestructible\b", oracle_text):
+        roles.add("protection")
+
+    if re.search(r"creatures you control get \+\d+/\+\d+", oracle_text):
+        roles.add("anthem")
+
+    if "creature" in type_line: roles.add("threat")
+    if "land" in type_line: roles.add("land")
+    if not roles: roles.add("synergy")
+
+    return sorted(list(roles))
+
+def load_corpus(bulk_path: Optional[Path]) -> List[CardText]:
+    """Reads (type line, oracle text) pairs from a bulk-data dump, or from the local cache."""
+    if bulk_path:
+        with open(bulk_path, "r", encoding="utf-8") as stream:
+            return [(card.get("type_line"), card.get("oracle_text")) for card in iter_json_array(stream)]
+    with Session(engine) as session:
+        return list(session.exec(select(ScryfallCardCache.type_line, ScryfallCardCache.oracle_text)).all())
+
+def time_engine(classify: Callable[[List[CardText]], List[List[str]]], corpus: List[CardText], repeat: int):
+    """Returns the best time of `repeat` runs of a classifier over the corpus, and its output."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = classify(corpus)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Benchmark the card role classifier in cards per second.")
+    parser.add_argument("bulk_file", type=Path, nargs="?", help="A Scryfall bulk-data JSON file. Defaults to the local card cache.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes for the process pool run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is reported.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.bulk_file)
+    if not corpus:
+        print("The corpus is empty. Pass a bulk-data file or import one into the cache first.")
+        return
+    print(f"Classifying {len(corpus)} cards ({len(set(corpus))} distinct texts).\n")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        engines = {
+            "reference": lambda cards: [reference_classify_card_roles(*card) for card in cards],
+            "compiled": lambda cards: [classify_card_roles(*card) for card in cards],
+            "batch": classify_batch,
+            f"batch, {args.workers} processes": lambda cards: classify_batch(cards, executor=executor),
+        }
+        reference_time, reference_output = None, None
+        print(f"{'engine':>22} | {'cards/s':>10} {'speedup':>8} | identical")
+        for name, classify in engines.items():
+            elapsed, output = time_engine(classify, corpus, args.repeat)
+            if reference_output is None:
+                reference_time, reference_output = elapsed, output
+            print(f"{name:>22} | {len(corpus) / elapsed:10.0f} {reference_time / elapsed:7.1f}x | "
+                  f"{'yes' if output == reference_output else 'NO'}")
+
+if __name__ == "__main__":
+    main()
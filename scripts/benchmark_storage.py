@@ -0,0 +1,155 @@
+"""
+A command-line benchmark for concurrent database access under each storage profile.
+
+Reader threads repeatedly load a random collection joined to a few columns of
+its cached card data, as the deck builder does, while writer threads insert and commit batches
+of `UserCard` rows, as collection uploads do. The same workload runs against a
+fresh SQLite database with SQLite's default settings (rollback journal,
+synchronous=FULL) and with the application's storage profile (`SQLITE_PRAGMAS`
+in `backend.database.connection`), and the throughput and latency of both
+sides are reported.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# The application engine is created at import time; point it at a scratch
+# database so the benchmark never touches the real one.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp(prefix='mtg-bench-')) / 'unused.db'}")
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.database.connection import SQLITE_PRAGMAS, enable_sqlite_pragmas
+from backend.database.models import ScryfallCardCache, UserCard
+from backend.services.card_enrichment import upsert_scryfall_cards
+from backend.services.scryfall_client import ScryfallCard
+from scripts.benchmark_ingestion import synthetic_card
+
+# --- Configuration ---
+CATALOG_SIZE = 5_000
+SEED_COLLECTIONS = 20
+CARDS_PER_COLLECTION = 1_000
+WRITE_BATCH_SIZE = 500
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "sqlite-default": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "storage-profile": SQLITE_PRAGMAS,
+}
+# --- End Configuration ---
+
+def seed_database(engine) -> Tuple[List[str], List[uuid.UUID]]:
+    """Creates the schema, a card catalog and a set of collections to read."""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        cards = [ScryfallCard.parse_obj(synthetic_card(f"Bench Card {i}")) for i in range(CATALOG_SIZE)]
+        upsert_scryfall_cards(session, cards)
+        card_ids = [uuid.UUID(card.id) for card in cards]
+
+        collection_ids = [str(uuid.uuid4()) for _ in range(SEED_COLLECTIONS)]
+        for collection_id in collection_ids:
+            session.execute(insert(UserCard.__table__), user_card_rows(collection_id, card_ids, CARDS_PER_COLLECTION))
+        session.commit()
+    return collection_ids, card_ids
+
+def user_card_rows(collection_id: str, card_ids: List[uuid.UUID], count: int) -> List[Dict[str, Any]]:
+    """Builds `count` UserCard rows for random cards from the catalog."""
+    return [
+        {"collection_id": collection_id, "scryfall_card_id": card_id, "quantity": 1, "is_foil": False, "language": "en"}
+        for card_id in random.sample(card_ids, count)
+    ]
+
+def run_workload(engine, collection_ids, card_ids, readers: int, writers: int, seconds: float) -> Dict[str, Any]:
+    """Runs reader and writer threads side by side and collects their latencies."""
+    read_latencies: List[float] = []
+    write_latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        while time.perf_counter() < deadline:
+            collection_id = random.choice(collection_ids)
+            start = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    statement = (
+                        select(UserCard.quantity, ScryfallCardCache.name, ScryfallCardCache.type_line, ScryfallCardCache.cmc)
+                        .join(ScryfallCardCache)
+                        .where(UserCard.collection_id == collection_id)
+                    )
+                    session.exec(statement).all()
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+                continue
+            with lock:
+                read_latencies.append(time.perf_counter() - start)
+
+    def writer():
+        while time.perf_counter() < deadline:
+            rows = user_card_rows(str(uuid.uuid4()), card_ids, WRITE_BATCH_SIZE)
+            start = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    session.execute(insert(UserCard.__table__), rows)
+                    session.commit()
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+                continue
+            with lock:
+                write_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {"reads": read_latencies, "writes": write_latencies, "errors": errors, "seconds": seconds}
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Returns the given percentile of a list of latencies, in milliseconds."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Benchmark concurrent readers and writers under each SQLite storage profile.")
+    parser.add_argument("--readers", type=int, default=8, help="Number of reader threads.")
+    parser.add_argument("--writers", type=int, default=2, help="Number of writer threads.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run.")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="mtg-storage-bench-"))
+    print(f"Running {args.readers} readers and {args.writers} writers for {args.seconds:.0f}s per profile.\n")
+    print(f"{'profile':>16} | {'reads/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} | {'commits/s':>9} {'p95 ms':>7} | errors")
+
+    for name, pragmas in PROFILES.items():
+        engine = create_engine(f"sqlite:///{workdir / name}.db", connect_args={"check_same_thread": False},
+                               pool_size=args.readers + args.writers)
+        enable_sqlite_pragmas(engine, pragmas)
+        collection_ids, card_ids = seed_database(engine)
+
+        stats = run_workload(engine, collection_ids, card_ids, args.readers, args.writers, args.seconds)
+        reads, writes = stats["reads"], stats["writes"]
+        print(
+            f"{name:>16} | {len(reads) / args.seconds:8.1f} {percentile(reads, 0.5):7.1f} {percentile(reads, 0.95):7.1f} "
+            f"{max(reads, default=0) * 1000:7.1f} | {len(writes) / args.seconds:9.1f} {percentile(writes, 0.95):7.1f} | "
+            f"{len(stats['errors'])}"
+        )
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
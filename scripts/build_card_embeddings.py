@@ -0,0 +1,32 @@
+"""
+A command-line utility for building the card text embedding index.
+
+The deck builder scores synergy with a deck's theme or commander against
+embeddings of every cached card's rules text (see
+`backend/services/card_embeddings.py`). This script embeds the cards and
+saves the index. Runs after the first only embed cards that entered the cache,
+or whose text changed, since the last run, so it can be scheduled after bulk
+imports or the nightly cache refresh.
+"""
+
+import argparse
+import time
+
+from backend.database.connection import create_db_and_tables
+from backend.services.card_embeddings import CARD_EMBEDDINGS_PATH, EMBEDDING_BATCH_SIZE, update_card_embeddings
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Embed the rules text of cached cards for synergy scoring.")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Texts per model batch.")
+    parser.add_argument("--force", action="store_true", help="Re-embed every card, not only new or changed ones.")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    start = time.perf_counter()
+    embedded, total = update_card_embeddings(batch_size=args.batch_size, force=args.force)
+    print(f"Embedding complete: {embedded} cards embedded in {time.perf_counter() - start:.1f}s; "
+          f"{total} cards in {CARD_EMBEDDINGS_PATH}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+A command-line utility for pre-populating the local card cache from a Scryfall
+bulk-data dump.
+
+Scryfall publishes daily JSON dumps of its entire catalog (`default_cards`,
+`oracle_cards`, ...) at https://scryfall.com/docs/api/bulk-data. Importing one of
+these files means collection uploads resolve known cards from the local
+database instead of making one live API request per unseen card.
+
+This script performs the following steps:
+1. Streams the JSON array from disk one card object at a time, so memory use is
+   bounded by the batch size rather than by the size of the file.
+2. Validates each object against the same `ScryfallCard` model used by the API
+   client, skipping entries that cannot be cached (e.g. art-series cards).
+3. Upserts the cards into `ScryfallCardCache` in batches, committing once per
+   batch, and reports throughput as it goes.
+
+This script is idempotent and can be re-run against a newer dump to refresh the
+cache in place.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, TextIO
+
+from sqlmodel import Session
+
+from backend.database.connection import engine, create_db_and_tables
+from backend.services.card_enrichment import upsert_scryfall_cards
+from backend.services.scryfall_client import ScryfallCard
+
+# --- Configuration ---
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 1 << 20  # 1 MiB of text per read.
+# --- End Configuration ---
+
+# Matches the whitespace between the tokens of the top-level array.
+_WHITESPACE = re.compile(r"\s*")
+
+def iter_json_array(stream: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally decodes the elements of a top-level JSON array.
+
+    Only the current read chunk and the object being decoded are held in memory,
+    which keeps the footprint flat for multi-hundred-megabyte bulk files.
+
+    Args:
+        stream: A text stream positioned at the start of a JSON array.
+        chunk_size: The number of characters to read per refill.
+
+    Yields:
+        Each decoded element of the array, in order.
+
+    Raises:
+        json.JSONDecodeError: If the file is truncated or malformed: it does not
+            start with '[', elements are not separated by ',', or it ends
+            before the closing ']'.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    # What the next token must be: the opening "[", the first element or "]",
+    # an element after a ",", or the "," or "]" after an element.
+    expect = "open"
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if expect == "open":
+                if char != "[":
+                    raise json.JSONDecodeError("Expected '[' at the start of the file", buffer, pos)
+                pos += 1
+                expect = "first"
+                continue
+            if char == "]" and expect in ("first", "separator"):
+                return
+            if expect == "separator":
+                if char != ",":
+                    raise json.JSONDecodeError("Expected ',' or ']' after an array element", buffer, pos)
+                pos += 1
+                expect = "element"
+                continue
+
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element straddles the end of the buffer; read more below.
+                if eof:
+                    raise
+            else:
+                # A number or literal ending exactly at the end of the buffer
+                # may continue in the next chunk.
+                if end < len(buffer) or eof:
+                    yield element
+                    pos = end
+                    expect = "separator"
+                    continue
+        elif eof:
+            raise json.JSONDecodeError("Unexpected end of file before the closing ']'", buffer, pos)
+
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+def import_bulk_file(file_path: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Streams a Scryfall bulk-data file into the card cache.
+
+    Args:
+        file_path: The path to a downloaded bulk-data JSON file.
+        batch_size: The number of cards written per upsert and commit.
+
+    Returns:
+        The number of cards written to the cache.
+    """
+    print(f"Importing Scryfall bulk data from: {file_path.resolve()}")
+    imported = 0
+    skipped = 0
+    batch: List[ScryfallCard] = []
+    start_time = time.perf_counter()
+
+    with Session(engine) as session, file_path.open("r", encoding="utf-8") as stream:
+        for raw_card in iter_json_array(stream):
+            try:
+                batch.append(ScryfallCard.parse_obj(raw_card))
+            except Exception:
+                # Entries such as reversible cards lack the top-level fields the
+                # cache requires; they are not resolvable by name anyway.
+                skipped += 1
+                continue
+
+            if len(batch) >= batch_size:
+                imported += _flush_batch(session, batch)
+                _report_progress(imported, start_time)
+
+        imported += _flush_batch(session, batch)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Imported {imported:,} cards in {elapsed:.1f}s "
+          f"({imported / max(elapsed, 1e-9):,.0f} rows/s). Skipped {skipped:,} unsupported entries.")
+    return imported
+
+def _flush_batch(session: Session, batch: List[ScryfallCard]) -> int:
+    """Writes and commits the pending batch, then clears it in place."""
+    written = upsert_scryfall_cards(session, batch)
+    session.commit()
+    batch.clear()
+    return written
+
+def _report_progress(imported: int, start_time: float):
+    """Prints the running total and throughput."""
+    elapsed = time.perf_counter() - start_time
+    print(f"  ... {imported:,} cards ({imported / max(elapsed, 1e-9):,.0f} rows/s)")
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Import a Scryfall bulk-data JSON file into the local card cache.")
+    parser.add_argument("file", type=Path, help="Path to a bulk-data file such as default-cards.json or oracle-cards.json.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Cards per upsert transaction.")
+    args = parser.parse_args()
+
+    if not args.file.exists():
+        print(f"Error: Bulk data file not found at {args.file.resolve()}", file=sys.stderr)
+        sys.exit(1)
+
+    create_db_and_tables()
+    import_bulk_file(args.file, batch_size=args.batch_size)
+
+if __name__ == "__main__":
+    main()
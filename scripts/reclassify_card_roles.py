@@ -0,0 +1,30 @@
+"""
+A command-line utility for recomputing the stored role tags of cached cards.
+
+Roles are classified when a card enters the cache and stored with the version
+of the classifier that produced them. After the classification rules change
+(and `CLASSIFIER_VERSION` is bumped), this script retags the outdated rows in
+bulk. The API also does this at startup, so running it ahead of a deploy only
+moves the work out of the startup path.
+"""
+
+import argparse
+import os
+
+from backend.database.connection import create_db_and_tables
+from backend.services.role_classifier import CLASSIFIER_VERSION, reclassify_card_roles
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Recompute the stored role tags of cached cards.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Cards retagged per transaction.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes to classify with.")
+    parser.add_argument("--force", action="store_true", help="Retag every card, not only those tagged by an older classifier.")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    reclassified = reclassify_card_roles(batch_size=args.batch_size, force=args.force, workers=args.workers)
+    print(f"Reclassification complete: {reclassified} cards tagged with classifier version {CLASSIFIER_VERSION}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+A command-line utility for refreshing stale rows in the local card cache.
+
+Collection uploads never refetch a cached card just because its data is old;
+instead, this script refreshes stale rows in bulk. A row is stale when it was
+written by an older version of the cache schema mapping or when its prices are
+older than `CARD_PRICE_MAX_AGE_DAYS`. It is intended to be run periodically,
+e.g. from a nightly scheduled task.
+"""
+
+import argparse
+
+from backend.database.connection import create_db_and_tables
+from backend.services.card_enrichment import refresh_stale_cards
+
+def main():
+    """Main execution function for the script."""
+    parser = argparse.ArgumentParser(description="Refresh stale rows in the local Scryfall card cache.")
+    parser.add_argument("--batch-size", type=int, default=750, help="Rows refreshed per transaction.")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of rows to refresh in this run.")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    refreshed = refresh_stale_cards(batch_size=args.batch_size, limit=args.limit)
+    print(f"Refresh complete: {refreshed} cards updated.")
+
+if __name__ == "__main__":
+    main()